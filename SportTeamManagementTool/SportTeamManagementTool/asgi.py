@@ -2,6 +2,10 @@
 ASGI config for SportTeamManagementTool project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it (e.g. ``uvicorn SportTeamManagementTool.asgi:application``) for the realtime
+team feeds at /api/teams/{id}/stream/, which are only available over ASGI. ASGI requests
+are routed by ASGI_URLCONF, which serves the team, post, event and comment reads with
+async views (api.async_views).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
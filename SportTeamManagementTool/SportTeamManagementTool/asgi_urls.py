@@ -0,0 +1,13 @@
+"""
+URL configuration of ASGI deployments (settings.ASGI_URLCONF, applied by
+api.async_views.AsyncRoutesMiddleware): the hot read endpoints go to async views, and
+everything else is routed as in urls.py.
+"""
+from django.urls import include, path
+
+from .urls import urlpatterns as root_urlpatterns
+
+urlpatterns = [
+    path('api/', include('api.async_urls')),
+    *root_urlpatterns,
+]
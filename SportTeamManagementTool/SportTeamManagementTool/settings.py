@@ -31,15 +31,81 @@ ALLOWED_HOSTS = []
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.AsyncPageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+# Process-wide cache of (user, team) membership lookups used by api.permissions
+MEMBERSHIP_CACHE_MAX_ENTRIES = 10000
+MEMBERSHIP_CACHE_TTL = 300  # seconds
+
+# Token -> user lookups of api.authentication.CachedTokenAuthentication are kept in the
+# "tokens" cache alias (see CACHES); its TIMEOUT bounds how long a process with its own
+# backend can accept a token deleted by another process.
+TOKEN_CACHE_ALIAS = 'tokens'
+
+# Keyset pagination of team feeds (posts, comments, events), see api.pagination
+FEED_PAGE_SIZE = 10
+FEED_MAX_PAGE_SIZE = 100
+
+# /me/dashboard/ defaults and caps, see api.views.DashboardView
+DASHBOARD_POSTS_PER_TEAM = 3
+DASHBOARD_MAX_POSTS_PER_TEAM = 20
+DASHBOARD_EVENT_DAYS = 14
+DASHBOARD_MAX_EVENT_DAYS = 90
+DASHBOARD_MAX_EVENTS = 50
+
+# /me/calendar/ window cap and the row chunk size of streamed .ics exports
+CALENDAR_MAX_DAYS = 92
+CALENDAR_EXPORT_CHUNK_SIZE = 2000
+
+# Row chunk size of streamed team exports (/teams/{id}/export/, manage.py export_team), see api.export
+TEAM_EXPORT_CHUNK_SIZE = 2000
+
+# Records written per transaction by bulk imports (/teams/{id}/import/, manage.py import_team), see api.importer
+IMPORT_CHUNK_SIZE = 1000
+
+# Row limit of TeamViewSet.bulk_add_members requests
+BULK_MEMBERS_MAX_ROWS = 1000
+
+# Realtime team feeds (/teams/{id}/stream/), see api.realtime. The broker is in-process by
+# default; point REALTIME_BROKER at a subclass backed by a shared bus to run several processes.
+REALTIME_BROKER = 'api.realtime.InProcessBroker'
+REALTIME_QUEUE_SIZE = 100  # messages a slow subscriber may lag behind before it must resync
+REALTIME_HEARTBEAT = 25  # seconds between keepalive comments on idle streams
+REALTIME_RETRY_MS = 5000
+
+# Serve the team, post, event and comment lists from .values() rows, see api.fast_serializers.
+# Off, they go through the DRF serializers, with the same output.
+FAST_SERIALIZERS = True
+FAST_SERIALIZER_PLANS = 1000  # compiled plans kept, one per serializer and ?fields=/?omit= combination
+
+# Per-request performance sampling, see api.instrumentation.PerformanceMiddleware
+PERF_SAMPLE_RATE = 0.0  # fraction of requests measured; raise it locally to profile
+PERF_SLOW_QUERY_COUNT = 50
+PERF_SLOW_REQUEST_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Slow requests are logged as warnings; lower to INFO to log every sampled request.
+        'api.performance': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 AUTH_USER_MODEL = 'api.User'
 
 # Application definition
@@ -59,6 +125,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.PerformanceMiddleware',
+    'api.async_views.AsyncRoutesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +139,8 @@ MIDDLEWARE = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 ROOT_URLCONF = 'SportTeamManagementTool.urls'
+# Requests served over ASGI resolve against this instead, to use the async read views.
+ASGI_URLCONF = 'SportTeamManagementTool.asgi_urls'
 
 TEMPLATES = [
     {
@@ -97,10 +167,46 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds a writer waits for the database lock; see api.helpers.lock_team.
+            'timeout': 20,
+        },
+        # A file rather than shared-cache memory, so tests running requests in parallel
+        # threads get the same locking as production.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The "responses" alias backs api.response_cache and "tokens" api.authentication.token_cache;
+# swap in RedisCache (with the same MAX_ENTRIES/maxmemory bound) to share them between
+# processes, so that a logout takes effect in every worker at once.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,18 @@
+from django.urls import re_path
+
+from .async_views import AsyncReadView
+
+# Read endpoints served by AsyncReadView under ASGI (see settings.ASGI_URLCONF). The
+# patterns match the router's, which AsyncReadView resolves to find the viewset.
+read_view = AsyncReadView.as_view()
+
+urlpatterns = [
+    re_path(r'^teams/$', read_view, name='async-teams-list'),
+    re_path(r'^teams/(?P<pk>[^/.]+)/$', read_view, name='async-teams-detail'),
+    re_path(r'^teams/(?P<team_pk>[^/.]+)/posts/$', read_view, name='async-team-posts-list'),
+    re_path(r'^teams/(?P<team_pk>[^/.]+)/events/$', read_view, name='async-team-events-list'),
+    re_path(
+        r'^teams/(?P<team_pk>[^/.]+)/posts/(?P<post_pk>[^/.]+)/comments/$', read_view,
+        name='async-post-comments-list',
+    ),
+]
@@ -0,0 +1,153 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import resolve
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .authentication import CachedTokenAuthentication
+from .membership import aget_team_access
+from .renderers import FastJSONRenderer
+
+
+class AsyncReadMixin:
+    """
+    alist() and aretrieve(): list() and retrieve() for AsyncReadView. They run the
+    viewset's own queryset, permission, pagination and serializer code, with its queries
+    made through the async ORM. `async_params` are the query parameters they handle;
+    requests with any other are served by the DRF view.
+    """
+    async_params = frozenset()
+
+    async def aprepare(self):
+        """
+        Load with the async ORM what get_queryset() and the permissions would otherwise
+        query synchronously: by default the caller's access to the team in the URL.
+        """
+        team_pk = self.kwargs.get('team_pk')
+        if team_pk is not None:
+            await aget_team_access(self.request, team_pk)
+
+    async def alist(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    async def aretrieve(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        instance = await queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        if instance is None:
+            raise Http404
+        self.check_object_permissions(self.request, instance)
+        return Response(self.get_serializer(instance).data)
+
+
+class Fallback(Exception):
+    """
+    The request needs something AsyncReadView does not do; the DRF view serves it.
+    """
+
+
+class AsyncReadView(View):
+    """
+    Serve GET/HEAD of a DRF viewset's list or retrieve route with the viewset's alist()
+    or aretrieve() (see AsyncReadMixin), so under ASGI the request waits on the database
+    as a coroutine rather than in a worker thread.
+
+    Only the common case is handled here: a JSON response for an authenticated caller.
+    Anything else (other methods, the browsable API, unknown query parameters, session
+    or token failures, 403/404 and other API errors) is handed to the DRF view resolved
+    from ROOT_URLCONF for the same path, which stays the one implementation of every
+    error and option.
+    """
+    authenticator = CachedTokenAuthentication()
+    renderer = FastJSONRenderer()
+    # Every method goes through the async dispatch(), rather than per-method handlers.
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+        try:
+            return await self.serve(request, match)
+        except (Fallback, Http404, APIException):
+            return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+
+    async def serve(self, request, match):
+        view_func = match.func
+        action = getattr(view_func, 'actions', {}).get('get')
+        handler_name = f'a{action}'
+        if (
+            request.method not in ('GET', 'HEAD') or 'text/html' in request.headers.get('Accept', '')
+            or not hasattr(view_func.cls, handler_name)
+            or not set(request.GET) <= view_func.cls.async_params
+        ):
+            raise Fallback
+
+        user, auth = await self.authenticate(request)
+        drf_request = Request(request)
+        drf_request.user, drf_request.auth = user, auth
+
+        view = view_func.cls(**view_func.initkwargs)
+        view.action_map = view_func.actions
+        view.request, view.args, view.kwargs = drf_request, match.args, match.kwargs
+        view.action, view.format_kwarg, view.headers = action, None, {}
+        await view.aprepare()
+        view.check_permissions(drf_request)
+        return self.render(view, await getattr(view, handler_name)())
+
+    async def authenticate(self, request):
+        user = await request.auser()
+        if user.is_authenticated:
+            return user, None
+        credentials = await self.authenticator.aauthenticate(request)
+        if credentials is None:
+            raise Fallback
+        return credentials
+
+    def render(self, view, response):
+        """
+        The DRF response as a plain HttpResponse, rendered here: Django would render a
+        deferred response in a worker thread. A 304 from the conditional check is a plain
+        response already.
+        """
+        if not hasattr(response, 'data'):
+            return response
+        rendered = HttpResponse(
+            self.renderer.render(response.data, 'application/json', view.get_renderer_context()),
+            status=response.status_code, content_type='application/json',
+        )
+        for name, value in response.items():
+            if name != 'Content-Type':
+                rendered[name] = value
+        rendered['Allow'] = ', '.join(view.allowed_methods)
+        patch_vary_headers(rendered, ('Accept',))
+        return rendered
+
+
+class AsyncRoutesMiddleware:
+    """
+    Resolve ASGI requests against ASGI_URLCONF, which routes the hot read endpoints to
+    AsyncReadView; WSGI requests keep ROOT_URLCONF.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.urlconf = getattr(settings, 'ASGI_URLCONF', None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.urlconf:
+            request.urlconf = self.urlconf
+        return await self.get_response(request)
@@ -0,0 +1,131 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+
+class TokenCache:
+    """
+    Resolved tokens, as (user, token), in a Django cache alias (TOKEN_CACHE_ALIAS).
+
+    Entries are deleted when a token is deleted or its user changes (see api/signals.py),
+    in the one backend every process reads, so a logout applies to all workers as soon as
+    the alias is shared (Redis, memcached...). With a per-process backend such as locmem,
+    other processes keep a deleted token for up to the alias's TIMEOUT.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, token_key):
+        return f'token:{token_key}'
+
+    def get(self, token_key):
+        return self.backend.get(self.key(token_key))
+
+    async def aget(self, token_key):
+        return await self.backend.aget(self.key(token_key))
+
+    def set(self, token_key, credentials):
+        self.backend.set(self.key(token_key), credentials)
+
+    async def aset(self, token_key, credentials):
+        await self.backend.aset(self.key(token_key), credentials)
+
+    def delete(self, token_key):
+        self.backend.delete(self.key(token_key))
+
+    def clear(self):
+        self.backend.clear()
+
+
+token_cache = TokenCache(getattr(settings, 'TOKEN_CACHE_ALIAS', 'default'))
+
+
+def get_token_key(request, keyword):
+    """
+    The key of an "Authorization: <keyword> <key>" header, or None for requests without
+    one; a malformed header fails authentication, with DRF's messages.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != keyword.lower().encode():
+        return None
+    if len(auth) == 1:
+        raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. Token string should not contain invalid characters.')
+        )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for DRF's TokenAuthentication that keeps resolved tokens in
+    token_cache instead of querying authtoken_token on every request.
+
+    Entries are dropped by the signal handlers in api/signals.py when a token is deleted
+    (e.g. on logout) or its user is saved or deleted.
+    """
+
+    def authenticate(self, request):
+        key = get_token_key(request, self.keyword)
+        return None if key is None else self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        return self.copy_credentials(cached)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views: a cached token costs no query, others are loaded
+        with the async ORM.
+        """
+        key = get_token_key(request, self.keyword)
+        if key is None:
+            return None
+        cached = await token_cache.aget(key)
+        if cached is None:
+            token = await self.get_model().objects.select_related('user').filter(key=key).afirst()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            cached = (token.user, token)
+            await token_cache.aset(key, cached)
+        return self.copy_credentials(cached)
+
+    def copy_credentials(self, cached):
+        user, token = cached
+        # Hand each request its own copies so per-request mutations never leak between requests.
+        return (copy.copy(user), copy.copy(token))
+
+
+class QueryTokenAuthentication(CachedTokenAuthentication):
+    """
+    A token passed as ?token=, for clients that cannot set headers such as the browser's
+    EventSource. Only the realtime stream accepts it, since URLs end up in access logs.
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get('token')
+        if not key:
+            return None
+        return self.authenticate_credentials(key)
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
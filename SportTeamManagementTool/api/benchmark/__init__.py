@@ -0,0 +1,14 @@
+"""
+Offline endpoint benchmarks: seed a dataset, drive every API route through the Django test
+client and report latency percentiles, queries per request and bytes per response.
+
+Run with ``python manage.py benchmark``, or ``python manage.py benchmark_concurrency`` to
+compare WSGI and ASGI throughput of the read endpoints under concurrent load, or
+``python manage.py benchmark_serializers`` for the CPU cost of the fast list serializers.
+"""
+from .concurrency import ConcurrentRunner
+from .runner import BenchmarkRunner, summarize
+from .serialization import SerializationRunner
+from .routes import build_routes
+
+__all__ = ['BenchmarkRunner', 'ConcurrentRunner', 'SerializationRunner', 'build_routes', 'summarize']
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from .runner import summarize
+
+# wsgi: a thread per client, as a threaded WSGI server runs the DRF views.
+# asgi: one event loop, the DRF views run in Django's thread for sync code.
+# asgi-async: one event loop, with ASGI_URLCONF routing reads to api.async_views.
+MODES = ('wsgi', 'asgi', 'asgi-async')
+
+# The routes api.async_views serves.
+ASYNC_ROUTES = ('teams-list', 'teams-detail', 'team-posts-list', 'team-events-list', 'post-comments-list')
+
+
+class ConcurrentRunner:
+    """
+    Load GET routes with `concurrency` simultaneous clients in each of MODES and report
+    requests/sec and latency percentiles. Requests go through the in-process test clients,
+    so the numbers compare the modes with each other, not with a deployed server.
+    """
+
+    def __init__(self, iterations=400, warmup=20, concurrency=16):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.concurrency = concurrency
+
+    def run(self, routes, only=None, modes=MODES):
+        results = {}
+        # The test clients address their requests to "testserver".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for route in routes:
+                if route.method != 'get' or route.name not in (only or ASYNC_ROUTES):
+                    continue
+                results[route.name] = {mode: self.run_mode(route, mode) for mode in modes}
+        return results
+
+    def run_mode(self, route, mode):
+        warmup = [route.build(index) for index in range(self.warmup)]
+        calls = [route.build(index) for index in range(self.warmup, self.warmup + self.iterations)]
+        batches = [calls[worker::self.concurrency] for worker in range(self.concurrency)]
+        if mode == 'wsgi':
+            self.run_threads([warmup])
+            timings, elapsed = self.run_threads(batches)
+        else:
+            urlconf = settings.ASGI_URLCONF if mode == 'asgi-async' else None
+            with override_settings(ASGI_URLCONF=urlconf):
+                timings, elapsed = asyncio.run(self.run_tasks(warmup, batches))
+        return {
+            'requests': len(timings),
+            'status': sorted({status for _, status in timings}),
+            'requests_per_second': round(len(timings) / elapsed, 1) if elapsed else None,
+            'latency_ms': summarize([latency for latency, _ in timings], scale=1000),
+        }
+
+    def run_threads(self, batches):
+        def worker(calls):
+            client = Client()
+            try:
+                return [self.timed(lambda: client.get(call['path'], headers=self.headers(call))) for call in calls]
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            timings = [timing for batch in executor.map(worker, batches) for timing in batch]
+        return timings, time.perf_counter() - started
+
+    async def run_tasks(self, warmup, batches):
+        async def worker(calls):
+            client = AsyncClient()
+            timings = []
+            for call in calls:
+                started = time.perf_counter()
+                response = await client.get(call['path'], headers=self.headers(call))
+                timings.append((time.perf_counter() - started, response.status_code))
+            return timings
+
+        try:
+            await worker(warmup)
+            started = time.perf_counter()
+            batches = await asyncio.gather(*(worker(calls) for calls in batches))
+            return [timing for batch in batches for timing in batch], time.perf_counter() - started
+        finally:
+            await sync_to_async(connections.close_all)()
+
+    def headers(self, call):
+        return {'authorization': f"Token {call['token']}"} if call.get('token') else {}
+
+    def timed(self, request):
+        started = time.perf_counter()
+        response = request()
+        return time.perf_counter() - started, response.status_code
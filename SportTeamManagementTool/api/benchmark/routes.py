@@ -0,0 +1,180 @@
+import secrets
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import User, Team, TeamMembership, Post
+
+
+class Route:
+    """
+    One benchmarked endpoint. `build(i)` returns the path, payload and token for the i-th
+    call, so write routes can use fresh inputs on every iteration.
+    """
+
+    def __init__(self, name, method, template, build, max_iterations=None):
+        self.name = name
+        self.method = method
+        self.template = template
+        self.build = build
+        self.max_iterations = max_iterations
+
+
+class BenchmarkContext:
+    """
+    Sample objects the routes act on: the largest team, its trainer, an athlete, its most
+    commented post and a pool of users who are not members yet.
+    """
+
+    def __init__(self, password, pool_size):
+        self.password = password
+        # Keeps names created by write routes unique across runs against the same database.
+        self.run = secrets.token_hex(3)
+        self.team = Team.objects.annotate(size=Count('memberships')).order_by('-size', 'id').first()
+        if self.team is None:
+            raise ValueError("The database has no teams to benchmark; seed it first.")
+        self.trainer = self.team.trainer
+        self.athlete = User.objects.filter(
+            team_memberships__team=self.team
+        ).exclude(pk=self.trainer.pk).order_by('id').first()
+        self.post = Post.objects.filter(team=self.team).annotate(
+            size=Count('comments')
+        ).order_by('-size', 'id').first()
+
+        outsiders = User.objects.exclude(team_memberships__team=self.team).order_by('id')
+        self.outsiders = list(outsiders.values_list('username', flat=True)[:pool_size])
+        # Logout deletes the caller's token, so every logout call needs a user of its own.
+        self.logout_tokens = [
+            Token.objects.get_or_create(user=user)[0].key
+            for user in outsiders[pool_size:pool_size * 2]
+        ]
+        self.tokens = {
+            user.pk: Token.objects.get_or_create(user=user)[0].key
+            for user in (self.trainer, self.athlete) if user is not None
+        }
+        self.current_trainer = self.trainer
+        today = timezone.localdate()
+        self.month = (today.isoformat(), (today + timedelta(days=30)).isoformat())
+
+    def token(self, user):
+        return self.tokens[user.pk]
+
+
+def build_routes(context):
+    """
+    Every route in api/urls.py, in an order where write routes leave the data usable for
+    the ones after them (add-member before remove-member, transfer-trainer and logout last).
+    """
+    team, post = context.team, context.post
+    trainer = lambda i: context.token(context.current_trainer)  # noqa: E731
+    routes = [
+        Route('users-list', 'get', '/api/users/', lambda i: {'path': '/api/users/', 'token': trainer(i)}),
+        Route('users-detail', 'get', '/api/users/{id}/', lambda i: {
+            'path': f'/api/users/{context.trainer.pk}/', 'token': trainer(i),
+        }),
+        Route('teams-list', 'get', '/api/teams/', lambda i: {'path': '/api/teams/', 'token': trainer(i)}),
+        Route('teams-discover', 'get', '/api/teams/discover/', lambda i: {
+            'path': '/api/teams/discover/', 'token': trainer(i),
+        }),
+        Route('dashboard', 'get', '/api/me/dashboard/', lambda i: {'path': '/api/me/dashboard/', 'token': trainer(i)}),
+        Route('calendar', 'get', '/api/me/calendar/?from=...&to=...', lambda i: {
+            'path': f'/api/me/calendar/?from={context.month[0]}&to={context.month[1]}', 'token': trainer(i),
+        }),
+        Route('calendar-ics', 'get', '/api/me/calendar/ics/', lambda i: {
+            'path': '/api/me/calendar/ics/', 'token': trainer(i),
+        }),
+        Route('teams-detail', 'get', '/api/teams/{id}/', lambda i: {
+            'path': f'/api/teams/{team.pk}/', 'token': trainer(i),
+        }),
+        Route('teams-create', 'post', '/api/teams/', lambda i: {
+            'path': '/api/teams/', 'data': {'name': f'Benchmark team {context.run}-{i}'}, 'token': trainer(i),
+        }),
+        Route('team-members-list', 'get', '/api/teams/{id}/members/', lambda i: {
+            'path': f'/api/teams/{team.pk}/members/', 'token': trainer(i),
+        }),
+        Route('teams-add-member', 'post', '/api/teams/{id}/add-member/', lambda i: {
+            'path': f'/api/teams/{team.pk}/add-member/', 'token': trainer(i),
+            'data': {'username': context.outsiders[i], 'role': TeamMembership.Role.ATHLETE},
+        }),
+        Route('teams-remove-member', 'delete', '/api/teams/{id}/remove-member/', lambda i: {
+            'path': f'/api/teams/{team.pk}/remove-member/', 'token': trainer(i),
+            'data': {'username': context.outsiders[i]},
+        }),
+        # The first call inserts the whole pool; later calls measure the lookups alone.
+        Route('teams-bulk-add-members', 'post', '/api/teams/{id}/bulk-add-members/', lambda i: {
+            'path': f'/api/teams/{team.pk}/bulk-add-members/', 'token': trainer(i),
+            'data': {'members': [
+                {'username': username, 'role': TeamMembership.Role.ATHLETE} for username in context.outsiders
+            ]},
+        }),
+        Route('team-posts-list', 'get', '/api/teams/{id}/posts/', lambda i: {
+            'path': f'/api/teams/{team.pk}/posts/', 'token': trainer(i),
+        }),
+        Route('team-posts-create', 'post', '/api/teams/{id}/posts/', lambda i: {
+            'path': f'/api/teams/{team.pk}/posts/', 'token': trainer(i),
+            'data': {'title': f'Benchmark post {i}', 'content': 'Benchmark content'},
+        }),
+        Route('team-events-list', 'get', '/api/teams/{id}/events/', lambda i: {
+            'path': f'/api/teams/{team.pk}/events/', 'token': trainer(i),
+        }),
+        Route('team-events-ics', 'get', '/api/teams/{id}/events/ics/', lambda i: {
+            'path': f'/api/teams/{team.pk}/events/ics/', 'token': trainer(i),
+        }),
+        Route('team-events-create', 'post', '/api/teams/{id}/events/', lambda i: {
+            'path': f'/api/teams/{team.pk}/events/', 'token': trainer(i),
+            'data': {'title': f'Benchmark event {i}', 'start_time': '2030-01-01T10:00:00Z'},
+        }),
+    ]
+    if post is not None:
+        routes += [
+            Route('team-posts-detail', 'get', '/api/teams/{id}/posts/{id}/', lambda i: {
+                'path': f'/api/teams/{team.pk}/posts/{post.pk}/', 'token': trainer(i),
+            }),
+            Route('post-comments-list', 'get', '/api/teams/{id}/posts/{id}/comments/', lambda i: {
+                'path': f'/api/teams/{team.pk}/posts/{post.pk}/comments/', 'token': trainer(i),
+            }),
+            Route('post-comments-create', 'post', '/api/teams/{id}/posts/{id}/comments/', lambda i: {
+                'path': f'/api/teams/{team.pk}/posts/{post.pk}/comments/', 'token': trainer(i),
+                'data': {'content': f'Benchmark comment {i}'},
+            }),
+            Route('search', 'get', '/api/search/?q=...', lambda i: {
+                'path': f'/api/search/?q={quote(post.title.split()[0])}', 'token': trainer(i),
+            }),
+        ]
+    if context.athlete is not None:
+        routes.append(Route('teams-transfer-trainer', 'patch', '/api/teams/{id}/transfer-trainer/', transfer(context)))
+
+    # Password hashing dominates the auth routes, so they run fewer iterations.
+    routes += [
+        Route('auth-register', 'post', '/api/auth/register/', lambda i: {
+            'path': '/api/auth/register/', 'data': {
+                'username': f'benchmark_{context.run}_{i}', 'email': f'benchmark_{context.run}_{i}@example.com',
+                'password': 'Kx9-vq-Plume-73', 'password2': 'Kx9-vq-Plume-73',
+            },
+        }, max_iterations=10),
+        Route('auth-login', 'post', '/api/auth/login/', lambda i: {
+            'path': '/api/auth/login/', 'data': {'username': context.athlete.username, 'password': context.password},
+        }, max_iterations=10),
+        Route('auth-logout', 'post', '/api/auth/logout/', lambda i: {
+            'path': '/api/auth/logout/', 'token': context.logout_tokens[i],
+        }),
+    ]
+    return routes
+
+
+def transfer(context):
+    """
+    Hand the team back and forth between its trainer and an athlete.
+    """
+    def build(i):
+        current = context.current_trainer
+        target = context.athlete if current == context.trainer else context.trainer
+        context.current_trainer = target
+        return {
+            'path': f'/api/teams/{context.team.pk}/transfer-trainer/', 'token': context.token(current),
+            'data': {'new_trainer_username': target.username},
+        }
+    return build
@@ -0,0 +1,99 @@
+import time
+
+from django.db import connection
+from django.conf import settings
+from django.test import Client, override_settings
+
+
+def percentile(sorted_values, fraction):
+    """
+    Linearly interpolated percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(values, scale=1):
+    values = sorted(value * scale for value in values)
+    if not values:
+        return {}
+    return {
+        'min': round(values[0], 3),
+        'p50': round(percentile(values, 0.50), 3),
+        'p95': round(percentile(values, 0.95), 3),
+        'p99': round(percentile(values, 0.99), 3),
+        'max': round(values[-1], 3),
+        'mean': round(sum(values) / len(values), 3),
+    }
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that only counts queries, so measuring stays cheap and
+    works without DEBUG.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchmarkRunner:
+    def __init__(self, iterations=50, warmup=5):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        if method == 'get':
+            return self.client.get(path, data, **headers)
+        return getattr(self.client, method)(path, data, content_type='application/json', **headers)
+
+    def run_route(self, route):
+        iterations = min(self.iterations, route.max_iterations or self.iterations)
+        warmup = min(self.warmup, iterations)
+        latencies, queries, sizes, statuses = [], [], [], set()
+
+        for index in range(warmup + iterations):
+            call = route.build(index)
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = self.request(route.method, call['path'], call.get('data'), call.get('token'))
+                # Streamed responses only query and render while being consumed.
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                elapsed = time.perf_counter() - started
+            if index < warmup:
+                continue
+            latencies.append(elapsed)
+            queries.append(counter.count)
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+
+        return {
+            'method': route.method.upper(),
+            'path': route.template,
+            'iterations': iterations,
+            'status': sorted(statuses),
+            'latency_ms': summarize(latencies, scale=1000),
+            'queries': summarize(queries),
+            'bytes': summarize(sizes),
+        }
+
+    def run(self, routes, only=None):
+        results = {}
+        # The test client addresses its requests to "testserver".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for route in routes:
+                if only and route.name not in only:
+                    continue
+                results[route.name] = self.run_route(route)
+        return results
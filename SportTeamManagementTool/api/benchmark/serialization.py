@@ -0,0 +1,103 @@
+import time
+
+from django.conf import settings
+from django.test import RequestFactory
+from django.urls import resolve
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+
+# The list routes served by api.fast_serializers.FastListMixin.
+FAST_ROUTES = ('teams-list', 'team-posts-list', 'team-events-list', 'post-comments-list')
+
+
+class SerializationRunner:
+    """
+    CPU time per object of a list page built the DRF way (model instances, the viewset's
+    serializer, JSONRenderer) and through the viewset's fast plan (.values() rows,
+    FastJSONRenderer), checking both give the same bytes. Each is split into `fetch`, the
+    page's queries, and `serialize`, from the fetched rows to the response body: setting
+    up the serializer or compiling the plan, and for the plan its Related queries. The
+    views are set up once per route, so routing, authentication and pagination are left
+    out of both.
+    """
+
+    def __init__(self, iterations=50, warmup=5, page_size=100):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.page_size = page_size
+        self.factory = RequestFactory()
+
+    def run(self, routes, only=None):
+        results = {}
+        for route in routes:
+            if route.method == 'get' and route.name in (only or FAST_ROUTES):
+                results[route.name] = self.run_route(route)
+        return results
+
+    def run_route(self, route):
+        view = self.build_view(route.build(0))
+        plan = view.get_fast_plan()
+        if plan is None:
+            return {'objects': None, 'identical': None}
+
+        instances, rows = self.fetch_drf(view), self.fetch_fast(view, plan)
+        drf, fast = self.render_drf(view, instances), self.render_fast(view, rows)
+        objects = len(instances)
+        timings = {
+            'drf': (self.cpu_time(lambda: self.fetch_drf(view)), self.cpu_time(lambda: self.render_drf(view, instances))),
+            'fast': (self.cpu_time(lambda: self.fetch_fast(view, plan)), self.cpu_time(lambda: self.render_fast(view, rows))),
+        }
+        per_object = 1e6 / (self.iterations * max(objects, 1))
+        result = {'objects': objects, 'identical': drf == fast}
+        for path, (fetch, serialize) in timings.items():
+            result[path] = {
+                'fetch_us_per_object': round(fetch * per_object, 2),
+                'serialize_us_per_object': round(serialize * per_object, 2),
+                'total_us_per_object': round((fetch + serialize) * per_object, 2),
+            }
+        result['speedup'] = {
+            stage: round(result['drf'][key] / result['fast'][key], 2) if result['fast'][key] else None
+            for stage, key in (('serialize', 'serialize_us_per_object'), ('total', 'total_us_per_object'))
+        }
+        return result
+
+    def build_view(self, call):
+        """
+        The route's viewset, with the request authenticated and permissions checked, as
+        its as_view() function leaves it before calling list().
+        """
+        request = self.factory.get(call['path'], HTTP_AUTHORIZATION=f"Token {call['token']}")
+        match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+        view = match.func.cls(**match.func.initkwargs)
+        view.action_map = match.func.actions
+        view.setup(request, *match.args, **match.kwargs)
+        view.args, view.kwargs = match.args, match.kwargs
+        view.request = view.initialize_request(request, *match.args, **match.kwargs)
+        view.format_kwarg, view.headers = None, {}
+        view.initial(view.request)
+        return view
+
+    def page(self, view, queryset):
+        ordering = getattr(view.paginator, 'ordering', None)
+        return list((queryset.order_by(*ordering) if ordering else queryset)[:self.page_size])
+
+    def fetch_drf(self, view):
+        return self.page(view, view.filter_queryset(view.get_queryset()))
+
+    def fetch_fast(self, view, plan):
+        return self.page(view, view.get_fast_rows(plan))
+
+    def render_drf(self, view, instances):
+        return JSONRenderer().render(view.get_serializer(instances, many=True).data)
+
+    def render_fast(self, view, rows):
+        return FastJSONRenderer().render(view.get_fast_plan().serialize(rows, view.request))
+
+    def cpu_time(self, run):
+        for _ in range(self.warmup):
+            run()
+        started = time.process_time()
+        for _ in range(self.iterations):
+            run()
+        return time.process_time() - started
@@ -0,0 +1,118 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified handling for list and retrieve, answered before any serialization.
+
+    Validators come from `updated_at`: for retrieve, of the object itself; for list, one
+    aggregate (max updated_at, count) over the viewset's base queryset. Relations embedded
+    in the payload are listed in `validator_relations` as {relation: timestamp field} and
+    contribute their own max timestamp and count, so e.g. a new comment changes its post's
+    ETag. ETags also cover the caller and the query string, since both shape the payload.
+
+    Viewsets provide `get_base_queryset()`: the rows the caller may see, without the
+    select_related/prefetch/annotations only needed for serialization.
+    """
+    validator_fields = ('id', 'updated_at')
+    validator_relations = {}
+
+    def get_base_queryset(self):
+        return self.get_queryset()
+
+    def get_validator_annotations(self):
+        annotations = {}
+        for relation, field in self.validator_relations.items():
+            annotations[f'{relation}_modified'] = Max(f'{relation}__{field}')
+            annotations[f'{relation}_count'] = Count(f'{relation}__id', distinct=True)
+        return annotations
+
+    def get_validators(self, *parts):
+        timestamps = [part for part in parts if hasattr(part, 'timestamp')]
+        last_modified = max(timestamps) if timestamps else None
+        fingerprint = '|'.join(str(part) for part in (
+            self.basename, self.request.user.pk, self.request.get_full_path(), *parts
+        ))
+        return hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest(), last_modified
+
+    def get_detail_validators(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_base_queryset().only(*self.validator_fields).annotate(**self.get_validator_annotations())
+        obj = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        # The same object-level checks retrieve() runs, on the lightweight instance.
+        self.check_object_permissions(self.request, obj)
+        related = [getattr(obj, name) for name in self.get_validator_annotations()]
+        return self.get_validators(obj.pk, obj.updated_at, *related)
+
+    def get_list_validators(self):
+        aggregate = self.filter_queryset(self.get_base_queryset()).aggregate(
+            modified=Max('updated_at'), count=Count('id', distinct=True), **self.get_validator_annotations()
+        )
+        return self.get_validators(*aggregate.values())
+
+    async def aget_detail_validators(self):
+        """
+        get_detail_validators() for async views (api.async_views); raises Http404 like it.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_base_queryset().only(*self.validator_fields).annotate(**self.get_validator_annotations())
+        obj = await queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        related = [getattr(obj, name) for name in self.get_validator_annotations()]
+        return self.get_validators(obj.pk, obj.updated_at, *related)
+
+    async def aget_list_validators(self):
+        aggregate = await self.filter_queryset(self.get_base_queryset()).aaggregate(
+            modified=Max('updated_at'), count=Count('id', distinct=True), **self.get_validator_annotations()
+        )
+        return self.get_validators(*aggregate.values())
+
+    def conditional(self, get_validators, render):
+        if self.request.method not in ('GET', 'HEAD'):
+            return render()
+        etag, timestamp = self.format_validators(*get_validators())
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render()
+        return self.add_validators(response, etag, timestamp)
+
+    async def aconditional(self, aget_validators, arender):
+        etag, timestamp = self.format_validators(*await aget_validators())
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await arender()
+        return self.add_validators(response, etag, timestamp)
+
+    def format_validators(self, etag, last_modified):
+        return quote_etag(etag), int(last_modified.timestamp()) if last_modified else None
+
+    def add_validators(self, response, etag, timestamp):
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.get_list_validators, lambda: super(ConditionalGetMixin, self).list(
+            request, *args, **kwargs
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(self.get_detail_validators, lambda: super(ConditionalGetMixin, self).retrieve(
+            request, *args, **kwargs
+        ))
+
+    async def alist(self):
+        return await self.aconditional(self.aget_list_validators, super().alist)
+
+    async def aretrieve(self):
+        return await self.aconditional(self.aget_detail_validators, super().aretrieve)
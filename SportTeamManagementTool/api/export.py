@@ -0,0 +1,120 @@
+import zlib
+
+from .fast_serializers import compile_plan
+from .models import Team, TeamMembership, Post, Comment, Event, OccurrenceException
+from .renderers import FastJSONRenderer
+from .serializers import (
+    TeamExportSerializer, TeamMembershipSerializer, PostExportSerializer, CommentSerializer, EventSerializer,
+    OccurrenceExceptionExportSerializer,
+)
+from .streaming import streaming_response
+
+# (record type, key in the JSON document, serializer, rows of a team), in an order where
+# every record comes after the ones it refers to.
+SECTIONS = (
+    ('membership', 'memberships', TeamMembershipSerializer, lambda team_id: TeamMembership.objects.filter(team_id=team_id)),
+    ('post', 'posts', PostExportSerializer, lambda team_id: Post.objects.filter(team_id=team_id)),
+    ('comment', 'comments', CommentSerializer, lambda team_id: Comment.objects.filter(post__team_id=team_id)),
+    ('event', 'events', EventSerializer, lambda team_id: Event.objects.filter(team_id=team_id)),
+    (
+        'occurrence_exception', 'occurrence_exceptions', OccurrenceExceptionExportSerializer,
+        lambda team_id: OccurrenceException.objects.filter(event__team_id=team_id),
+    ),
+)
+
+FORMATS = ('ndjson', 'json')
+
+# Bytes collected before a piece of the stream is sent (or compressed).
+BUFFER_SIZE = 64 * 1024
+
+
+def iter_records(team_id, chunk_size):
+    """
+    Yield (record type, section key, payload) for the team and then every row of
+    SECTIONS, in id order. Rows are read as .values() with iterator(chunk_size) and
+    serialized by the compiled plans of api.fast_serializers, so at most one chunk of
+    each query is held in memory whatever the team's size.
+    """
+    plan = compile_plan(TeamExportSerializer())
+    yield 'team', 'team', plan.build(plan.values(Team.objects.filter(pk=team_id)).get())
+    for record_type, key, serializer_class, rows in SECTIONS:
+        plan = compile_plan(serializer_class())
+        for row in plan.values(rows(team_id).order_by('id')).iterator(chunk_size=chunk_size):
+            yield record_type, key, plan.build(row)
+
+
+def iter_ndjson(records, dumps):
+    # One {"type": ..., <fields>} object per line.
+    for record_type, _, payload in records:
+        yield dumps({'type': record_type, **payload}) + b'\n'
+
+
+def iter_json(records, dumps):
+    # {"team": {...}, "memberships": [...], ...}, with every section present, even empty.
+    keys = [key for _, key, _, _ in SECTIONS]
+    opened = 0
+    first = True
+    for _, key, payload in records:
+        if key == 'team':
+            yield b'{"team":' + dumps(payload)
+            continue
+        # Open the record's section, and any empty one before it.
+        while opened == 0 or keys[opened - 1] != key:
+            yield (b'],"' if opened else b',"') + keys[opened].encode() + b'":['
+            opened += 1
+            first = True
+        yield dumps(payload) if first else b',' + dumps(payload)
+        first = False
+    for key in keys[opened:]:
+        yield (b'],"' if opened else b',"') + key.encode() + b'":['
+        opened += 1
+    yield b']}'
+
+
+def buffered(pieces, size=BUFFER_SIZE):
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(team_id, export_format='ndjson', compress=False, chunk_size=2000):
+    """
+    Yield the bytes of a team's export as NDJSON or a JSON document, gzipped if
+    `compress`, in pieces of about BUFFER_SIZE.
+    """
+    dumps = FastJSONRenderer().render
+    encode = iter_json if export_format == 'json' else iter_ndjson
+    chunks = buffered(encode(iter_records(team_id, chunk_size), dumps))
+    return gzipped(chunks) if compress else chunks
+
+
+def export_filename(team_id, export_format, compress):
+    return f'team-{team_id}.{export_format}' + ('.gz' if compress else '')
+
+
+def export_response(request, team_id, export_format, compress, chunk_size):
+    """
+    Stream a team's export as an attachment (see iter_export).
+    """
+    content_type = 'application/json' if export_format == 'json' else 'application/x-ndjson'
+    response = streaming_response(
+        request, iter_export(team_id, export_format, compress, chunk_size),
+        content_type='application/gzip' if compress else f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(team_id, export_format, compress)}"'
+    return response
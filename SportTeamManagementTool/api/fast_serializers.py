@@ -0,0 +1,286 @@
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from django.utils.translation import get_language
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .cache import LRUTTLCache
+
+
+class Unsupported(Exception):
+    """
+    The serializer has a field no plan node reproduces; the DRF serializer is used.
+    """
+
+
+class Column:
+    """
+    A serializer method field read as is from a column of the row, typically an
+    annotation the viewset's queryset adds under the field's name.
+    """
+
+    def __init__(self, column):
+        self.column = column
+
+
+class Related:
+    """
+    A serializer method field holding at most one object of `serializer` per row, loaded
+    for the whole page with one query: `get_queryset(request)` filtered on `key`, the
+    column holding the row's id. Rows without a match get None.
+    """
+
+    def __init__(self, get_queryset, key, serializer):
+        self.get_queryset = get_queryset
+        self.key = key
+        self.plan = compile_plan(serializer)
+
+    def select(self, rows, request):
+        queryset = self.get_queryset(request).filter(**{f'{self.key}__in': [row['id'] for row in rows]})
+        return self.plan.values(queryset, extra=(self.key,))
+
+    def load(self, rows, request):
+        if not rows:
+            return {}
+        return {row[self.key]: self.plan.build(row) for row in self.select(rows, request)}
+
+    async def aload(self, rows, request):
+        if not rows:
+            return {}
+        return {row[self.key]: self.plan.build(row) async for row in self.select(rows, request)}
+
+
+def related_getter(loaded):
+    return lambda row: loaded.get(row['id'])
+
+
+class Plan:
+    """
+    How to build the payload of a serializer from a `.values()` row: `getters` are
+    (field name, function of the row) pairs in the serializer's field order, the function
+    being None for the `related` fields ({name: Related}) loaded per page. A Plan holds
+    no request state, so one can serve every request with the same fields.
+    """
+
+    def __init__(self, columns, getters, related):
+        self.columns = columns
+        self.getters = getters
+        self.related = related
+
+    def values(self, queryset, extra=()):
+        # Prefetches do not apply to dict rows; the plan's Related nodes load their own.
+        columns = list(dict.fromkeys([*self.columns, *extra]))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def build(self, row, getters=None):
+        return {name: get(row) for name, get in getters or self.getters}
+
+    def bind(self, loaded):
+        return [
+            (name, related_getter(loaded[name]) if name in loaded else get) for name, get in self.getters
+        ]
+
+    def serialize(self, rows, request):
+        rows = list(rows)
+        getters = self.bind({name: node.load(rows, request) for name, node in self.related.items()})
+        return [self.build(row, getters) for row in rows]
+
+    async def aserialize(self, rows, request):
+        rows = list(rows)
+        getters = self.bind({name: await node.aload(rows, request) for name, node in self.related.items()})
+        return [self.build(row, getters) for row in rows]
+
+
+# Fields whose to_representation() returns the database value unchanged.
+IDENTITY_FIELDS = (
+    serializers.ReadOnlyField, serializers.IntegerField, serializers.CharField, serializers.EmailField,
+    serializers.BooleanField, serializers.PrimaryKeyRelatedField,
+)
+
+
+def compile_plan(serializer, prefix=''):
+    """
+    The Plan of a bound (or top-level) ModelSerializer, from its `fields`, so a sparse
+    fieldset (?fields=, ?omit=) is already applied. `prefix` is the lookup path of a
+    nested serializer's model ("author__"). Serializer method fields are planned by the
+    serializer's get_fast_field(name), which returns a Column or Related node.
+
+    Raises Unsupported for fields with no exact equivalent, such as to-many relations.
+    The request only matters through the serializer's fields, so a plan can be reused
+    for requests with the same SHAPE_PARAMS (see FastListMixin).
+    """
+    model = serializer.Meta.model
+    columns, getters, related = [], [], {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            get_fast_field = getattr(serializer, 'get_fast_field', None)
+            node = get_fast_field(name) if get_fast_field else None
+            if isinstance(node, Column):
+                columns.append(prefix + node.column)
+                getters.append((name, itemgetter(prefix + node.column)))
+            elif isinstance(node, Related) and not prefix:
+                related[name] = node
+                getters.append((name, None))
+            else:
+                raise Unsupported(f'{type(serializer).__name__}.{name}')
+            continue
+
+        if len(field.source_attrs) != 1:
+            raise Unsupported(f'{type(serializer).__name__}.{name}')
+        source = field.source_attrs[0]
+        if isinstance(field, serializers.BaseSerializer):
+            getter = compile_nested(serializer, model, name, field, source, prefix, columns)
+        else:
+            column, convert = compile_field(model, name, field, source)
+            columns.append(prefix + column)
+            getter = value_getter(prefix + column, convert)
+        getters.append((name, getter))
+    return Plan(columns, getters, related)
+
+
+def compile_nested(serializer, model, name, field, source, prefix, columns):
+    try:
+        model_field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        raise Unsupported(f'{type(serializer).__name__}.{name}')
+    if isinstance(field, serializers.ListSerializer) or not (model_field.many_to_one or model_field.one_to_one):
+        raise Unsupported(f'{type(serializer).__name__}.{name}')
+    plan = compile_plan(field, f'{prefix}{source}__')
+    if plan.related:
+        raise Unsupported(f'{type(serializer).__name__}.{name}')
+    columns.extend(plan.columns)
+    build = plan.build
+    if not model_field.null and model_field.concrete:
+        return build
+    # A missing related row reads as NULL in every column of the join.
+    present = f'{prefix}{source}__pk'
+    columns.append(present)
+    return lambda row: None if row[present] is None else build(row)
+
+
+def compile_field(model, name, field, source):
+    """
+    (column, converter) of a field read from the model's own columns; the converter is
+    None for values serialized as is.
+    """
+    if source.startswith('get_') and source.endswith('_display'):
+        try:
+            model_field = model._meta.get_field(source[4:-8])
+        except FieldDoesNotExist:
+            raise Unsupported(name)
+        if type(field) is not serializers.CharField or not model_field.flatchoices:
+            raise Unsupported(name)
+        labels = {value: str(label) for value, label in model_field.flatchoices}
+        # Like get_FOO_display(), a value outside the choices shows as itself.
+        return model_field.attname, lambda value: labels.get(value, str(value))
+
+    try:
+        model_field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        raise Unsupported(name)
+    if not model_field.concrete or model_field.many_to_many:
+        raise Unsupported(name)
+    column = source
+    if type(field) in IDENTITY_FIELDS and getattr(field, 'pk_field', None) is None:
+        return column, None
+    if type(field) is serializers.ChoiceField and all(isinstance(key, str) for key in field.choices):
+        return column, None
+    if type(field) is serializers.DateTimeField:
+        return column, datetime_converter(field)
+    return column, field.to_representation
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation() of an aware datetime, with its settings read once.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def value_getter(column, convert):
+    if convert is None:
+        return itemgetter(column)
+
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+# The query parameters api.serializers shapes a payload's fields with.
+SHAPE_PARAMS = ('fields', 'omit', 'expand', 'preview')
+
+plan_cache = LRUTTLCache(max_entries=getattr(settings, 'FAST_SERIALIZER_PLANS', 1000), ttl=24 * 3600)
+
+_MISSING = object()
+
+
+class FastListMixin:
+    """
+    Serve list() from `.values()` rows through a compiled Plan of the viewset's
+    serializer, skipping model instances and DRF's per-field machinery; the payload is
+    the one the serializer would give. Requests whose fields have no plan node (e.g.
+    ?expand=, ?preview=) take the DRF path, as does everything with FAST_SERIALIZERS off.
+
+    Plans are compiled once per serializer and field selection, and kept in plan_cache.
+    """
+
+    def get_fast_plan(self):
+        if not getattr(settings, 'FAST_SERIALIZERS', True):
+            return None
+        key = self.get_fast_plan_key()
+        plan = plan_cache.get(key, _MISSING)
+        if plan is _MISSING:
+            try:
+                plan = compile_plan(self.get_serializer())
+            except Unsupported:
+                plan = None
+            plan_cache.set(key, plan)
+        return plan
+
+    def get_fast_plan_key(self):
+        # Display labels and datetimes are rendered in the active language and time zone.
+        params = self.request.query_params
+        return (
+            type(self), self.action, self.get_serializer_class(), get_language(),
+            timezone.get_current_timezone_name(), *(params.get(name) for name in SHAPE_PARAMS),
+        )
+
+    def get_fast_rows(self, plan):
+        extra = ['id', *(field.lstrip('-') for field in getattr(self.paginator, 'ordering', ()))]
+        return plan.values(self.filter_queryset(self.get_queryset()), extra=extra)
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_fast_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = self.get_fast_rows(plan)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(plan.serialize(rows, request))
+        return self.get_paginated_response(plan.serialize(page, request))
+
+    async def alist(self):
+        plan = self.get_fast_plan()
+        if plan is None:
+            return await super().alist()
+        rows = self.get_fast_rows(plan)
+        page = await self.paginator.apaginate_queryset(rows, self.request, view=self)
+        return self.get_paginated_response(await plan.aserialize(page, self.request))
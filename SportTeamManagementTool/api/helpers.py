@@ -0,0 +1,229 @@
+import csv
+import io
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import exceptions
+
+from .importer import FORMATS as IMPORT_FORMATS
+from .membership import get_team_access
+from .models import Team, Comment, OccurrenceException
+from .recurrence import expand
+
+
+def get_team_access_or_404(request, team_pk):
+    access = get_team_access(request, team_pk)
+    if access is None:
+        raise Http404("No Team matches the given query.")
+    return access
+
+
+def lock_team(pk):
+    """
+    The team `pk` (id and trainer_id only) locked until the end of the current
+    transaction, so writers of its trainer and memberships go one at a time.
+    """
+    if connection.vendor == 'sqlite':
+        # SQLite ignores select_for_update(). A no-op UPDATE as the transaction's first
+        # statement takes the database write lock, so concurrent writers wait for it (up
+        # to the busy timeout) instead of failing to upgrade a read lock. Reads elsewhere
+        # keep their shared lock.
+        Team.objects.filter(pk=pk).update(trainer_id=F('trainer_id'))
+    return get_object_or_404(Team.objects.select_for_update().only('id', 'trainer_id'), pk=pk)
+
+
+def get_bounded_param(request, name, default, maximum):
+    """
+    Integer query parameter clamped to [0, maximum], or `default` when missing or malformed.
+    """
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+    return max(0, min(value, maximum))
+
+
+def parse_moment(request, name, required=True):
+    """
+    Aware datetime from an ISO 8601 date or datetime query parameter; dates mean midnight
+    in the current time zone.
+    """
+    raw = request.query_params.get(name)
+    if not raw:
+        if required:
+            raise exceptions.ValidationError({name: "This query parameter is required."})
+        return None
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            value = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        value = None
+    if value is None:
+        raise exceptions.ValidationError({name: "Expected an ISO 8601 date or datetime."})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def parse_window(request, required=True, max_days=None):
+    """
+    The half-open [from, to) window of a calendar request.
+    """
+    start, end = parse_moment(request, 'from', required), parse_moment(request, 'to', required)
+    if start and end and end <= start:
+        raise exceptions.ValidationError({'to': "Must be later than 'from'."})
+    if max_days and end - start > timedelta(days=max_days):
+        raise exceptions.ValidationError({'to': f"The window cannot exceed {max_days} days."})
+    return start, end
+
+
+def filter_window(queryset, start, end):
+    # A plain range on start_time, so each team is read as one slice of the
+    # (team, start_time, id) index.
+    if start:
+        queryset = queryset.filter(start_time__gte=start)
+    if end:
+        queryset = queryset.filter(start_time__lt=end)
+    return queryset
+
+
+def filter_series(queryset, start, end):
+    """
+    Recurring events whose rule can have occurrences in [start, end).
+    """
+    queryset = queryset.filter(recurrence__isnull=False).select_related('recurrence')
+    if end:
+        queryset = queryset.filter(start_time__lt=end)
+    if start:
+        queryset = queryset.filter(Q(recurrence__until__isnull=True) | Q(recurrence__until__gte=start))
+    return queryset
+
+
+def events_between(queryset, start, end, limit=None):
+    """
+    Single events and occurrences of recurring events starting in [start, end), ordered
+    by start time and cut to `limit`. Takes two queries plus one for the exceptions of
+    the matching series, however many occurrences the window holds.
+    """
+    overrides = OccurrenceException.objects.filter(
+        Q(original_start__gte=start, original_start__lt=end) | Q(start_time__gte=start, start_time__lt=end)
+    )
+    series = filter_series(queryset, start, end).prefetch_related(
+        Prefetch('occurrence_exceptions', queryset=overrides, to_attr='window_exceptions')
+    )
+    # Joining the (missing) rule caches its absence for the serializer.
+    singles = filter_window(
+        queryset.filter(recurrence__isnull=True).select_related('recurrence'), start, end
+    ).order_by('start_time', 'id')
+    events = list(singles[:limit] if limit else singles)
+    for event in series:
+        events.extend(expand(event, start, end, event.window_exceptions))
+    events.sort(key=lambda event: (event.start_time, event.pk))
+    return events[:limit] if limit else events
+
+
+def export_window(queryset, start, end):
+    """
+    Events to export for [start, end): single events starting in it and the series that
+    can have occurrences in it, which are exported as rules.
+    """
+    if not start and not end:
+        return queryset
+    return filter_window(queryset.filter(recurrence__isnull=True), start, end) | filter_series(queryset, start, end)
+
+
+def find_conflicts(events):
+    """
+    Set `conflicts` on each event (sorted by start_time) to the ids of the events it
+    overlaps with, in one sweep that only keeps the still-running events around. Events
+    without an end time take no time.
+    """
+    running = []
+    for event in events:
+        event.conflicts = []
+        end = event.end_time or event.start_time
+        running = [other for other in running if (other.end_time or other.start_time) > event.start_time]
+        for other in running:
+            # Occurrences of one series share their event's id.
+            if end > other.start_time and other.pk not in event.conflicts:
+                other.conflicts.append(event.pk)
+                event.conflicts.append(other.pk)
+        running.append(event)
+    return events
+
+
+def read_member_rows(request):
+    """
+    [{'username', 'role'}] rows of a bulk membership request: a JSON list (or {"members":
+    [...]}) or a CSV upload in `file` with a `username` and an optional `role` column.
+    """
+    upload = request.FILES.get('file')
+    if upload is not None:
+        try:
+            text = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise exceptions.ValidationError({'file': "The CSV file must be UTF-8 encoded."})
+        reader = csv.DictReader(io.StringIO(text))
+        if 'username' not in (reader.fieldnames or []):
+            raise exceptions.ValidationError({'file': "The CSV file needs a 'username' header."})
+        rows = [{'username': row.get('username'), 'role': row.get('role')} for row in reader]
+    else:
+        rows = request.data.get('members') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise exceptions.ValidationError({'members': "Expected a list of {username, role} objects."})
+
+    max_rows = getattr(settings, 'BULK_MEMBERS_MAX_ROWS', 1000)
+    if not rows:
+        raise exceptions.ValidationError({'members': "No rows to add."})
+    if len(rows) > max_rows:
+        raise exceptions.ValidationError({'members': f"At most {max_rows} rows can be added per request."})
+    return rows
+
+
+def read_import_input(request):
+    """
+    (byte lines, format) of a bulk import: a `file` upload or the raw request body, read
+    lazily either way. The format is ?as=ndjson|csv, or else guessed from the upload's
+    name or the body's content type.
+    """
+    upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+    if upload is not None:
+        lines, guessed = upload, 'csv' if upload.name.lower().endswith('.csv') else 'ndjson'
+    else:
+        # The body is read line by line from request.stream (None for an empty body); DRF's
+        # parsers would read it whole.
+        lines = request.stream or ()
+        guessed = 'csv' if request.content_type.startswith('text/csv') else 'ndjson'
+    input_format = request.query_params.get('as', guessed)
+    if input_format not in IMPORT_FORMATS:
+        raise exceptions.ValidationError(
+            {'as': f"Unknown format: {input_format}. Use {', '.join(IMPORT_FORMATS)}."}
+        )
+    return lines, input_format
+
+
+def select_serialized(queryset, selection, *relations):
+    """
+    select_related() the `relations` of which `selection` (a serializers.FieldSelection)
+    serializes more than the id.
+    """
+    relations = [relation for relation in relations if selection.needs(relation)]
+    return queryset.select_related(*relations) if relations else queryset
+
+
+def annotate_comments_count(queryset):
+    # A correlated count keeps the outer query free of GROUP BY, so a feed page can be
+    # read straight off the (team, -created_at, -id) index without a sort.
+    comments_count = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        count=Count('id')
+    ).values('count')
+    return queryset.annotate(comments_count=Coalesce(Subquery(comments_count), 0))
@@ -0,0 +1,201 @@
+import calendar
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .recurrence import WEEKDAYS, Occurrence
+from .streaming import streaming_response
+
+PRODID = '-//SportTeamManagementTool//Team calendar//EN'
+
+
+def escape_text(value):
+    """
+    Escape a TEXT property value (RFC 5545, 3.3.11).
+    """
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def format_datetime(value):
+    """
+    A UTC date-time, as DTSTAMP and the UNTIL of a rule must be written.
+    """
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def local_datetime(name, value, tz):
+    """
+    A date-time property in the wall-clock time of `tz`. Series are expanded in local time
+    (see api.recurrence.rule_starts), so their DTSTART must be too for calendar apps to
+    keep occurrences at the same hour across DST changes.
+    """
+    return f"{name};TZID={tz}:{value.astimezone(tz).strftime('%Y%m%dT%H%M%S')}"
+
+
+def format_offset(offset):
+    minutes = int(offset.total_seconds()) // 60
+    return f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02}{abs(minutes) % 60:02}"
+
+
+def nth_weekday(year, month, weekday, ordinal):
+    """
+    The `ordinal`-th `weekday` (Monday is 0) of the month, counted from the end when negative.
+    """
+    if ordinal > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (ordinal - 1))
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def timezone_lines(tz, year):
+    """
+    Content lines of the VTIMEZONE of `tz`. Its UTC offset changes in `year` are written as
+    yearly rules (e.g. the last Sunday of March) starting in 1970; a zone without changes
+    gets a single STANDARD observance.
+    """
+    yield 'BEGIN:VTIMEZONE'
+    yield f'TZID:{tz}'
+    start = datetime(year, 1, 1, tzinfo=dt_timezone.utc)
+    before = start.astimezone(tz)
+    changed = False
+    for hour in range(1, 365 * 24):
+        after = (start + timedelta(hours=hour)).astimezone(tz)
+        if after.utcoffset() == before.utcoffset():
+            continue
+        changed = True
+        # The wall-clock time the change happens at, in the offset it changes from.
+        wall = (after.astimezone(dt_timezone.utc) + before.utcoffset()).replace(tzinfo=None)
+        ordinal = -1 if wall.day + 7 > calendar.monthrange(year, wall.month)[1] else (wall.day - 1) // 7 + 1
+        first = datetime.combine(nth_weekday(1970, wall.month, wall.weekday(), ordinal), wall.time())
+        kind = 'DAYLIGHT' if after.dst() else 'STANDARD'
+        yield f'BEGIN:{kind}'
+        yield f"DTSTART:{first.strftime('%Y%m%dT%H%M%S')}"
+        yield f'RRULE:FREQ=YEARLY;BYMONTH={wall.month};BYDAY={ordinal}{WEEKDAYS[wall.weekday()]}'
+        yield f'TZOFFSETFROM:{format_offset(before.utcoffset())}'
+        yield f'TZOFFSETTO:{format_offset(after.utcoffset())}'
+        yield f'TZNAME:{after.tzname()}'
+        yield f'END:{kind}'
+        before = after
+    if not changed:
+        yield 'BEGIN:STANDARD'
+        yield 'DTSTART:19700101T000000'
+        yield f'TZOFFSETFROM:{format_offset(before.utcoffset())}'
+        yield f'TZOFFSETTO:{format_offset(before.utcoffset())}'
+        yield f'TZNAME:{before.tzname()}'
+        yield 'END:STANDARD'
+    yield 'END:VTIMEZONE'
+
+
+def fold(line):
+    """
+    Split a content line into CRLF-terminated chunks of at most 75 octets, continuation
+    lines starting with a space, without cutting a multi-byte character in two.
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    chunks = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Back off to the start of a UTF-8 sequence.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(chunks) + '\r\n'
+
+
+def format_rule(rule):
+    parts = [f'FREQ={rule.frequency}']
+    if rule.interval > 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.weekdays:
+        parts.append(f'BYDAY={rule.weekdays}')
+    if rule.count:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until:
+        parts.append(f'UNTIL={format_datetime(rule.until)}')
+    return ';'.join(parts)
+
+
+def event_lines(event, domain, tz, occurrence=None):
+    """
+    Content lines of a VEVENT: a single event, the master of a series (with its RRULE and
+    cancelled dates), or a modified occurrence of one (`occurrence`, an OccurrenceException
+    applied to `event` by api.recurrence.Occurrence). Times are local to `tz`.
+    """
+    source = occurrence or event
+    recurrence = getattr(event, 'recurrence', None)
+    yield 'BEGIN:VEVENT'
+    yield f'UID:event-{event.pk}@{domain}'
+    yield f'DTSTAMP:{format_datetime(event.updated_at)}'
+    if occurrence is not None:
+        yield local_datetime('RECURRENCE-ID', occurrence.original_start, tz)
+    yield local_datetime('DTSTART', source.start_time, tz)
+    if source.end_time:
+        yield local_datetime('DTEND', source.end_time, tz)
+    if recurrence is not None and occurrence is None:
+        yield f'RRULE:{format_rule(recurrence)}'
+        for exception in event.occurrence_exceptions.all():
+            if exception.cancelled:
+                yield local_datetime('EXDATE', exception.original_start, tz)
+    yield f'SUMMARY:{escape_text(source.title)}'
+    if source.description:
+        yield f'DESCRIPTION:{escape_text(source.description)}'
+    if source.location:
+        yield f'LOCATION:{escape_text(source.location)}'
+    yield f'CATEGORIES:{escape_text(event.team.name)}'
+    yield 'END:VEVENT'
+
+
+def event_block(event, domain, tz):
+    lines = list(event_lines(event, domain, tz))
+    if getattr(event, 'recurrence', None) is not None:
+        for exception in event.occurrence_exceptions.all():
+            if not exception.cancelled:
+                lines += event_lines(event, domain, tz, Occurrence(event, exception.original_start, exception))
+    return ''.join(fold(line) for line in lines)
+
+
+def iter_calendar(events, name, domain, tz):
+    """
+    Yield an iCalendar document for `events` (an iterable of Event with `team`,
+    `recurrence` and `occurrence_exceptions` loaded), one event at a time, so the caller
+    decides how many rows are held in memory. Recurring events are written as rules, and
+    times in the wall-clock time of `tz`, described by a VTIMEZONE.
+    """
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold(f'PRODID:{PRODID}')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold(f'X-WR-CALNAME:{escape_text(name)}')
+    yield ''.join(fold(line) for line in timezone_lines(tz, timezone.now().year))
+    for event in events:
+        yield event_block(event, domain, tz)
+    yield fold('END:VCALENDAR')
+
+
+def calendar_response(request, queryset, name, filename, chunk_size):
+    """
+    Stream `queryset` as an .ics attachment, reading it with iterator(chunk_size) so a
+    season of tens of thousands of events is never materialized. Exceptions of recurring
+    events are prefetched once per chunk. Times are written in the time zone active for
+    the request, taken here since the rows are streamed after the view returns.
+    """
+    events = queryset.select_related('team', 'recurrence').only(
+        'id', 'title', 'description', 'location', 'start_time', 'end_time', 'updated_at', 'team__name',
+        'recurrence__frequency', 'recurrence__interval', 'recurrence__weekdays', 'recurrence__count',
+        'recurrence__until',
+    ).prefetch_related('occurrence_exceptions').iterator(chunk_size=chunk_size)
+    response = streaming_response(
+        request, iter_calendar(events, name, request.get_host().split(':')[0], timezone.get_current_timezone()),
+        content_type='text/calendar; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,392 @@
+import codecs
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.db.models import Exists, OuterRef
+
+from .cache import LRUTTLCache
+from .membership import invalidate_membership
+from .models import User, TeamMembership, Post, Comment, Event, SearchDocument
+from .response_cache import response_cache
+from .search import comment_fields, event_fields, post_fields
+from .serializers import (
+    MembershipImportSerializer, PostImportSerializer, CommentImportSerializer, EventImportSerializer,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Record types and their serializers, in the order a chunk writes them, so that a
+# membership makes its user an author for the posts of the same chunk.
+RECORD_TYPES = {
+    'membership': MembershipImportSerializer,
+    'post': PostImportSerializer,
+    'comment': CommentImportSerializer,
+    'event': EventImportSerializer,
+}
+
+FORMATS = ('ndjson', 'csv')
+
+# Invalid records reported in full; the others are only counted.
+MAX_REPORTED_ERRORS = 100
+
+_MISSING = object()
+
+
+class Unreadable(str):
+    """
+    An input record that could not be parsed, as the reason.
+    """
+
+
+class ImportStopped(Exception):
+    """
+    An import ended before the end of its input, on unreadable input (`input_error`) or
+    a failed write. `report` is TeamImport.report(): every record up to its `committed`
+    position is in the database, and the import resumes with start=committed.
+    """
+
+    def __init__(self, report, error, input_error):
+        super().__init__(str(error))
+        self.report = report
+        self.input_error = input_error
+
+
+def read_ndjson(lines):
+    """
+    Records of NDJSON input given as byte lines: one JSON object with a `type` per
+    line. Blank lines are skipped; a line that is not an object gives an Unreadable.
+    """
+    loads = orjson.loads if orjson is not None else json.loads
+    for line in codecs.iterdecode(lines, 'utf-8-sig'):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError:
+            yield Unreadable("Invalid JSON.")
+            continue
+        yield record if isinstance(record, dict) else Unreadable("Expected a JSON object.")
+
+
+def read_csv(lines, record_type=None):
+    """
+    Records of CSV input given as byte lines, with a header naming the fields and a
+    `type` column unless all rows have `record_type`. Empty cells are left out, so
+    optional fields get their defaults. Comments are rows with a `post` id.
+    """
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+    for row in reader:
+        record = {name: value for name, value in row.items() if name and value not in ('', None)}
+        record.setdefault('type', record_type)
+        yield record
+
+
+def read_records(lines, input_format, record_type=None):
+    if input_format == 'csv':
+        return read_csv(lines, record_type)
+    return read_ndjson(lines)
+
+
+class TeamImport:
+    """
+    Load records (see read_records) into a team in chunks of `chunk_size`. Each chunk is
+    validated with one serializer call per record type, its usernames resolved with one
+    query for those not seen before, and written with bulk_create in one transaction,
+    search documents included. Invalid records are skipped and reported.
+
+    Positions count records from 1; a run can start after the first `start` records to
+    resume an import from the `committed` position of its report. What a chunk adds to
+    the report and the user cache is merged only once its transaction commits.
+    """
+
+    def __init__(self, team, chunk_size=1000, user_cache_size=10000):
+        self.team = team
+        self.chunk_size = chunk_size
+        # username -> (user id, is a member of the team), or None for unknown users.
+        self.users = LRUTTLCache(max_entries=user_cache_size, ttl=24 * 3600)
+        self.created = {name: 0 for name in ('memberships', 'posts', 'comments', 'events')}
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []
+        self.start = self.committed = 0
+        self.elapsed = 0.0
+        self.chunk_users = {}
+        self.new_chunk()
+
+    def new_chunk(self):
+        # The current chunk's share of the report, and the user cache entries it learned.
+        self.chunk_skipped = 0
+        self.chunk_errors = []
+        self.chunk_invalid = 0
+        self.chunk_cached = {}
+
+    def merge_chunk(self, created):
+        for name, objects in created.items():
+            self.created[name] += len(objects)
+        self.skipped += self.chunk_skipped
+        self.invalid += self.chunk_invalid
+        self.errors += self.chunk_errors[:MAX_REPORTED_ERRORS - len(self.errors)]
+        for username, user in self.chunk_cached.items():
+            self.users.set(username, user)
+
+    def run(self, records, start=0, on_chunk=None):
+        """
+        Import `records` after the first `start`, call `on_chunk(report)` after each
+        committed chunk, and return the final report. Raises ImportStopped.
+        """
+        self.start = self.committed = start
+        started = time.monotonic()
+        records = islice(records, start, None)
+        try:
+            while True:
+                try:
+                    chunk = list(islice(records, self.chunk_size))
+                except (ValueError, csv.Error) as exc:
+                    raise ImportStopped(self.report(), exc, input_error=True) from exc
+                if not chunk:
+                    break
+                try:
+                    self.import_chunk(list(enumerate(chunk, start=self.committed + 1)))
+                except DatabaseError as exc:
+                    raise ImportStopped(self.report(), exc, input_error=False) from exc
+                self.committed += len(chunk)
+                self.elapsed = time.monotonic() - started
+                if on_chunk is not None:
+                    on_chunk(self.report())
+        finally:
+            self.elapsed = time.monotonic() - started
+        return self.report()
+
+    def report(self):
+        processed = self.committed - self.start
+        return {
+            'committed': self.committed,
+            'created': dict(self.created),
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'errors': sorted(self.errors, key=lambda error: error['record']),
+            'elapsed': round(self.elapsed, 3),
+            'records_per_second': round(processed / self.elapsed) if self.elapsed else None,
+        }
+
+    def reject(self, position, errors):
+        self.chunk_invalid += 1
+        if len(self.errors) + len(self.chunk_errors) < MAX_REPORTED_ERRORS:
+            self.chunk_errors.append({'record': position, 'errors': errors})
+
+    def validate(self, chunk):
+        """
+        {record type: [(position, validated data)]} of the chunk's valid records.
+        """
+        by_type = {record_type: [] for record_type in RECORD_TYPES}
+        for position, record in chunk:
+            if isinstance(record, Unreadable):
+                self.reject(position, {'non_field_errors': [str(record)]})
+            elif record.get('type') not in RECORD_TYPES:
+                self.reject(position, {'type': [f"Unknown record type. Use {', '.join(RECORD_TYPES)}."]})
+            else:
+                by_type[record['type']].append((position, record))
+        return {
+            record_type: self.validate_records(RECORD_TYPES[record_type], records)
+            for record_type, records in by_type.items()
+        }
+
+    def validate_records(self, serializer_class, records):
+        serializer = serializer_class(data=[record for _, record in records], many=True)
+        if not serializer.is_valid():
+            # A list serializer keeps no data once a record fails, so the others are
+            # validated again without it.
+            for (position, _), errors in zip(records, serializer.errors):
+                if errors:
+                    self.reject(position, errors)
+            records = [record for record, errors in zip(records, serializer.errors) if not errors]
+            serializer = serializer_class(data=[record for _, record in records], many=True)
+            serializer.is_valid(raise_exception=True)
+        return [(position, data) for (position, _), data in zip(records, serializer.validated_data)]
+
+    def resolve_users(self, valid):
+        """
+        {username: (user id, is a member) or None} of the users the chunk names, loading
+        those not cached yet with one query.
+        """
+        usernames = set()
+        for records in valid.values():
+            for _, data in records:
+                usernames.update(data[name] for name in ('user', 'author', 'trainer') if data.get(name))
+                usernames.update(comment['author'] for comment in data.get('comments', ()))
+        users, missing = {}, []
+        for username in usernames:
+            user = self.users.get(username, _MISSING)
+            if user is _MISSING:
+                missing.append(username)
+            else:
+                users[username] = user
+        if missing:
+            rows = User.objects.filter(username__in=missing).annotate(
+                is_member=Exists(TeamMembership.objects.filter(team=self.team, user=OuterRef('pk')))
+            ).values_list('username', 'id', 'is_member')
+            found = {username: (user_id, is_member) for username, user_id, is_member in rows}
+            for username in missing:
+                users[username] = self.chunk_cached[username] = found.get(username)
+        return users
+
+    def member_id(self, position, username, field):
+        """
+        The id of a member of the team, or None after rejecting the record.
+        """
+        user = self.chunk_users.get(username)
+        if user is None:
+            self.reject(position, {field: ["User not found."]})
+            return None
+        if not user[1]:
+            self.reject(position, {field: ["User is not a member of this team."]})
+            return None
+        return user[0]
+
+    def import_chunk(self, chunk):
+        self.new_chunk()
+        valid = self.validate(chunk)
+        self.chunk_users = self.resolve_users(valid)
+        memberships = self.build_memberships(valid['membership'])
+        posts, post_comments = self.build_posts(valid['post'])
+        comments = self.build_comments(valid['comment'])
+        events = self.build_events(valid['event'])
+
+        with transaction.atomic():
+            TeamMembership.objects.bulk_create(memberships)
+            Post.objects.bulk_create(posts)
+            for post, nested in zip(posts, post_comments):
+                for comment in nested:
+                    comment.post_id = post.pk
+                comments.extend(nested)
+            Comment.objects.bulk_create(comments)
+            Event.objects.bulk_create(events)
+            for objects in (memberships, posts, comments, events):
+                restore_timestamps(objects)
+            # bulk_create sends no post_save, so index what api/signals.py would have.
+            Kind = SearchDocument.Kind
+            SearchDocument.objects.bulk_create(
+                [SearchDocument(kind=Kind.POST, object_id=post.pk, **post_fields(post)) for post in posts]
+                + [
+                    SearchDocument(kind=Kind.COMMENT, object_id=comment.pk, **comment_fields(comment, self.team.pk))
+                    for comment in comments
+                ]
+                + [SearchDocument(kind=Kind.EVENT, object_id=event.pk, **event_fields(event)) for event in events]
+            )
+
+        for membership in memberships:
+            invalidate_membership(membership.user_id, self.team.pk)
+        if memberships or posts or comments or events:
+            response_cache.bump(self.team.pk)
+        self.merge_chunk({'memberships': memberships, 'posts': posts, 'comments': comments, 'events': events})
+
+    def build_memberships(self, records):
+        memberships = []
+        for position, data in records:
+            user = self.chunk_users.get(data['user'])
+            if user is None:
+                self.reject(position, {'user': ["User not found."]})
+            elif user[1]:
+                # Importing the same records twice adds nothing.
+                self.chunk_skipped += 1
+            else:
+                memberships.append(timestamped(TeamMembership(
+                    team=self.team, user_id=user[0], role=data.get('role', TeamMembership.Role.MEMBER)
+                ), data, 'joined_at'))
+                # The user can author the chunk's posts, and is added once.
+                self.chunk_users[data['user']] = self.chunk_cached[data['user']] = (user[0], True)
+        return memberships
+
+    def build_posts(self, records):
+        """
+        The posts and, for each, its unsaved comments.
+        """
+        posts, post_comments = [], []
+        for position, data in records:
+            author_id = self.member_id(position, data['author'], 'author')
+            if author_id is None:
+                continue
+            comments = []
+            for index, comment in enumerate(data.get('comments', ())):
+                comment_author_id = self.member_id(position, comment['author'], f'comments.{index}.author')
+                if comment_author_id is None:
+                    break
+                comments.append(timestamped(Comment(author_id=comment_author_id, content=comment['content']), comment))
+            else:
+                posts.append(timestamped(
+                    Post(team=self.team, author_id=author_id, title=data['title'], content=data['content']), data
+                ))
+                post_comments.append(comments)
+        return posts, post_comments
+
+    def build_comments(self, records):
+        post_ids = {data['post'] for _, data in records if 'post' in data}
+        team_posts = set(
+            Post.objects.filter(team=self.team, pk__in=post_ids).values_list('pk', flat=True)
+        ) if post_ids else set()
+        comments = []
+        for position, data in records:
+            if 'post' not in data:
+                self.reject(position, {'post': ["This field is required."]})
+            elif data['post'] not in team_posts:
+                self.reject(position, {'post': ["No post of this team has this id."]})
+            else:
+                author_id = self.member_id(position, data['author'], 'author')
+                if author_id is not None:
+                    comments.append(timestamped(
+                        Comment(post_id=data['post'], author_id=author_id, content=data['content']), data
+                    ))
+        return comments
+
+    def build_events(self, records):
+        events = []
+        for position, data in records:
+            if 'trainer' in data:
+                trainer_id = self.member_id(position, data['trainer'], 'trainer')
+            elif self.team.trainer_id is None:
+                self.reject(position, {'trainer': ["This field is required, the team has no trainer."]})
+                trainer_id = None
+            else:
+                trainer_id = self.team.trainer_id
+            if trainer_id is None:
+                continue
+            fields = {name: data[name] for name in EVENT_FIELDS if name in data}
+            events.append(timestamped(Event(team=self.team, trainer_id=trainer_id, **fields), data))
+        return events
+
+
+EVENT_FIELDS = ('title', 'description', 'start_time', 'end_time', 'location')
+
+
+def timestamped(obj, data, *fields):
+    """
+    Keep the timestamps a record gives (created_at and updated_at by default) on its
+    unsaved object, for restore_timestamps(). A record with only a creation time was
+    last updated then.
+    """
+    stamps = {name: data[name] for name in fields or ('created_at', 'updated_at') if name in data}
+    if 'created_at' in stamps:
+        stamps.setdefault('updated_at', stamps['created_at'])
+    obj._imported_timestamps = stamps
+    return obj
+
+
+def restore_timestamps(objects):
+    """
+    Write back the timestamps of timestamped() objects once they are created: bulk_create
+    sets auto_now(_add) fields to the current time, bulk_update writes them as given.
+    """
+    stamped = [obj for obj in objects if obj._imported_timestamps]
+    if not stamped:
+        return
+    fields = set().union(*(obj._imported_timestamps for obj in stamped))
+    for obj in stamped:
+        for name, value in obj._imported_timestamps.items():
+            setattr(obj, name, value)
+    type(stamped[0]).objects.bulk_update(stamped, sorted(fields))
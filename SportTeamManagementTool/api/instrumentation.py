@@ -0,0 +1,192 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.performance')
+
+_recorder = ContextVar('performance_recorder', default=None)
+
+
+class RequestRecorder:
+    """
+    Per-request timings, plus a database execute wrapper that counts and times every query.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.depth = Counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - started
+            self.query_count += 1
+            self.statements[sql] += 1
+
+    @contextmanager
+    def timer(self, name):
+        # Re-entrant: only the outermost block of a given name is counted, so nested
+        # serializers or permission checks are not added up twice.
+        self.depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[name] -= 1
+            if not self.depth[name]:
+                self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def duplicated_queries(self, limit=5):
+        return [(sql, count) for sql, count in self.statements.most_common(limit) if count > 1]
+
+
+@contextmanager
+def timed(name):
+    """
+    Time a block under `name` for the current request; a no-op when the request is not sampled.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.timer(name):
+        yield
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def watch_connections():
+    """
+    Make this thread's connections report their queries to the recorder of whichever
+    request runs them. Async views query from worker threads that serve many requests,
+    so the recorder is looked up in the (request's) context rather than bound per call.
+    """
+    for connection in connections.all():
+        if _record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_record_query)
+
+
+class PerformanceMiddleware:
+    """
+    Measure a sample of requests (PERF_SAMPLE_RATE) and report query count and time,
+    serializer time, permission-check time and total time as a Server-Timing header and a
+    structured log line. Requests over PERF_SLOW_QUERY_COUNT queries or PERF_SLOW_REQUEST_MS
+    are logged as warnings with their most duplicated SQL. Unsampled requests pay for a
+    single random() call.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+        self.slow_query_count = getattr(settings, 'PERF_SLOW_QUERY_COUNT', 50)
+        self.slow_request_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', 500)
+        # Under ASGI, a sync-only middleware would push every view into a worker thread.
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = RequestRecorder()
+        token = _recorder.set(recorder)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+
+        total = time.perf_counter() - recorder.started
+        self.report(request, response, recorder, total)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        recorder = RequestRecorder()
+        token = _recorder.set(recorder)
+        try:
+            await sync_to_async(watch_connections)()
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+
+        total = time.perf_counter() - recorder.started
+        self.report(request, response, recorder, total)
+        return response
+
+    def report(self, request, response, recorder, total):
+        timings = {'db': recorder.query_time, **recorder.timings, 'total': total}
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.2f}' + (f';desc="{recorder.query_count} queries"' if name == 'db' else '')
+            for name, seconds in timings.items()
+        )
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.query_count,
+            **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in timings.items()},
+        }
+        slow = recorder.query_count > self.slow_query_count or total * 1000 > self.slow_request_ms
+        if slow:
+            record['duplicated_sql'] = [
+                {'sql': sql, 'count': count} for sql, count in recorder.duplicated_queries()
+            ]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+class InstrumentedViewMixin:
+    """
+    Report permission-check and serializer time of a DRF view to PerformanceMiddleware.
+    """
+
+    def check_permissions(self, request):
+        with timed('permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed('permissions'):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _recorder.get() is not None:
+            to_representation = serializer.to_representation
+
+            def timed_to_representation(instance):
+                with timed('serialize'):
+                    return to_representation(instance)
+
+            serializer.to_representation = timed_to_representation
+        return serializer
@@ -0,0 +1,133 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.benchmark import BenchmarkRunner, build_routes
+from api.benchmark.routes import BenchmarkContext
+from api.models import User, Team, TeamMembership, Post, Comment, Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API route through the Django test client and report p50/p95/p99 latency, "
+        "queries per request and bytes per response. By default a throwaway test database is created "
+        "and seeded, so the configured database is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Measured calls per route.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured calls per route before measuring.")
+        parser.add_argument('--route', action='append', dest='routes', help="Only run this route (repeatable).")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Print the change against a previous JSON results file.")
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Benchmark the configured database instead of a throwaway test database (implies --no-seed).",
+        )
+        parser.add_argument('--no-seed', action='store_true', help="Do not seed; benchmark the data already there.")
+        parser.add_argument('--password', default='password', help="Password of the seeded users.")
+        for name, default in [
+            ('users', 2000), ('teams', 50), ('memberships', 10000), ('posts', 5000), ('comments', 50000),
+            ('events', 5000),
+        ]:
+            parser.add_argument(f'--{name}', type=int, default=default, help=f"Seeded {name} (default {default}).")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        old_name = None
+        if not options['use_existing_db']:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            if not options['use_existing_db'] and not options['no_seed']:
+                call_command(
+                    'seed', stdout=self.stdout, seed=options['seed'], password=options['password'],
+                    **{name: options[name] for name in ('users', 'teams', 'memberships', 'posts', 'comments', 'events')}
+                )
+            results = self.run_benchmark(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.print_results(results, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+                output.write('\n')
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run_benchmark(self, options):
+        context = self.build_context(options)
+        return {
+            'meta': self.get_meta(options, context),
+            'routes': self.run_routes(build_routes(context), options),
+        }
+
+    def get_pool_size(self, options):
+        # Write routes use a fresh outsider (and logout token) on every call.
+        return options['warmup'] + options['iterations']
+
+    def build_context(self, options):
+        pool_size = self.get_pool_size(options)
+        try:
+            context = BenchmarkContext(options['password'], pool_size)
+        except ValueError as error:
+            raise CommandError(str(error))
+        if len(context.outsiders) < pool_size or len(context.logout_tokens) < pool_size:
+            raise CommandError(f"Need at least {pool_size * 2} users outside the benchmarked team; seed more users.")
+        return context
+
+    def run_routes(self, routes, options):
+        runner = BenchmarkRunner(iterations=options['iterations'], warmup=options['warmup'])
+        return runner.run(routes, only=options['routes'])
+
+    def get_meta(self, options, context):
+        return {
+            'commit': self.git_commit(),
+            'database': connection.vendor,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'debug': settings.DEBUG,
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'dataset': {
+                'users': User.objects.count(), 'teams': Team.objects.count(),
+                'memberships': TeamMembership.objects.count(), 'posts': Post.objects.count(),
+                'comments': Comment.objects.count(), 'events': Event.objects.count(),
+                'benchmarked_team_members': context.team.size,
+            },
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_results(self, results, compare_path):
+        baseline = {}
+        if compare_path:
+            with open(compare_path) as compare_file:
+                baseline = json.load(compare_file).get('routes', {})
+
+        header = f"{'route':<26} {'status':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'bytes':>9}"
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        for name, result in results['routes'].items():
+            latency = result['latency_ms']
+            line = (
+                f"{name:<26} {','.join(map(str, result['status'])):<10} {latency['p50']:>9.2f} "
+                f"{latency['p95']:>9.2f} {latency['p99']:>9.2f} {result['queries']['mean']:>8.1f} "
+                f"{result['bytes']['mean']:>9.0f}"
+            )
+            previous = baseline.get(name)
+            if previous:
+                change = (latency['p50'] / previous['latency_ms']['p50'] - 1) * 100 if previous['latency_ms']['p50'] else 0
+                line += (
+                    f"   p50 {change:+.0f}%, queries {result['queries']['mean'] - previous['queries']['mean']:+.1f}"
+                )
+            self.stdout.write(line)
@@ -0,0 +1,54 @@
+import json
+
+from api.benchmark import ConcurrentRunner
+from api.benchmark.concurrency import MODES
+
+from .benchmark import Command as BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Load the read endpoints with concurrent clients served as WSGI (a thread per client), as ASGI "
+        "with the DRF views, and as ASGI with the async views (api.async_views), and report requests/sec "
+        "and p50/p99 latency of each. Dataset options are those of the benchmark command."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--concurrency', type=int, default=16, help="Simultaneous clients.")
+        parser.add_argument('--mode', action='append', dest='modes', choices=MODES, help="Only this mode (repeatable).")
+        parser.set_defaults(iterations=400, warmup=20)
+
+    def get_pool_size(self, options):
+        # Only read routes run, so no outsiders are consumed.
+        return 0
+
+    def run_routes(self, routes, options):
+        runner = ConcurrentRunner(
+            iterations=options['iterations'], warmup=options['warmup'], concurrency=options['concurrency']
+        )
+        return runner.run(routes, only=options['routes'], modes=options['modes'] or MODES)
+
+    def get_meta(self, options, context):
+        return {**super().get_meta(options, context), 'concurrency': options['concurrency']}
+
+    def print_results(self, results, compare_path):
+        baseline = {}
+        if compare_path:
+            with open(compare_path) as compare_file:
+                baseline = json.load(compare_file).get('routes', {})
+
+        header = f"{'route':<26} {'mode':<11} {'status':<10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}"
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        for name, modes in results['routes'].items():
+            for mode, result in modes.items():
+                latency = result['latency_ms']
+                line = (
+                    f"{name:<26} {mode:<11} {','.join(map(str, result['status'])):<10} "
+                    f"{result['requests_per_second']:>9.1f} {latency['p50']:>9.2f} {latency['p99']:>9.2f}"
+                )
+                previous = baseline.get(name, {}).get(mode)
+                if previous and previous['requests_per_second']:
+                    change = (result['requests_per_second'] / previous['requests_per_second'] - 1) * 100
+                    line += f"   req/s {change:+.0f}%"
+                self.stdout.write(line)
@@ -0,0 +1,60 @@
+import json
+
+from api.benchmark import SerializationRunner
+
+from .benchmark import Command as BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Compare the CPU time per serialized object of the team, post, event and comment lists built by "
+        "their DRF serializers and by api.fast_serializers, and check both give the same response body. "
+        "Dataset options are those of the benchmark command."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--page-size', type=int, default=100, help="Objects per serialized page.")
+
+    def get_pool_size(self, options):
+        # Only read routes run, so no outsiders are consumed.
+        return 0
+
+    def run_routes(self, routes, options):
+        runner = SerializationRunner(
+            iterations=options['iterations'], warmup=options['warmup'], page_size=options['page_size']
+        )
+        return runner.run(routes, only=options['routes'])
+
+    def get_meta(self, options, context):
+        return {**super().get_meta(options, context), 'page_size': options['page_size']}
+
+    def print_results(self, results, compare_path):
+        baseline = {}
+        if compare_path:
+            with open(compare_path) as compare_file:
+                baseline = json.load(compare_file).get('routes', {})
+
+        header = (
+            f"{'route':<26} {'objects':>8} {'drf ser us':>11} {'fast ser us':>12} {'ser x':>7} "
+            f"{'drf total us':>13} {'fast total us':>14} {'total x':>8}  identical"
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        self.stdout.write("(CPU microseconds per object; serialize is rows to response body, total adds the queries)")
+        for name, result in results['routes'].items():
+            if result['objects'] is None:
+                self.stdout.write(f"{name:<26} (no fast plan)")
+                continue
+            drf, fast, speedup = result['drf'], result['fast'], result['speedup']
+            line = (
+                f"{name:<26} {result['objects']:>8} {drf['serialize_us_per_object']:>11.2f} "
+                f"{fast['serialize_us_per_object']:>12.2f} {speedup['serialize']:>6.2f}x "
+                f"{drf['total_us_per_object']:>13.2f} {fast['total_us_per_object']:>14.2f} {speedup['total']:>7.2f}x  "
+                f"{'yes' if result['identical'] else 'NO'}"
+            )
+            previous = baseline.get(name, {}).get('fast')
+            if previous and previous['serialize_us_per_object']:
+                change = (fast['serialize_us_per_object'] / previous['serialize_us_per_object'] - 1) * 100
+                line += f"   fast serialize {change:+.0f}%"
+            style = self.style.SUCCESS if result['identical'] else self.style.ERROR
+            self.stdout.write(style(line))
@@ -0,0 +1,112 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from api.models import TeamMembership, Post
+from api.helpers import filter_window
+from api.views import TeamViewSet, TeamMembershipViewSet, PostViewSet, CommentViewSet, EventViewSet, user_events
+
+# "SCAN table" on SQLite, "Seq Scan on table" on PostgreSQL. SQLite's "SCAN table USING
+# [COVERING] INDEX name" walks an index in order (e.g. for ORDER BY), so it is not flagged.
+SEQUENTIAL_SCAN = re.compile(r'\bSCAN\b(?!.*\bUSING (?:COVERING )?INDEX\b)|\bSeq Scan\b')
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queryset behind each API list/detail endpoint, as built by its viewset "
+        "for a sample team member, and report any sequential scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to build the querysets for (default: a trainer of --team).")
+        parser.add_argument('--team', type=int, help="Team id to use (default: the first team with a trainer).")
+        parser.add_argument(
+            '--fail-on-scan', action='store_true', help="Exit with an error if any sequential scan is found."
+        )
+
+    def handle(self, *args, **options):
+        user, team = self.pick_sample(options['user'], options['team'])
+        post = Post.objects.filter(team=team).order_by('-created_at', '-id').first()
+
+        targets = [
+            ('teams list', TeamViewSet, 'list', {}),
+            ('teams discover', TeamViewSet, 'discover', {}),
+            ('teams retrieve', TeamViewSet, 'retrieve', {'pk': team.pk}),
+            ('team members list', TeamMembershipViewSet, 'list', {'team_pk': team.pk}),
+            ('team posts list', PostViewSet, 'list', {'team_pk': team.pk}),
+            ('team events list', EventViewSet, 'list', {'team_pk': team.pk}),
+        ]
+        if post is not None:
+            targets += [
+                ('team posts retrieve', PostViewSet, 'retrieve', {'team_pk': team.pk, 'pk': post.pk}),
+                ('post comments list', CommentViewSet, 'list', {'team_pk': team.pk, 'post_pk': post.pk}),
+            ]
+
+        querysets = [
+            (name, self.build_queryset(viewset_class, action, user, kwargs))
+            for name, viewset_class, action, kwargs in targets
+        ]
+        now = timezone.now()
+        querysets.append((
+            'my calendar', filter_window(user_events(user), now, now + timedelta(days=30)).order_by('start_time', 'id')
+        ))
+
+        self.stdout.write(f"Explaining querysets as {user.username} in team {team.pk} ({team.name})\n")
+        flagged = []
+        for name, queryset in querysets:
+            plan = queryset.explain()
+            scans = [line.strip() for line in plan.splitlines() if SEQUENTIAL_SCAN.search(line)]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if scans:
+                flagged.append(name)
+                for line in scans:
+                    self.stdout.write(self.style.WARNING(f"  sequential scan: {line}"))
+            self.stdout.write('')
+
+        if flagged:
+            message = f"Sequential scans in: {', '.join(flagged)}"
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No sequential scans found."))
+
+    def pick_sample(self, username, team_id):
+        memberships = TeamMembership.objects.select_related('user', 'team').order_by('team_id', 'id')
+        if team_id is not None:
+            memberships = memberships.filter(team_id=team_id)
+        if username is not None:
+            memberships = memberships.filter(user__username=username)
+        else:
+            memberships = memberships.filter(role=TeamMembership.Role.TRAINER)
+
+        membership = memberships.first()
+        if membership is None:
+            raise CommandError("No matching team membership found; the database needs at least one team.")
+        return membership.user, membership.team
+
+    def build_queryset(self, viewset_class, action, user, kwargs):
+        """
+        Instantiate `viewset_class` for `action` the way the router would, and return the
+        queryset it would evaluate, ordered and limited as its paginator would.
+        """
+        view = viewset_class(action_map={'get': action}, action=action, kwargs=kwargs, format_kwarg=None)
+        request = view.initialize_request(APIRequestFactory().get('/'))
+        request.user = user
+        view.request = request
+
+        queryset = view.get_queryset()
+        if action == 'retrieve':
+            return queryset.filter(pk=kwargs['pk'])
+
+        paginator = view.paginator
+        ordering = getattr(paginator, 'ordering', None)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        page_size = getattr(paginator, 'page_size', None) or 10
+        return queryset[:page_size + 1]
@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import FORMATS, export_filename, iter_export
+from api.models import Team
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a team's full history (memberships, posts, comments, events and occurrence exceptions) "
+        "as NDJSON or a JSON document, streamed from the database in chunks, optionally gzipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('team', type=int, help="Id of the team to export.")
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip.")
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write; '-' for stdout. Defaults to team-<id>.<format>[.gz] in the current directory.",
+        )
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'TEAM_EXPORT_CHUNK_SIZE', 2000))
+
+    def handle(self, *args, **options):
+        team_id = options['team']
+        if not Team.objects.filter(pk=team_id).exists():
+            raise CommandError(f"Team {team_id} does not exist.")
+        output = options['output'] or export_filename(team_id, options['format'], options['gzip'])
+        chunks = iter_export(team_id, options['format'], options['gzip'], options['chunk_size'])
+
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        started = time.monotonic()
+        written = 0
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                written += len(chunk)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Exported team {team_id} to {output}: {written:,} bytes in {elapsed:.1f}s")
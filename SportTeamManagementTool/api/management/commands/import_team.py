@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import FORMATS, RECORD_TYPES, ImportStopped, TeamImport, read_records
+from api.models import Team
+
+
+class Command(BaseCommand):
+    help = (
+        "Load memberships, posts (with nested comments), comments and events into a team from an NDJSON "
+        "or CSV file, read incrementally and written with bulk_create in one transaction per chunk. "
+        "Progress is saved after every chunk, so a failed import can be rerun with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('team', type=int, help="Id of the team to import into.")
+        parser.add_argument('input', help="NDJSON or CSV file, optionally gzipped (.gz); '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to csv for .csv files, else ndjson.")
+        parser.add_argument(
+            '--type', choices=list(RECORD_TYPES), help="Record type of CSV rows without a type column."
+        )
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'IMPORT_CHUNK_SIZE', 1000))
+        parser.add_argument(
+            '--state-file',
+            help="Where the committed position is saved. Defaults to <input>.import-state.",
+        )
+        parser.add_argument(
+            '--resume', action='store_true', help="Skip the records an earlier run committed, per the state file."
+        )
+
+    def handle(self, *args, **options):
+        team = Team.objects.only('id', 'trainer_id').filter(pk=options['team']).first()
+        if team is None:
+            raise CommandError(f"Team {options['team']} does not exist.")
+        path = options['input']
+        name = path[:-3] if path.endswith('.gz') else path
+        input_format = options['format'] or ('csv' if name.lower().endswith('.csv') else 'ndjson')
+        state_file = options['state_file'] or (f'{path}.import-state' if path != '-' else None)
+        if options['resume'] and state_file is None:
+            raise CommandError("--resume needs --state-file when reading stdin.")
+        start = self.read_state(state_file, team.pk) if options['resume'] else 0
+
+        def on_chunk(report):
+            if state_file is not None:
+                with open(state_file, 'w') as file:
+                    json.dump({'team': team.pk, 'committed': report['committed']}, file)
+            self.stdout.write(
+                f"\r  records: {report['committed']} ({report['records_per_second'] or 0:,} records/s)", ending=''
+            )
+            self.stdout.flush()
+
+        importer = TeamImport(team, options['chunk_size'])
+        file = sys.stdin.buffer if path == '-' else (gzip.open if path.endswith('.gz') else open)(path, 'rb')
+        try:
+            report = importer.run(read_records(file, input_format, options['type']), start=start, on_chunk=on_chunk)
+        except ImportStopped as exc:
+            raise CommandError(
+                f"\nImport stopped after record {exc.report['committed']}: {exc}. "
+                f"Fix the input or the database and rerun with --resume."
+            )
+        finally:
+            if file is not sys.stdin.buffer:
+                file.close()
+
+        if state_file is not None and os.path.exists(state_file):
+            os.remove(state_file)
+        created = ', '.join(f"{count} {name}" for name, count in report['created'].items())
+        self.stdout.write(
+            f"\r  records: {report['committed'] - start} in {report['elapsed']:.1f}s "
+            f"({report['records_per_second'] or 0:,} records/s): {created}, "
+            f"{report['skipped']} already present, {report['invalid']} invalid"
+        )
+        for error in report['errors']:
+            self.stderr.write(f"  record {error['record']}: {json.dumps(error['errors'])}")
+
+    def read_state(self, state_file, team_id):
+        if state_file is None or not os.path.exists(state_file):
+            return 0
+        with open(state_file) as file:
+            state = json.load(file)
+        if state.get('team') != team_id:
+            raise CommandError(f"{state_file} belongs to an import into team {state.get('team')}.")
+        return state['committed']
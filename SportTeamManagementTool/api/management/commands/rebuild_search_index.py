@@ -0,0 +1,38 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import SearchDocument
+from api.search import iter_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index from every post, comment and event, e.g. after rows were "
+        "inserted with bulk_create (which sends no signals)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        with transaction.atomic():
+            SearchDocument.objects.all().delete()
+        indexed = 0
+        documents = iter_documents(chunk_size=batch_size)
+        while True:
+            batch = list(islice(documents, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                SearchDocument.objects.bulk_create(batch)
+            indexed += len(batch)
+            self.stdout.write(f"\r  search documents: {indexed}", ending='')
+            self.stdout.flush()
+        elapsed = time.monotonic() - started
+        rate = indexed / elapsed if elapsed else 0
+        self.stdout.write(f"\r  search documents: {indexed} in {elapsed:.1f}s ({rate:,.0f} rows/s)")
@@ -0,0 +1,238 @@
+import random
+import time
+from datetime import timedelta, timezone
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from faker import Faker
+
+from api.importer import restore_timestamps, timestamped
+from api.models import User, Team, TeamMembership, Post, Comment, Event
+
+# Timestamps are laid out relative to this moment rather than the clock, so the same seed
+# gives the same rows on every run.
+DEFAULT_ANCHOR = '2025-06-01T12:00:00+00:00'
+DAY = 24 * 60 * 60
+
+SPORTS = ['Football', 'Basketball', 'Volleyball', 'Handball', 'Rugby', 'Hockey', 'Tennis', 'Swimming', 'Athletics']
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a deterministic, production-sized dataset of users, teams, memberships, "
+        "posts, comments and events, inserted with bulk_create in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--teams', type=int, default=50)
+        parser.add_argument('--memberships', type=int, default=5000, help="Total memberships, trainers included.")
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed yields the same data.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='password', help="Password given to every seeded user.")
+        parser.add_argument('--prefix', default='seed', help="Prefix for usernames and team names.")
+        parser.add_argument(
+            '--anchor', default=DEFAULT_ANCHOR,
+            help="ISO datetime the data is laid out around: content is created in the two years before it, "
+                 "events start in the year either side of it.",
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'teams', 'memberships', 'posts', 'comments', 'events'):
+            if options[name] < 0:
+                raise CommandError(f"--{name} cannot be negative.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if not options['teams'] and (options['memberships'] or options['posts'] or options['events']):
+            raise CommandError("--memberships, --posts and --events require --teams.")
+        if options['memberships'] > options['teams'] * options['users']:
+            raise CommandError("--memberships cannot exceed --teams times --users.")
+        if options['teams'] > options['users']:
+            raise CommandError("Every team needs a trainer, so --teams cannot exceed --users.")
+        if options['teams'] and options['memberships'] < options['teams']:
+            raise CommandError("--memberships must be at least --teams (one trainer per team).")
+        if options['comments'] and not options['posts']:
+            raise CommandError("--comments requires --posts.")
+        try:
+            anchor = parse_datetime(options['anchor'])
+        except ValueError:
+            anchor = None
+        if anchor is None:
+            raise CommandError(f"--anchor {options['anchor']!r} is not an ISO datetime.")
+
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker()
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.anchor = anchor if anchor.tzinfo else anchor.replace(tzinfo=timezone.utc)
+        # A pool of sentences keeps text generation out of the hot loops.
+        self.sentences = [self.fake.sentence(nb_words=12) for _ in range(1000)]
+        self.titles = [self.fake.sentence(nb_words=5).rstrip('.') for _ in range(500)]
+        self.locations = [self.fake.street_address() for _ in range(100)]
+
+        prefix = options['prefix']
+        user_ids = self.seed_users(options['users'], prefix, options['password'])
+        team_ids, trainer_ids = self.seed_teams(options['teams'], prefix, user_ids)
+        team_members = self.seed_memberships(options['memberships'], user_ids, team_ids, trainer_ids)
+        post_ids, post_team_ids, post_times = self.seed_posts(options['posts'], team_ids, trainer_ids)
+        self.seed_comments(options['comments'], post_ids, post_team_ids, post_times, team_members)
+        self.seed_events(options['events'], team_ids, trainer_ids)
+        # bulk_create skips the signals that keep the search index up to date.
+        call_command('rebuild_search_index', batch_size=self.batch_size, stdout=self.stdout)
+
+    def bulk_insert(self, model, objects, total, return_ids=True, stamped=False):
+        """
+        Insert `objects` (any iterable) in batches of --batch-size, one transaction per batch,
+        and return the created primary keys (or None when `return_ids` is off). `stamped`
+        objects come from timestamped() and get their own created_at written back.
+        """
+        label = model._meta.verbose_name_plural
+        started = time.monotonic()
+        ids = [] if return_ids else None
+        inserted = 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if stamped:
+                    restore_timestamps(batch)
+            inserted += len(batch)
+            if return_ids:
+                ids.extend(obj.pk for obj in batch)
+            self.stdout.write(f"\r  {label}: {inserted}/{total}", ending='')
+            self.stdout.flush()
+        elapsed = time.monotonic() - started
+        rate = inserted / elapsed if elapsed else 0
+        self.stdout.write(f"\r  {label}: {inserted} in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+        return ids
+
+    def before_anchor(self, days):
+        return self.anchor - timedelta(seconds=self.rng.randrange(days * DAY))
+
+    def after(self, moment):
+        """
+        A moment between `moment` and the anchor.
+        """
+        return moment + timedelta(seconds=self.rng.randrange(max(int((self.anchor - moment).total_seconds()), 1)))
+
+    def seed_users(self, count, prefix, password):
+        # Hashing is deliberately slow, so every seeded user shares one precomputed hash.
+        password_hash = make_password(password)
+        first_names = [self.fake.first_name() for _ in range(200)]
+        last_names = [self.fake.last_name() for _ in range(200)]
+
+        def users():
+            for i in range(count):
+                first, last = self.rng.choice(first_names), self.rng.choice(last_names)
+                # The index suffix makes usernames unique without a lookup per row.
+                username = f"{prefix}_{first.lower()}.{last.lower()}{i}"
+                yield User(
+                    username=username, email=f"{username}@example.com", first_name=first, last_name=last,
+                    password=password_hash, date_joined=self.before_anchor(730),
+                )
+
+        return self.bulk_insert(User, users(), count)
+
+    def seed_teams(self, count, prefix, user_ids):
+        trainer_ids = self.rng.sample(user_ids, count)
+
+        def teams():
+            for i, trainer_id in enumerate(trainer_ids):
+                name = f"{prefix} {self.fake.city()} {self.rng.choice(SPORTS)} {i}"
+                team = Team(name=name, description=self.rng.choice(self.sentences), trainer_id=trainer_id)
+                yield timestamped(team, {'created_at': self.before_anchor(730)})
+
+        return self.bulk_insert(Team, teams(), count, stamped=True), trainer_ids
+
+    def seed_memberships(self, count, user_ids, team_ids, trainer_ids):
+        """
+        Give every team its trainer plus a random share of the remaining memberships, and
+        return {team_id: [member user ids]} for picking comment authors.
+        """
+        team_members = {}
+        if not team_ids:
+            return team_members
+
+        extra = count - len(team_ids)
+        per_team = [extra // len(team_ids)] * len(team_ids)
+        for index in self.rng.sample(range(len(team_ids)), extra % len(team_ids)):
+            per_team[index] += 1
+
+        def memberships():
+            roles = [TeamMembership.Role.ATHLETE] * 3 + [TeamMembership.Role.MEMBER]
+            for team_id, trainer_id, size in zip(team_ids, trainer_ids, per_team):
+                members = [trainer_id]
+                yield TeamMembership(team_id=team_id, user_id=trainer_id, role=TeamMembership.Role.TRAINER)
+                for user_id in self.rng.sample(user_ids, min(size + 1, len(user_ids))):
+                    if user_id == trainer_id or len(members) > size:
+                        continue
+                    members.append(user_id)
+                    yield TeamMembership(team_id=team_id, user_id=user_id, role=self.rng.choice(roles))
+                team_members[team_id] = members
+
+        self.bulk_insert(TeamMembership, memberships(), count)
+        return team_members
+
+    def seed_posts(self, count, team_ids, trainer_ids):
+        """
+        Return the created post ids alongside the team id and creation time of each post.
+        """
+        if not team_ids:
+            return [], [], []
+        team_indexes = [self.rng.randrange(len(team_ids)) for _ in range(count)]
+        times = [self.before_anchor(365) for _ in range(count)]
+
+        def posts():
+            for index, created_at in zip(team_indexes, times):
+                post = Post(
+                    team_id=team_ids[index], author_id=trainer_ids[index],
+                    title=self.rng.choice(self.titles), content=' '.join(self.rng.sample(self.sentences, 3)),
+                )
+                yield timestamped(post, {'created_at': created_at})
+
+        post_ids = self.bulk_insert(Post, posts(), count, stamped=True)
+        return post_ids, [team_ids[index] for index in team_indexes], times
+
+    def seed_comments(self, count, post_ids, post_team_ids, post_times, team_members):
+        def comments():
+            for _ in range(count):
+                index = self.rng.randrange(len(post_ids))
+                comment = Comment(
+                    post_id=post_ids[index], author_id=self.rng.choice(team_members[post_team_ids[index]]),
+                    content=self.rng.choice(self.sentences),
+                )
+                yield timestamped(comment, {'created_at': self.after(post_times[index])})
+
+        # Comments are the bulk of the data, so their ids are not kept in memory.
+        self.bulk_insert(Comment, comments(), count, return_ids=False, stamped=True)
+
+    def seed_events(self, count, team_ids, trainer_ids):
+        def events():
+            for _ in range(count):
+                index = self.rng.randrange(len(team_ids))
+                # Spread events over the year either side of the anchor, on the hour, each
+                # announced up to a month ahead.
+                start = self.anchor.replace(minute=0, second=0, microsecond=0) + timedelta(
+                    hours=self.rng.randrange(-365 * 24, 365 * 24)
+                )
+                created_at = min(start, self.anchor) - timedelta(seconds=self.rng.randrange(30 * DAY))
+                event = Event(
+                    team_id=team_ids[index], trainer_id=trainer_ids[index], title=self.rng.choice(self.titles),
+                    description=self.rng.choice(self.sentences), start_time=start,
+                    end_time=start + timedelta(minutes=self.rng.choice([60, 90, 120])),
+                    location=self.rng.choice(self.locations),
+                )
+                yield timestamped(event, {'created_at': created_at})
+
+        if team_ids:
+            self.bulk_insert(Event, events(), count, stamped=True)
@@ -0,0 +1,124 @@
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .cache import LRUTTLCache
+from .models import Team, TeamMembership
+
+
+class TeamAccess(NamedTuple):
+    """
+    What a user is allowed to do in a team: their membership role (None if not a member)
+    and whether they are the team's trainer (`Team.trainer`).
+    """
+    role: Optional[str]
+    is_trainer: bool
+
+    @property
+    def is_member(self):
+        return self.role is not None
+
+
+membership_cache = LRUTTLCache(
+    max_entries=getattr(settings, 'MEMBERSHIP_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'MEMBERSHIP_CACHE_TTL', 300),
+)
+
+_NO_TEAM = 'no-team'
+_MISSING = object()
+
+
+def _team_access_query(user_id, team_id):
+    return Team.objects.filter(pk=team_id).annotate(
+        role=Subquery(TeamMembership.objects.filter(team=OuterRef('pk'), user_id=user_id).values('role')[:1])
+    ).values_list('trainer_id', 'role')
+
+
+def _team_access(user_id, row):
+    if row is None:
+        return None
+    trainer_id, role = row
+    return TeamAccess(role=role, is_trainer=trainer_id == user_id)
+
+
+def _load_team_access(user_id, team_id):
+    return _team_access(user_id, _team_access_query(user_id, team_id).first())
+
+
+async def _aload_team_access(user_id, team_id):
+    return _team_access(user_id, await _team_access_query(user_id, team_id).afirst())
+
+
+def get_team_access(request, team_id):
+    """
+    Resolve the requesting user's access to a team, or None if the team does not exist.
+
+    Results are memoized on the request and in a process-wide LRU+TTL cache keyed on
+    (user_id, team_id), which the signal handlers in api/signals.py invalidate.
+    """
+    team_id, memo, cached = _cached_team_access(request, team_id)
+    if cached is _MISSING:
+        cached = _store_team_access(request, team_id, memo, _load_team_access(request.user.id, team_id))
+    return cached
+
+
+async def aget_team_access(request, team_id):
+    """
+    get_team_access() for async views, loading misses with the async ORM. Both share the
+    request memo, so sync code called later in the request reuses the result.
+    """
+    team_id, memo, cached = _cached_team_access(request, team_id)
+    if cached is _MISSING:
+        cached = _store_team_access(request, team_id, memo, await _aload_team_access(request.user.id, team_id))
+    return cached
+
+
+async def arecheck_team_access(user_id, team_id):
+    """
+    A user's current access to a team, from the process cache or the database but never
+    a request memo, for connections that outlive their request (see api.realtime).
+    """
+    access = membership_cache.get((user_id, team_id))
+    if access is None:
+        access = await _aload_team_access(user_id, team_id)
+        membership_cache.set((user_id, team_id), _NO_TEAM if access is None else access)
+    return None if access is _NO_TEAM else access
+
+
+def _cached_team_access(request, team_id):
+    """
+    (team_id as an int, the request memo, the access from the memo or the process cache
+    or _MISSING).
+    """
+    try:
+        team_id = int(team_id)
+    except (TypeError, ValueError):
+        return team_id, {}, None
+
+    memo = getattr(request, '_team_access', None)
+    if memo is None:
+        memo = request._team_access = {}
+    if team_id in memo:
+        return team_id, memo, memo[team_id]
+
+    access = membership_cache.get((request.user.id, team_id))
+    if access is None:
+        return team_id, memo, _MISSING
+    access = None if access is _NO_TEAM else access
+    memo[team_id] = access
+    return team_id, memo, access
+
+
+def _store_team_access(request, team_id, memo, access):
+    membership_cache.set((request.user.id, team_id), _NO_TEAM if access is None else access)
+    memo[team_id] = access
+    return access
+
+
+def invalidate_membership(user_id, team_id):
+    membership_cache.delete((user_id, team_id))
+
+
+def invalidate_team(team_id):
+    membership_cache.delete_where(lambda key: key[1] == team_id)
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRecurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly')], max_length=10)),
+                ('interval', models.PositiveIntegerField(default=1)),
+                ('weekdays', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Total number of occurrences.', null=True)),
+                ('until', models.DateTimeField(blank=True, help_text='No occurrence starts after this moment.', null=True)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence', to='api.event')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OccurrenceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('cancelled', models.BooleanField(default=False)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, max_length=200, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('location', models.CharField(blank=True, max_length=200, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_exceptions', to='api.event')),
+            ],
+            options={
+                'unique_together': {('event', 'original_start')},
+            },
+        ),
+    ]
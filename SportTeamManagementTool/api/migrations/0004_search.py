@@ -0,0 +1,129 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite: an external-content FTS5 table over api_searchdocument, mirrored by triggers, so
+# the text is stored once and every insert, update and delete of a document (including
+# cascades) reaches the index. bm25 weighs title matches four times as much as the body.
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE api_searchdocument_fts USING fts5(
+        title, body, content='api_searchdocument', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    "INSERT INTO api_searchdocument_fts(api_searchdocument_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)')",
+    """
+    CREATE TRIGGER api_searchdocument_fts_insert AFTER INSERT ON api_searchdocument BEGIN
+        INSERT INTO api_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER api_searchdocument_fts_delete AFTER DELETE ON api_searchdocument BEGIN
+        INSERT INTO api_searchdocument_fts(api_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER api_searchdocument_fts_update AFTER UPDATE OF title, body ON api_searchdocument BEGIN
+        INSERT INTO api_searchdocument_fts(api_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO api_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_searchdocument_fts_update',
+    'DROP TRIGGER IF EXISTS api_searchdocument_fts_delete',
+    'DROP TRIGGER IF EXISTS api_searchdocument_fts_insert',
+    'DROP TABLE IF EXISTS api_searchdocument_fts',
+]
+
+# Existing posts, comments and events, indexed as api.search's post_fields(), comment_fields()
+# and event_fields() would index them. On SQLite the triggers above copy them into FTS5.
+BACKFILL = [
+    (
+        """
+        INSERT INTO api_searchdocument (kind, object_id, team_id, post_id, title, body, created_at)
+        SELECT 'post', id, team_id, id, title, content, created_at FROM api_post
+        """,
+        [],
+    ),
+    (
+        """
+        INSERT INTO api_searchdocument (kind, object_id, team_id, post_id, title, body, created_at)
+        SELECT 'comment', c.id, p.team_id, c.post_id, '', c.content, c.created_at
+        FROM api_comment c INNER JOIN api_post p ON p.id = c.post_id
+        """,
+        [],
+    ),
+    (
+        """
+        INSERT INTO api_searchdocument (kind, object_id, team_id, post_id, title, body, created_at)
+        SELECT 'event', id, team_id, NULL, title,
+            COALESCE(description, '')
+            || CASE WHEN COALESCE(description, '') <> '' AND COALESCE(location, '') <> '' THEN %s ELSE '' END
+            || COALESCE(location, ''),
+            created_at
+        FROM api_event
+        """,
+        ['\n'],
+    ),
+]
+
+
+def postgres_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    # Must stay identical to api.search.document_vector() for the planner to use it.
+    vector = SearchVector('title', weight='A', config='english') + SearchVector('body', weight='B', config='english')
+    return GinIndex(vector, name='search_document_vector_idx')
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_INDEX:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('api', 'SearchDocument'), postgres_index())
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('api', 'SearchDocument'), postgres_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_event_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment'), ('event', 'Event')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(blank=True, default='', max_length=200)),
+                ('body', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.post')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.team')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
@@ -33,7 +33,12 @@ class TeamMembership(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # The unique constraint already indexes (user, team) for membership lookups.
         unique_together = ('user', 'team')
+        indexes = [
+            models.Index(fields=['team', 'role'], name='membership_team_role_idx'),
+            models.Index(fields=['team', 'joined_at', 'id'], name='membership_team_joined_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.team.name} ({self.get_role_display()})"
@@ -46,6 +51,11 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['team', '-created_at', '-id'], name='post_team_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -56,6 +66,11 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title[:30]}..."
 
@@ -70,5 +85,79 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['team', 'start_time', 'id'], name='event_team_start_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class EventRecurrence(models.Model):
+    """
+    RRULE-style repetition of an Event, whose own start/end give the first occurrence and
+    the duration of every other one. Occurrences are never stored; see api.recurrence.
+    """
+    class Frequency(models.TextChoices):
+        DAILY = 'DAILY', 'Daily'
+        WEEKLY = 'WEEKLY', 'Weekly'
+        MONTHLY = 'MONTHLY', 'Monthly'
+
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='recurrence')
+    frequency = models.CharField(max_length=10, choices=Frequency.choices)
+    interval = models.PositiveIntegerField(default=1)
+    # Comma-separated RRULE BYDAY codes (MO,WE,FR) for weekly series; empty means the weekday of the first occurrence.
+    weekdays = models.CharField(max_length=20, blank=True, default='')
+    count = models.PositiveIntegerField(blank=True, null=True, help_text="Total number of occurrences.")
+    until = models.DateTimeField(blank=True, null=True, help_text="No occurrence starts after this moment.")
+
+    def __str__(self):
+        return f"{self.event.title} ({self.get_frequency_display()})"
+
+
+class OccurrenceException(models.Model):
+    """
+    A cancelled or modified occurrence of a recurring event, identified by the start time
+    the rule gives it. Fields left empty keep the series' values.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrence_exceptions')
+    original_start = models.DateTimeField()
+    cancelled = models.BooleanField(default=False)
+    start_time = models.DateTimeField(blank=True, null=True)
+    end_time = models.DateTimeField(blank=True, null=True)
+    title = models.CharField(max_length=200, blank=True, null=True)
+    description = models.TextField(blank=True, null=True)
+    location = models.CharField(max_length=200, blank=True, null=True)
+
+    class Meta:
+        unique_together = ('event', 'original_start')
+
+    def __str__(self):
+        return f"{self.event.title} on {self.original_start:%Y-%m-%d %H:%M}"
+
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of a post, comment or event, kept in step with its source by
+    api.signals and indexed by the database's full-text engine (see api.search).
+    """
+    class Kind(models.TextChoices):
+        POST = 'post', 'Post'
+        COMMENT = 'comment', 'Comment'
+        EVENT = 'event', 'Event'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='+')
+    # The post itself, or the post of a comment, so deleting a post cascades to its documents.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+', blank=True, null=True)
+    title = models.CharField(max_length=200, blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f"{self.get_kind_display()} {self.object_id}"
@@ -0,0 +1,254 @@
+import base64
+import json
+from datetime import datetime
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    DRF's PageNumberPagination, plus apaginate_queryset() for async views (api.async_views).
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        # Paginate the row count, so Paginator validates the page number without a query.
+        paginator = self.django_paginator_class(range(await queryset.acount()), page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        start = (self.page.number - 1) * page_size
+        return [row async for row in queryset[start:start + page_size].aiterator(chunk_size=page_size)]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a composite ordering such as ('-created_at', '-id').
+
+    The cursor encodes the full ordering key of the last row seen, so every page is a
+    single indexed range scan with no OFFSET and, unless ?count=true is passed, no COUNT(*).
+    The ordering must end in a unique field and all fields must share one direction.
+    """
+    ordering = ('-id',)
+    cursor_query_param = 'cursor'
+    page_size = getattr(settings, 'FEED_PAGE_SIZE', 10)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'FEED_MAX_PAGE_SIZE', 100)
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position, reverse = self.start(request, queryset)
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self.finish(self.fetch(queryset, position, reverse), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views (api.async_views).
+        """
+        position, reverse = self.start(request, queryset)
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self.finish(await self.afetch(queryset, position, reverse), position, reverse)
+
+    def start(self, request, queryset):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        return self.decode_cursor(request, queryset)
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param) in ('1', 'true')
+
+    def finish(self, results, position, reverse):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def fetch(self, queryset, position, reverse):
+        """
+        Up to page_size + 1 rows after `position` in the (possibly reversed) ordering; the
+        extra row tells whether there is another page.
+        """
+        return list(self.seek(queryset, position, reverse))
+
+    def seek(self, queryset, position, reverse):
+        ordering = self.reversed_ordering() if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+        return queryset[:self.page_size + 1]
+
+    async def afetch(self, queryset, position, reverse):
+        return [row async for row in self.seek(queryset, position, reverse).aiterator(chunk_size=self.page_size + 1)]
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Ran past the end (e.g. rows were deleted); step back from the start.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+    def reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    def position_of(self, instance):
+        # Rows are model instances, or dicts from the .values() of api.fast_serializers.
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value.isoformat() if isinstance(value, datetime) else value)
+        return position
+
+    def seek_filter(self, position, reverse):
+        """
+        Rows strictly after `position` in the (possibly reversed) ordering, expanded as
+        (a < x) OR (a = x AND b < y) ... so the database can seek on a composite index.
+        """
+        descending = self.ordering[0].startswith('-') != reverse
+        lookup = 'lt' if descending else 'gt'
+        fields = [field.lstrip('-') for field in self.ordering]
+
+        condition = Q()
+        for index, field in enumerate(fields):
+            term = Q(**{f'{field}__{lookup}': position[index]})
+            for previous, value in zip(fields[:index], position[:index]):
+                term &= Q(**{previous: value})
+            condition |= term
+        return condition
+
+    def encode_cursor(self, position, reverse):
+        data = {'p': position}
+        if reverse:
+            data['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, queryset):
+        """
+        (position, reverse) of the ?cursor= parameter, its values converted to the types of
+        the ordering (see to_position); a cursor that does not decode to one is a 404.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(parse.unquote(encoded).encode('ascii')))
+            position = data['p']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            # Cursors come from clients; only values of the ordering's types reach the query.
+            position = self.to_position(queryset, position)
+            if any(value is None for value in position):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(data.get('r'))
+
+    def to_position(self, queryset, values):
+        """
+        The cursor's `values` converted by the model fields of the ordering. Raises
+        ValidationError, TypeError or ValueError for values of the wrong type.
+        """
+        opts = queryset.model._meta
+        return [opts.get_field(field.lstrip('-')).to_python(value) for field, value in zip(self.ordering, values)]
+
+
+class MembershipCursorPagination(KeysetPagination):
+    """
+    Keyset pagination for team members, so deep pages of large clubs stay as cheap as the first one.
+    """
+    page_size = 50
+    max_page_size = 200
+    ordering = ('joined_at', 'id')
+
+
+class TeamDirectoryPagination(KeysetPagination):
+    """
+    Keyset pagination of TeamViewSet.discover, in name order over the unique name index.
+    """
+    page_size = 50
+    max_page_size = 200
+    ordering = ('name',)
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
+class EventCursorPagination(KeysetPagination):
+    ordering = ('start_time', 'id')
+
+
+class SearchCursorPagination(KeysetPagination):
+    """
+    Keyset pagination of full-text search results (see api.search), best match first.
+    Ranks depend on the whole index, so documents changing between two requests can
+    move results across a page boundary.
+    """
+    ordering = ('rank', 'id')
+
+    def to_position(self, results, values):
+        return [float(values[0]), int(values[1])]
+
+    def fetch(self, results, position, reverse):
+        return results.seek(position, reverse, self.page_size + 1)
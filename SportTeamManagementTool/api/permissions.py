@@ -1,5 +1,10 @@
 from rest_framework import permissions
-from .models import TeamMembership, Post, Event, Team # Import Team directly
+from .models import TeamMembership, Post, Comment, Event, Team # Import Team directly
+from .membership import get_team_access
+
+def is_team_member(request, team_id):
+    access = get_team_access(request, team_id)
+    return access is not None and access.is_member
 
 class IsTrainerOfTeam(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -10,7 +15,7 @@ class IsTrainerOfTeam(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Team):
-            return obj.trainer == request.user
+            return obj.trainer_id == request.user.id
         return False
 
 class IsTeamMember(permissions.BasePermission):
@@ -23,9 +28,9 @@ class IsTeamMember(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_authenticated:
             if isinstance(obj, Post) or isinstance(obj, Event):
-                return obj.team.memberships.filter(user=request.user).exists()
+                return is_team_member(request, obj.team_id)
             elif isinstance(obj, Team):
-                return obj.memberships.filter(user=request.user).exists()
+                return is_team_member(request, obj.pk)
         return False
 
 class IsTrainerOrTeamMemberForPostComments(permissions.BasePermission):
@@ -34,23 +39,25 @@ class IsTrainerOrTeamMemberForPostComments(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Comment):
-            return obj.post.team.memberships.filter(user=request.user).exists()
+            return is_team_member(request, obj.post.team_id)
         return False
 
 class IsPostAuthorOrTeamMember(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
-            return obj.team.memberships.filter(user=request.user).exists()
+            return is_team_member(request, obj.team_id)
 
-        return obj.author == request.user
+        return obj.author_id == request.user.id
 
 class IsCommentAuthorOrTrainer(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
+            return is_team_member(request, obj.post.team_id)
 
         if request.method in ['PUT', 'PATCH']:
-            return obj.author == request.user
+            return obj.author_id == request.user.id
 
         if request.method == 'DELETE':
-            return obj.author == request.user or obj.post.team.trainer == request.user
+            access = get_team_access(request, obj.post.team_id)
+            return obj.author_id == request.user.id or (access is not None and access.is_trainer)
         return False
\ No newline at end of file
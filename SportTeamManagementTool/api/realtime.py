@@ -0,0 +1,203 @@
+import asyncio
+import functools
+import itertools
+import json
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+
+class Overflow(Exception):
+    """
+    Messages were dropped because a subscriber fell too far behind.
+    """
+
+
+class Subscription:
+    """
+    One connection's view of a channel: a bounded queue filled by the broker on the
+    connection's event loop. Idle, it holds no task or thread, only the queue and an
+    asyncio.Event. A consumer that falls `max_queue` messages behind loses them and is
+    told to resync instead, so a slow client can never make the process buffer more.
+    """
+
+    def __init__(self, channel, max_queue):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.max_queue = max_queue
+        self.queue = deque()
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def deliver(self, message):
+        # Runs on self.loop. Once overflowed, the resync covers any later message too.
+        if self.overflowed:
+            return
+        if len(self.queue) >= self.max_queue:
+            self.queue.clear()
+            self.overflowed = True
+        else:
+            self.queue.append(message)
+        self.ready.set()
+
+    async def get(self, timeout):
+        """
+        The pending messages, waiting up to `timeout` seconds for some; an empty list
+        means the wait timed out. Raises Overflow if messages were dropped.
+        """
+        if not self.queue and not self.overflowed:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        if self.overflowed:
+            self.overflowed = False
+            raise Overflow
+        messages = list(self.queue)
+        self.queue.clear()
+        return messages
+
+
+def _deliver_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.deliver(message)
+
+
+class InProcessBroker:
+    """
+    Pub/sub between the threads and event loops of this process. publish() may be called
+    from any thread; each event loop with subscribers gets one call_soon_threadsafe()
+    per message, whatever its number of subscribers.
+
+    To fan out across processes, subclass it and make publish() send to the shared bus
+    (e.g. Redis PUBLISH), with a listener in each process calling deliver() for what it
+    receives; then point REALTIME_BROKER at the subclass.
+    """
+
+    def __init__(self):
+        self.channels = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channel, max_queue):
+        subscription = Subscription(channel, max_queue)
+        with self.lock:
+            self.channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self.lock:
+            return len(self.channels.get(channel, ()))
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.channels.get(channel, ()))
+        by_loop = defaultdict(list)
+        for subscription in subscriptions:
+            by_loop[subscription.loop].append(subscription)
+        for loop, subscribers in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver_all, subscribers, message)
+            except RuntimeError:
+                # The loop has been closed; its subscriptions go with its connections.
+                pass
+
+
+@functools.cache
+def get_broker():
+    return import_string(getattr(settings, 'REALTIME_BROKER', 'api.realtime.InProcessBroker'))()
+
+
+def team_channel(team_id):
+    return f'team:{team_id}'
+
+
+_sequence = itertools.count(1)
+
+
+def publish_team_event(team_id, event, **data):
+    """
+    Notify the subscribers of a team's feed of `event` (e.g. "post.created") once the
+    current transaction commits, so no client refetches before the change is visible.
+    """
+    message = {'id': next(_sequence), 'event': event, 'data': {'type': event, 'team': team_id, **data}}
+    transaction.on_commit(lambda: get_broker().publish(team_channel(team_id), message))
+
+
+class TeamFeedMixin:
+    """
+    Publish "<feed_event>.created/updated/deleted" to the team's realtime feed after each
+    successful write through a viewset nested under /teams/{team_pk}/. Messages carry
+    ids only; subscribers refetch what they display.
+    """
+    feed_event = None
+    feed_actions = {'create': 'created', 'update': 'updated', 'partial_update': 'updated', 'destroy': 'deleted'}
+
+    def get_feed_data(self, response):
+        return {'id': int(self.kwargs.get('pk') or response.data['id'])}
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        action = self.feed_actions.get(self.action)
+        if action and request.method not in SAFE_METHODS and 200 <= response.status_code < 300:
+            publish_team_event(
+                int(self.kwargs['team_pk']), f'{self.feed_event}.{action}', **self.get_feed_data(response)
+            )
+        return response
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(channel, resync=False, allowed=None):
+    """
+    Server-Sent Events for `channel`, with a comment line every REALTIME_HEARTBEAT seconds
+    so proxies keep idle connections open. Messages are not stored, so a client that
+    reconnects (`resync`) or falls behind gets a "resync" event telling it to refetch.
+    The subscription ends when the client disconnects and the server closes the stream.
+
+    `allowed`, an async callable, is awaited each time the stream wakes up (at least once
+    per heartbeat); once it returns False the client gets a "revoked" event and the
+    stream ends, so losing access stops the feed before anything more is sent.
+    """
+    broker = get_broker()
+    heartbeat = getattr(settings, 'REALTIME_HEARTBEAT', 25)
+    subscription = broker.subscribe(channel, getattr(settings, 'REALTIME_QUEUE_SIZE', 100))
+    try:
+        yield f'retry: {getattr(settings, "REALTIME_RETRY_MS", 5000)}\n\n'
+        if resync:
+            yield format_event('resync', {'type': 'resync'})
+        while True:
+            try:
+                messages = await subscription.get(heartbeat)
+            except Overflow:
+                messages = None
+            if allowed is not None and not await allowed():
+                yield format_event('revoked', {'type': 'revoked'})
+                return
+            if messages is None:
+                yield format_event('resync', {'type': 'resync'})
+            elif not messages:
+                yield ': keepalive\n\n'
+            else:
+                yield ''.join(format_event(message['event'], message['data'], message['id']) for message in messages)
+    finally:
+        broker.unsubscribe(subscription)
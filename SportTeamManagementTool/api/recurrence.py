@@ -0,0 +1,130 @@
+import calendar
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import EventRecurrence
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+
+def parse_weekdays(value):
+    """
+    Sorted weekday numbers (Monday is 0) of a comma-separated BYDAY list.
+    """
+    codes = [code.strip().upper() for code in value.split(',') if code.strip()]
+    unknown = [code for code in codes if code not in WEEKDAYS]
+    if unknown:
+        raise ValueError(f"Unknown weekdays: {', '.join(unknown)}. Use {', '.join(WEEKDAYS)}.")
+    return sorted({WEEKDAYS.index(code) for code in codes})
+
+
+class Occurrence:
+    """
+    One occurrence of a recurring event. Behaves like its Event (id, team, trainer...)
+    with the occurrence's own times and any fields overridden by its exception.
+    """
+
+    def __init__(self, event, original_start, exception=None):
+        self.event = event
+        self.original_start = original_start
+        duration = event.end_time - event.start_time if event.end_time else None
+        self.start_time = original_start
+        self.end_time = original_start + duration if duration is not None else None
+        self.title = event.title
+        self.description = event.description
+        self.location = event.location
+        if exception is not None:
+            if exception.start_time:
+                self.start_time = exception.start_time
+                self.end_time = self.start_time + duration if duration is not None else None
+            for field in ('end_time', 'title', 'description', 'location'):
+                if getattr(exception, field):
+                    setattr(self, field, getattr(exception, field))
+
+    def __getattr__(self, name):
+        return getattr(self.event, name)
+
+
+def _candidates(rule, first, after):
+    """
+    Wall-clock starts the rule generates, in order, from the first period that can contain
+    `after` (or from the first occurrence when `after` is None).
+    """
+    step = rule.interval or 1
+    if rule.frequency == EventRecurrence.Frequency.DAILY:
+        period = max(0, (after - first).days // step) if after else 0
+        while True:
+            yield first + timedelta(days=period * step)
+            period += 1
+
+    elif rule.frequency == EventRecurrence.Frequency.WEEKLY:
+        weekdays = parse_weekdays(rule.weekdays) or [first.weekday()]
+        week = first - timedelta(days=first.weekday())
+        period = max(0, (after - week).days // 7 // step) if after else 0
+        while True:
+            for weekday in weekdays:
+                start = week + timedelta(days=period * step * 7 + weekday)
+                if start >= first:
+                    yield start
+            period += 1
+
+    else:
+        months = (after.year - first.year) * 12 + after.month - first.month if after else 0
+        period = max(0, months // step)
+        while True:
+            month = first.month - 1 + period * step
+            year, month = first.year + month // 12, month % 12 + 1
+            # Months without the day (e.g. the 31st) are skipped, as RRULE does.
+            if first.day <= calendar.monthrange(year, month)[1]:
+                yield first.replace(year=year, month=month)
+            period += 1
+
+
+def rule_starts(event, start, end):
+    """
+    Lazily yield the aware start times the event's rule gives in [start, end), ignoring
+    exceptions. Expansion runs in the current time zone so series keep their wall-clock
+    time across DST changes, and jumps straight to `start` unless occurrences have to be
+    counted.
+    """
+    rule = event.recurrence
+    first = timezone.make_naive(event.start_time)
+    # A COUNT rule is numbered from its first occurrence, but is also bounded by it.
+    after = None if rule.count else timezone.make_naive(start) - timedelta(days=1)
+    for index, candidate in enumerate(_candidates(rule, first, after)):
+        occurrence = timezone.make_aware(candidate)
+        if rule.count and index >= rule.count:
+            return
+        if rule.until and occurrence > rule.until:
+            return
+        if occurrence >= end:
+            return
+        if occurrence >= start:
+            yield occurrence
+
+
+def is_occurrence(event, moment):
+    return next(rule_starts(event, moment, moment + timedelta(microseconds=1)), None) == moment
+
+
+def expand(event, start, end, exceptions=()):
+    """
+    Occurrences of a recurring event that start in [start, end), with `exceptions`
+    applied: cancelled ones dropped, moved ones placed at their new time, including
+    occurrences moved into the window from outside it.
+    """
+    by_start = {exception.original_start: exception for exception in exceptions}
+    for moment in rule_starts(event, start, end):
+        exception = by_start.pop(moment, None)
+        if exception is not None and exception.cancelled:
+            continue
+        occurrence = Occurrence(event, moment, exception)
+        if start <= occurrence.start_time < end:
+            yield occurrence
+    for exception in by_start.values():
+        if (
+            not exception.cancelled and exception.start_time and start <= exception.start_time < end
+            and is_occurrence(event, exception.original_start)
+        ):
+            yield Occurrence(event, exception.original_start, exception)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .membership import get_team_access
+
+
+class ResponseCache:
+    """
+    Serialized API responses keyed by team and a per-team version number.
+
+    Any write that can change a team's payloads bumps its version (see api/signals.py), so
+    invalidation is a single increment and entries of older versions are never read again;
+    the backend's own size bound (MAX_ENTRIES, maxmemory...) evicts them. The backend is any
+    Django cache alias, e.g. locmem, file-based or Redis, set by RESPONSE_CACHE_ALIAS.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def version_key(self, team_id):
+        return f'team-version:{team_id}'
+
+    def get_version(self, team_id):
+        version = self.backend.get(self.version_key(team_id))
+        if version is None:
+            # Start from an unpredictable value so that, if the counter itself was evicted,
+            # entries cached under its old values can never be matched again.
+            version = time.time_ns()
+            if not self.backend.add(self.version_key(team_id), version, timeout=None):
+                version = self.backend.get(self.version_key(team_id), version)
+        return version
+
+    async def aget_version(self, team_id):
+        version = await self.backend.aget(self.version_key(team_id))
+        if version is None:
+            version = time.time_ns()
+            if not await self.backend.aadd(self.version_key(team_id), version, timeout=None):
+                version = await self.backend.aget(self.version_key(team_id), version)
+        return version
+
+    def bump(self, team_id):
+        try:
+            self.backend.incr(self.version_key(team_id))
+        except ValueError:
+            self.backend.set(self.version_key(team_id), time.time_ns(), timeout=None)
+
+    def key(self, team_id, view_name, vary):
+        return f'response:{team_id}:{self.get_version(team_id)}:{view_name}:{vary}'
+
+    async def akey(self, team_id, view_name, vary):
+        return f'response:{team_id}:{await self.aget_version(team_id)}:{view_name}:{vary}'
+
+    def get(self, key, view_name):
+        data = self.backend.get(key)
+        self.record(view_name, 'hits' if data is not None else 'misses')
+        return data
+
+    async def aget(self, key, view_name):
+        data = await self.backend.aget(key)
+        self.record(view_name, 'hits' if data is not None else 'misses')
+        return data
+
+    def set(self, key, data):
+        self.backend.set(key, data)
+
+    async def aset(self, key, data):
+        await self.backend.aset(key, data)
+
+    def record(self, view_name, outcome):
+        with self._lock:
+            self.stats[(view_name, outcome)] += 1
+
+    def get_stats(self):
+        """
+        Hit/miss counts of this process, as {view name: {'hits': n, 'misses': n}}.
+        """
+        with self._lock:
+            stats = {}
+            for (view_name, outcome), count in self.stats.items():
+                stats.setdefault(view_name, {'hits': 0, 'misses': 0})[outcome] = count
+            return stats
+
+
+response_cache = ResponseCache(getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default'))
+
+
+class ResponseCacheMixin:
+    """
+    Serve the `cached_actions` of a team-scoped viewset from the response cache.
+
+    Only team members are served from the cache; everyone else takes the normal path and
+    gets its usual error or empty response. Paginated lists are only cached for their first
+    page. `cache_per_user` keeps separate entries per caller for payloads with user-specific
+    fields.
+    """
+    cached_actions = ()
+    cache_per_user = False
+
+    def get_cache_team_id(self):
+        return self.kwargs.get('team_pk')
+
+    def get_cache_entry(self):
+        """
+        (team id, view name, vary) of the request's cache entry, or None if the request
+        is not served from the cache.
+        """
+        request = self.request
+        team_id = self.get_cache_team_id()
+        access = get_team_access(request, team_id)
+        if (
+            self.action not in self.cached_actions or access is None or not access.is_member
+            or 'cursor' in request.query_params
+        ):
+            return None
+
+        # Payloads hold absolute next/previous links, so the host is part of the entry.
+        vary = request.build_absolute_uri()
+        if self.cache_per_user:
+            vary = f'{request.user.pk}:{vary}'
+        return int(team_id), f'{self.basename}-{self.action}', vary
+
+    def cached(self, render):
+        entry = self.get_cache_entry()
+        if entry is None:
+            return render()
+        key = response_cache.key(*entry)
+        data = response_cache.get(key, entry[1])
+        if data is not None:
+            return self.cache_hit(data)
+
+        response = render()
+        if response.status_code == 200:
+            response_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def acached(self, arender):
+        entry = self.get_cache_entry()
+        if entry is None:
+            return await arender()
+        key = await response_cache.akey(*entry)
+        data = await response_cache.aget(key, entry[1])
+        if data is not None:
+            return self.cache_hit(data)
+
+        response = await arender()
+        if response.status_code == 200:
+            await response_cache.aset(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cache_hit(self, data):
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    async def alist(self):
+        return await self.acached(super().alist)
+
+    async def aretrieve(self):
+        return await self.acached(super().aretrieve)
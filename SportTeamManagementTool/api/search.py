@@ -0,0 +1,163 @@
+import re
+
+from django.db import NotSupportedError, connection
+from django.db.models import Q
+
+from .models import SearchDocument, TeamMembership, Post, Comment, Event
+
+# SQLite keeps the index in this FTS5 table, created by migration 0004 along with the
+# triggers that mirror api_searchdocument into it. Django rebuilds a table to alter it on
+# SQLite, which drops its triggers, so migrations changing SearchDocument must recreate them.
+FTS_TABLE = 'api_searchdocument_fts'
+
+MAX_TERMS = 10
+
+
+def parse_terms(text):
+    """
+    The words of a search box query, at most MAX_TERMS of them. Operators and quotes
+    are dropped, so no input can make a malformed full-text query.
+    """
+    return re.findall(r'\w+', text.lower())[:MAX_TERMS]
+
+
+def post_fields(post):
+    return {
+        'team_id': post.team_id, 'post_id': post.pk, 'title': post.title, 'body': post.content,
+        'created_at': post.created_at,
+    }
+
+
+def comment_fields(comment, team_id):
+    return {
+        'team_id': team_id, 'post_id': comment.post_id, 'title': '', 'body': comment.content,
+        'created_at': comment.created_at,
+    }
+
+
+def event_fields(event):
+    return {
+        'team_id': event.team_id, 'post_id': None, 'title': event.title,
+        'body': '\n'.join(text for text in (event.description, event.location) if text),
+        'created_at': event.created_at,
+    }
+
+
+def index_document(kind, object_id, fields, created=False):
+    """
+    Store the searchable text of one object: an INSERT for new objects, otherwise an
+    UPDATE, falling back to an INSERT for objects that were never indexed.
+    """
+    if created or not SearchDocument.objects.filter(kind=kind, object_id=object_id).update(**fields):
+        SearchDocument.objects.create(kind=kind, object_id=object_id, **fields)
+
+
+def remove_document(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def iter_documents(chunk_size=2000):
+    """
+    Unsaved documents for every post, comment and event, read in chunks of `chunk_size`;
+    see the rebuild_search_index command.
+    """
+    Kind = SearchDocument.Kind
+    for post in Post.objects.only('id', 'team_id', 'title', 'content', 'created_at').iterator(chunk_size):
+        yield SearchDocument(kind=Kind.POST, object_id=post.pk, **post_fields(post))
+    comments = Comment.objects.select_related('post').only('id', 'post__team_id', 'content', 'created_at')
+    for comment in comments.iterator(chunk_size):
+        yield SearchDocument(kind=Kind.COMMENT, object_id=comment.pk, **comment_fields(comment, comment.post.team_id))
+    events = Event.objects.only('id', 'team_id', 'title', 'description', 'location', 'created_at')
+    for event in events.iterator(chunk_size):
+        yield SearchDocument(kind=Kind.EVENT, object_id=event.pk, **event_fields(event))
+
+
+class SQLiteSearch:
+    """
+    Documents of the user's teams matching every term (the last one as a prefix, for
+    search-as-you-type), ranked by bm25 through the FTS5 index. Lower ranks are better.
+    """
+
+    def __init__(self, user, terms, kinds=None):
+        documents = SearchDocument._meta.db_table
+        memberships = TeamMembership._meta.db_table
+        self.from_where = (
+            f'FROM {FTS_TABLE} JOIN {documents} ON {documents}.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND {documents}.team_id IN (SELECT team_id FROM {memberships} WHERE user_id = %s)'
+        )
+        self.params = [' '.join(f'"{term}"' for term in terms) + '*', user.pk]
+        if kinds:
+            self.from_where += f" AND {documents}.kind IN ({', '.join(['%s'] * len(kinds))})"
+            self.params += list(kinds)
+        self.documents = documents
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) {self.from_where}', self.params)
+            return cursor.fetchone()[0]
+
+    def seek(self, position, reverse, limit):
+        """
+        Up to `limit` documents after `position`, a (rank, id) pair, in rank order (or
+        before it, in reverse order).
+        """
+        sql, params = f'SELECT {self.documents}.*, {FTS_TABLE}.rank AS rank {self.from_where}', list(self.params)
+        operator, direction = ('<', ' DESC') if reverse else ('>', '')
+        if position is not None:
+            sql += (
+                f' AND ({FTS_TABLE}.rank {operator} %s'
+                f' OR ({FTS_TABLE}.rank = %s AND {self.documents}.id {operator} %s))'
+            )
+            params += [position[0], position[0], position[1]]
+        sql += f' ORDER BY {FTS_TABLE}.rank{direction}, {self.documents}.id{direction} LIMIT %s'
+        return list(SearchDocument.objects.raw(sql, params + [limit]))
+
+
+def document_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    # Must stay identical to the expression of the GIN index created by migration 0004.
+    return SearchVector('title', weight='A', config='english') + SearchVector('body', weight='B', config='english')
+
+
+class PostgresSearch:
+    """
+    The PostgreSQL counterpart of SQLiteSearch, matching the GIN-indexed tsvector of
+    each document and ranked by ts_rank, negated so that lower ranks are better here too.
+    """
+
+    def __init__(self, user, terms, kinds=None):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        vector = document_vector()
+        query = SearchQuery(' & '.join(terms) + ':*', config='english', search_type='raw')
+        queryset = SearchDocument.objects.annotate(vector=vector).filter(
+            vector=query, team_id__in=user.team_memberships.values('team_id')
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        self.queryset = queryset.annotate(rank=SearchRank(vector, query) * -1.0)
+
+    def count(self):
+        return self.queryset.count()
+
+    def seek(self, position, reverse, limit):
+        queryset = self.queryset.order_by('-rank', '-id') if reverse else self.queryset.order_by('rank', 'id')
+        if position is not None:
+            lookup = 'lt' if reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'rank__{lookup}': position[0]}) | Q(rank=position[0], **{f'id__{lookup}': position[1]})
+            )
+        return list(queryset[:limit])
+
+
+def search(user, terms, kinds=None):
+    """
+    Ranked full-text matches of `terms` among the documents of the user's teams, to be
+    paged by api.pagination.SearchCursorPagination.
+    """
+    backends = {'sqlite': SQLiteSearch, 'postgresql': PostgresSearch}
+    if connection.vendor not in backends:
+        raise NotSupportedError(f"Full-text search is not available on {connection.vendor}.")
+    return backends[connection.vendor](user, terms, kinds)
@@ -1,11 +1,138 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.utils.text import Truncator
 
-from .models import User, Team, TeamMembership, Post, Comment, Event
+from .models import (
+    User, Team, TeamMembership, Post, Comment, Event, EventRecurrence, OccurrenceException, SearchDocument
+)
+from .recurrence import WEEKDAYS, parse_weekdays, is_occurrence
+from .fast_serializers import Column, Related
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_field_paths(value):
+    """
+    Tree of a comma-separated list of dotted field paths, as {name: subtree}, where a
+    field selected whole has None: "a,b.c" gives {'a': None, 'b': {'c': None}}.
+    """
+    tree = {}
+    for path in value.split(','):
+        names = [name.strip() for name in path.split('.')]
+        if not all(names):
+            continue
+        node = tree
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = None
+    return tree
+
+class FieldSelection:
+    """
+    The fields a client asked for with ?fields= and ?omit=, at one level of the payload:
+    `include` is a tree from parse_field_paths, or None for every field, and `omit` one
+    of the fields to leave out.
+    """
+
+    def __init__(self, include=None, omit=None):
+        self.include = include
+        self.omit = omit or {}
+
+    def wants(self, name):
+        if self.include is not None and name not in self.include:
+            return False
+        return not (name in self.omit and self.omit[name] is None)
+
+    def wants_only_id(self, name):
+        return self.include is not None and self.include.get(name) == {'id': None}
+
+    def needs(self, name):
+        """
+        Whether the relation `name` has to be loaded, i.e. more than its id is serialized.
+        """
+        return self.wants(name) and not self.wants_only_id(name)
+
+    def nested(self, name):
+        return FieldSelection(None if self.include is None else self.include.get(name), self.omit.get(name))
+
+def field_selection(request, path=()):
+    """
+    The FieldSelection of the request at `path`, a sequence of nested field names. Only
+    reads are shaped, so a write never loses the fields it validates.
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return FieldSelection()
+    selection = getattr(request, '_field_selection', None)
+    if selection is None:
+        params = request.query_params
+        selection = request._field_selection = FieldSelection(
+            parse_field_paths(params['fields']) if 'fields' in params else None,
+            parse_field_paths(params.get('omit', '')),
+        )
+    for name in path:
+        selection = selection.nested(name)
+    return selection
+
+class RelatedIdField(serializers.ReadOnlyField):
+    """
+    A to-one relation as {"id": ...}, read from its foreign key column so the related
+    row is neither joined nor loaded.
+    """
+
+    def to_representation(self, value):
+        return {'id': value}
+
+class SparseFieldsMixin:
+    """
+    Shape a serializer's payload from the request: ?fields= keeps only the listed fields
+    and ?omit= drops them, both taking dotted paths into nested serializers
+    (?fields=id,author.username). A to-one relation selected as "<name>.id" is read from
+    its foreign key. `expandable_fields` are left out unless named in ?expand=.
+
+    Viewsets read the same selection (field_selection()) to skip the joins, prefetches
+    and annotations of fields that are not serialized.
+    """
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None:
+            return fields
+        path = self.get_field_path()
+        selection = field_selection(request, path)
+        expansions = requested_expansions(request)
+        for name, field in list(fields.items()):
+            if not selection.wants(name) or (
+                name in self.expandable_fields and '.'.join([*path, name]) not in expansions
+            ):
+                del fields[name]
+            elif selection.wants_only_id(name) and isinstance(field, serializers.BaseSerializer):
+                attname = self.get_foreign_key_attname(field.source or name)
+                if attname is not None:
+                    fields[name] = RelatedIdField(source=attname)
+        return fields
+
+    def get_field_path(self):
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return path[::-1]
+
+    def get_foreign_key_attname(self, name):
+        try:
+            model_field = self.Meta.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+            return model_field.attname
+        return None
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
@@ -71,7 +198,7 @@ class UserLoginSerializer(serializers.Serializer):
         data['user'] = user
         return data
 
-class TeamMembershipSerializer(serializers.ModelSerializer):
+class TeamMembershipSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True) # Nested serializer for user details
     role_display = serializers.CharField(source='get_role_display', read_only=True)
 
@@ -80,22 +207,110 @@ class TeamMembershipSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'role', 'role_display', 'joined_at']
         read_only_fields = ['joined_at']
 
-class TeamSerializer(serializers.ModelSerializer):
+MEMBERS_PREVIEW_MAX = 20
+
+def requested_expansions(request):
+    """
+    Relations the client opted into with ?expand=a,b.
+    """
+    if request is None:
+        return set()
+    return {name.strip() for name in request.query_params.get('expand', '').split(',') if name.strip()}
+
+def members_preview_size(request):
+    """
+    Size of the capped member preview requested with ?preview=<n>, or 0 when none was asked for.
+    """
+    if request is None:
+        return 0
+    try:
+        size = int(request.query_params.get('preview', 0))
+    except ValueError:
+        return 0
+    return max(0, min(size, MEMBERS_PREVIEW_MAX))
+
+class TeamSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     trainer = UserSerializer(read_only=True)
+    member_count = serializers.SerializerMethodField()
+    my_membership = serializers.SerializerMethodField()
+    members_preview = serializers.SerializerMethodField()
+    # Only serialized with ?expand=memberships; use /teams/{id}/members/ to page through large teams.
     memberships = TeamMembershipSerializer(many=True, read_only=True)
+    expandable_fields = ('memberships',)
 
     class Meta:
         model = Team
-        fields = ['id', 'name', 'description', 'trainer', 'memberships', 'created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'description', 'trainer', 'member_count', 'my_membership',
+            'members_preview', 'memberships', 'created_at', 'updated_at'
+        ]
         read_only_fields = ['trainer', 'created_at', 'updated_at']
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if not members_preview_size(self.context.get('request')):
+            fields.pop('members_preview', None)
+        return fields
+
+    def get_member_count(self, obj):
+        # Annotated by TeamViewSet.get_queryset; fall back to a query for freshly created teams.
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
+        return obj.memberships.count()
+
+    def get_fast_field(self, name):
+        # See api.fast_serializers; member_count is annotated by TeamViewSet.get_queryset.
+        if name == 'member_count':
+            return Column('member_count')
+        if name == 'my_membership':
+            return Related(
+                lambda request: TeamMembership.objects.filter(user=request.user), 'team_id', TeamMembershipSerializer()
+            )
+        return None
+
+    def get_my_membership(self, obj):
+        if hasattr(obj, 'own_memberships'):
+            memberships = obj.own_memberships
+        else:
+            memberships = obj.memberships.filter(user=self.context['request'].user)
+        membership = next(iter(memberships), None)
+        return TeamMembershipSerializer(membership).data if membership else None
+
+    def get_members_preview(self, obj):
+        if hasattr(obj, 'members_preview_list'):
+            memberships = obj.members_preview_list
+        else:
+            size = members_preview_size(self.context.get('request'))
+            memberships = obj.memberships.select_related('user').order_by('joined_at', 'id')[:size]
+        return TeamMembershipSerializer(memberships, many=True).data
+
     def create(self, validated_data):
         validated_data['trainer'] = self.context['request'].user
         team = Team.objects.create(**validated_data)
         TeamMembership.objects.create(team=team, user=self.context['request'].user, role=TeamMembership.Role.TRAINER)
         return team
 
-class CommentSerializer(serializers.ModelSerializer):
+class TeamSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Directory entry of a team (TeamViewSet.discover): its own columns only, no joins.
+    """
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'description', 'created_at']
+        read_only_fields = fields
+
+class TeamExportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    A team's own record in its export (api.export); memberships are exported as rows of their own.
+    """
+    trainer = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'description', 'trainer', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
 
     class Meta:
@@ -107,7 +322,7 @@ class CommentSerializer(serializers.ModelSerializer):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     comments_count = serializers.SerializerMethodField()
     # FIX: Nested comments for Post detail view
@@ -119,20 +334,200 @@ class PostSerializer(serializers.ModelSerializer):
         read_only_fields = ['author', 'created_at', 'updated_at', 'team']
 
     def get_comments_count(self, obj):
+        # Annotated by PostViewSet.get_queryset; fall back to a query for freshly created posts.
+        if hasattr(obj, 'comments_count'):
+            return obj.comments_count
         return obj.comments.count()
 
+    def get_fast_field(self, name):
+        # See api.fast_serializers; comments_count is annotated by PostViewSet.get_queryset.
+        return Column('comments_count') if name == 'comments_count' else None
+
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
-class EventSerializer(serializers.ModelSerializer):
+class PostListSerializer(PostSerializer):
+    """
+    Feed representation of a post: no embedded comments, which are served by the post
+    detail and the paginated comments endpoint instead.
+    """
+    class Meta(PostSerializer.Meta):
+        fields = ['id', 'team', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments_count']
+
+class PostExportSerializer(PostSerializer):
+    """
+    A post in a team export (api.export), whose comments are exported as rows of their own.
+    """
+    class Meta(PostSerializer.Meta):
+        fields = ['id', 'team', 'author', 'title', 'content', 'created_at', 'updated_at']
+
+class EventRecurrenceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = EventRecurrence
+        fields = ['frequency', 'interval', 'weekdays', 'count', 'until']
+        extra_kwargs = {'interval': {'min_value': 1}, 'count': {'min_value': 1}}
+
+    def validate_weekdays(self, value):
+        try:
+            return ','.join(WEEKDAYS[day] for day in parse_weekdays(value))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def validate(self, data):
+        if data.get('weekdays') and data.get('frequency') != EventRecurrence.Frequency.WEEKLY:
+            raise serializers.ValidationError({'weekdays': "Weekdays only apply to weekly series."})
+        if data.get('count') and data.get('until'):
+            raise serializers.ValidationError("Set either 'count' or 'until', not both.")
+        return data
+
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     trainer = UserSerializer(read_only=True)
+    # Makes the event the first occurrence of a series; see api.recurrence.
+    recurrence = EventRecurrenceSerializer(required=False, allow_null=True)
 
     class Meta:
         model = Event
-        fields = ['id', 'team', 'trainer', 'title', 'description', 'start_time', 'end_time', 'location', 'created_at', 'updated_at']
+        fields = ['id', 'team', 'trainer', 'title', 'description', 'start_time', 'end_time', 'location', 'recurrence', 'created_at', 'updated_at']
         read_only_fields = ['trainer', 'created_at', 'updated_at', 'team']
 
     def create(self, validated_data):
         validated_data['trainer'] = self.context['request'].user
-        return super().create(validated_data)
+        recurrence = validated_data.pop('recurrence', None)
+        event = super().create(validated_data)
+        if recurrence:
+            event.recurrence = EventRecurrence.objects.create(event=event, **recurrence)
+        return event
+
+    def update(self, instance, validated_data):
+        if 'recurrence' not in validated_data:
+            return super().update(instance, validated_data)
+        recurrence = validated_data.pop('recurrence')
+        event = super().update(instance, validated_data)
+        if recurrence is None:
+            EventRecurrence.objects.filter(event=event).delete()
+            # Forget the deleted row cached by select_related.
+            Event.recurrence.related.delete_cached_value(event)
+        else:
+            event.recurrence, _ = EventRecurrence.objects.update_or_create(event=event, defaults=recurrence)
+        return event
+
+class EventOccurrenceSerializer(EventSerializer):
+    """
+    An event or one occurrence of a recurring event (api.recurrence.Occurrence), which
+    carries the start time its rule gave it in `original_start`.
+    """
+    original_start = serializers.DateTimeField(read_only=True, allow_null=True)
+
+    class Meta(EventSerializer.Meta):
+        fields = EventSerializer.Meta.fields + ['original_start']
+
+class OccurrenceExceptionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OccurrenceException
+        fields = ['id', 'original_start', 'cancelled', 'start_time', 'end_time', 'title', 'description', 'location']
+
+    def validate_original_start(self, value):
+        if not is_occurrence(self.context['event'], value):
+            raise serializers.ValidationError("The series has no occurrence starting at this time.")
+        return value
+
+class OccurrenceExceptionExportSerializer(OccurrenceExceptionSerializer):
+    """
+    An occurrence exception in a team export (api.export), with the id of its series.
+    """
+    class Meta(OccurrenceExceptionSerializer.Meta):
+        fields = ['id', 'event'] + OccurrenceExceptionSerializer.Meta.fields[1:]
+
+class CalendarEventSerializer(EventOccurrenceSerializer):
+    """
+    Calendar representation of an event, with the ids of the caller's other events it overlaps.
+    """
+    conflicts = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta(EventOccurrenceSerializer.Meta):
+        fields = EventOccurrenceSerializer.Meta.fields + ['conflicts']
+
+class UsernameField(serializers.CharField):
+    """
+    A user named by username, given as a string or as a user object of an export
+    ({"username": ...}); api.importer resolves it to an id.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', User._meta.get_field('username').max_length)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = data.get('username')
+        return super().to_internal_value(data)
+
+class MembershipImportSerializer(serializers.ModelSerializer):
+    """
+    A membership record of a bulk import (api.importer). The role defaults to member;
+    trainers are not imported, the team has its own.
+    """
+    user = UsernameField()
+    joined_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = TeamMembership
+        fields = ['user', 'role', 'joined_at']
+        extra_kwargs = {'role': {'required': False}}
+
+    def validate_role(self, value):
+        if value == TeamMembership.Role.TRAINER:
+            raise serializers.ValidationError("Trainers cannot be imported; the team keeps its own.")
+        return value
+
+class CommentImportSerializer(serializers.ModelSerializer):
+    """
+    A comment of a bulk import, on an existing post of the team (`post`) or nested in
+    the `comments` of an imported post.
+    """
+    post = serializers.IntegerField(required=False)
+    author = UsernameField()
+    created_at = serializers.DateTimeField(required=False)
+    updated_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = Comment
+        fields = ['post', 'author', 'content', 'created_at', 'updated_at']
+
+class PostImportSerializer(serializers.ModelSerializer):
+    author = UsernameField()
+    created_at = serializers.DateTimeField(required=False)
+    updated_at = serializers.DateTimeField(required=False)
+    comments = CommentImportSerializer(many=True, required=False)
+
+    class Meta:
+        model = Post
+        fields = ['author', 'title', 'content', 'created_at', 'updated_at', 'comments']
+
+class EventImportSerializer(serializers.ModelSerializer):
+    """
+    An event of a bulk import; the trainer defaults to the team's.
+    """
+    trainer = UsernameField(required=False)
+    created_at = serializers.DateTimeField(required=False)
+    updated_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = Event
+        fields = ['trainer', 'title', 'description', 'start_time', 'end_time', 'location', 'created_at', 'updated_at']
+
+class SearchResultSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    A search hit: the matching post, comment or event (`type` and `id`), the team and,
+    for posts and comments, the post to open, with the start of its text.
+    """
+    type = serializers.CharField(source='kind')
+    id = serializers.IntegerField(source='object_id')
+    excerpt = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SearchDocument
+        fields = ['type', 'id', 'team', 'post', 'title', 'excerpt', 'created_at']
+
+    def get_excerpt(self, document):
+        return Truncator(document.body).chars(200)
@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token
+from .membership import invalidate_membership, invalidate_team
+from .models import (
+    User, Team, TeamMembership, Post, Comment, Event, EventRecurrence, OccurrenceException, SearchDocument
+)
+from .response_cache import response_cache
+from .serializers import UserSerializer
+from .search import comment_fields, event_fields, index_document, post_fields, remove_document
+
+
+def invalidate(func, *args):
+    """
+    Run the cache invalidation `func(*args)` now, so the rest of the transaction sees the
+    change, and again once it commits: until then other requests still read the old rows
+    and may cache them again.
+    """
+    func(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: func(*args))
+
+
+@receiver([post_save, post_delete], sender=TeamMembership)
+def membership_changed(sender, instance, **kwargs):
+    invalidate(invalidate_membership, instance.user_id, instance.team_id)
+    invalidate(response_cache.bump, instance.team_id)
+
+
+@receiver([post_save, post_delete], sender=Team)
+def team_changed(sender, instance, **kwargs):
+    # Covers trainer changes as well as teams created under an id that was cached as missing.
+    invalidate(invalidate_team, instance.pk)
+    invalidate(response_cache.bump, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Event)
+def team_content_changed(sender, instance, **kwargs):
+    invalidate(response_cache.bump, instance.team_id)
+
+
+def comment_team_id(comment):
+    if Comment.post.is_cached(comment):
+        return comment.post.team_id
+    return Post.objects.filter(pk=comment.post_id).values_list('team_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Post, Team)):
+        # Cascaded from a post or team delete, whose own signal already bumps the version.
+        return
+    team_id = comment_team_id(instance)
+    if team_id is not None:
+        invalidate(response_cache.bump, team_id)
+
+
+def indexes_text(update_fields, *fields):
+    return update_fields is None or not set(update_fields).isdisjoint(fields)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs):
+    if indexes_text(update_fields, 'title', 'content'):
+        index_document(SearchDocument.Kind.POST, instance.pk, post_fields(instance), created)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, update_fields=None, **kwargs):
+    if indexes_text(update_fields, 'content'):
+        fields = comment_fields(instance, comment_team_id(instance))
+        index_document(SearchDocument.Kind.COMMENT, instance.pk, fields, created)
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, update_fields=None, **kwargs):
+    if indexes_text(update_fields, 'title', 'description', 'location'):
+        index_document(SearchDocument.Kind.EVENT, instance.pk, event_fields(instance), created)
+
+
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Event)
+def searchable_deleted(sender, instance, origin=None, **kwargs):
+    # Documents of deleted posts and teams go with them through their foreign keys.
+    if not isinstance(origin, (Post, Team)):
+        kind = SearchDocument.Kind.COMMENT if sender is Comment else SearchDocument.Kind.EVENT
+        remove_document(kind, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=EventRecurrence)
+@receiver([post_save, post_delete], sender=OccurrenceException)
+def event_schedule_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Event, Team)):
+        return
+    if sender.event.is_cached(instance):
+        team_id = instance.event.team_id
+    else:
+        team_id = Event.objects.filter(pk=instance.event_id).values_list('team_id', flat=True).first()
+    if team_id is not None:
+        invalidate(response_cache.bump, team_id)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate(invalidate_token, instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Cached tokens carry a snapshot of their user, e.g. is_active.
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        invalidate(invalidate_token, key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Cached payloads embed users (trainer, author, members) through UserSerializer, and
+    # only members of a team appear in its payloads. Deleted users' memberships send
+    # their own signals as they cascade.
+    if created or not indexes_text(update_fields, *UserSerializer.Meta.fields):
+        return
+    for team_id in TeamMembership.objects.filter(user_id=instance.pk).values_list('team_id', flat=True):
+        invalidate(response_cache.bump, team_id)
@@ -0,0 +1,35 @@
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+async def iterate_in_thread(chunks):
+    """
+    Async iterator over the sync iterator `chunks`, advanced one chunk at a time in the
+    thread that runs the request's ORM calls, so the database cursors `chunks` reads stay
+    on one connection. Closes `chunks` if the client goes away first.
+    """
+    advance = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await advance(chunks, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """
+    A StreamingHttpResponse of the generator `chunks` that streams with constant memory
+    under WSGI and ASGI alike. Django serves sync iterators over ASGI by reading them
+    whole with sync_to_async(list), so ASGI requests get an async iterator instead.
+    """
+    # ASGIRequest has the connection's scope; DRF's Request passes the lookup through.
+    if getattr(request, 'scope', None) is not None:
+        chunks = iterate_in_thread(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
@@ -1,3 +1,2057 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import importlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from .models import (
+    User, Team, TeamMembership, Post, Comment, Event, EventRecurrence, OccurrenceException, SearchDocument
+)
+from rest_framework.authtoken.models import Token
+
+from .membership import membership_cache
+from .authentication import token_cache
+from .response_cache import response_cache
+from .fast_serializers import Plan
+from .renderers import FastJSONRenderer
+from .recurrence import expand
+from .realtime import get_broker, team_channel
+from .importer import ImportStopped, TeamImport
+from .export import iter_records
+from .ical import event_block
+from .management.commands.explain_queries import SEQUENTIAL_SCAN
+
+
+class QueryBudgetMixin:
+    """
+    Assertions that fail when an endpoint's query count depends on the size of its result.
+    """
+
+    def count_queries(self, url):
+        # Budgets apply to the uncached path.
+        response_cache.backend.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return ctx
+
+    def assertConstantQueries(self, url, grow, max_queries=None):
+        """
+        Request `url`, call `grow()` to add more rows to the result, request it again and
+        assert that both requests issued the same number of queries (and at most `max_queries`).
+        A warm-up request runs first so per-process caches are in their steady state.
+        """
+        self.count_queries(url)
+        before = self.count_queries(url)
+        grow()
+        after = self.count_queries(url)
+
+        queries = "\n".join(q['sql'] for q in after.captured_queries)
+        self.assertEqual(
+            len(before), len(after),
+            f"{url} went from {len(before)} to {len(after)} queries as the result grew:\n{queries}"
+        )
+        if max_queries is not None:
+            self.assertLessEqual(len(after), max_queries, f"{url} exceeded its query budget:\n{queries}")
+
+
+class FixtureMixin:
+    sequence = 0
+
+    def setUp(self):
+        super().setUp()
+        # Rolled-back test transactions never fire the invalidation signals.
+        membership_cache.clear()
+        token_cache.clear()
+        response_cache.backend.clear()
+
+    def make_user(self):
+        FixtureMixin.sequence += 1
+        return User.objects.create_user(username=f"user{FixtureMixin.sequence}")
+
+    def make_team(self, trainer, members=0):
+        FixtureMixin.sequence += 1
+        team = Team.objects.create(name=f"Team {FixtureMixin.sequence}", trainer=trainer)
+        TeamMembership.objects.create(team=team, user=trainer, role=TeamMembership.Role.TRAINER)
+        self.add_members(team, members)
+        return team
+
+    def add_members(self, team, count, role=TeamMembership.Role.ATHLETE):
+        for _ in range(count):
+            TeamMembership.objects.create(team=team, user=self.make_user(), role=role)
+
+
+class TeamQueryBudgetTests(QueryBudgetMixin, FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+
+    def test_team_list(self):
+        def grow():
+            self.add_members(self.team, 20)
+            for _ in range(5):
+                self.make_team(self.make_user(), members=10)
+
+        self.assertConstantQueries('/api/teams/', grow, max_queries=4)
+
+    def test_team_retrieve(self):
+        self.assertConstantQueries(
+            f'/api/teams/{self.team.pk}/', lambda: self.add_members(self.team, 30), max_queries=4
+        )
+
+    def test_team_list_expanded(self):
+        self.assertConstantQueries(
+            '/api/teams/?expand=memberships&preview=5', lambda: self.add_members(self.team, 20), max_queries=6
+        )
+
+    def test_member_list(self):
+        self.assertConstantQueries(
+            f'/api/teams/{self.team.pk}/members/', lambda: self.add_members(self.team, 20), max_queries=4
+        )
+
+
+class TeamMembershipPayloadTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=30)
+
+    def test_team_detail_omits_members_by_default(self):
+        data = self.client.get(f'/api/teams/{self.team.pk}/').json()
+        self.assertEqual(data['member_count'], 31)
+        self.assertEqual(data['my_membership']['role'], TeamMembership.Role.TRAINER)
+        self.assertNotIn('memberships', data)
+        self.assertNotIn('members_preview', data)
+
+    def test_preview_is_capped(self):
+        data = self.client.get(f'/api/teams/{self.team.pk}/?preview=3').json()
+        self.assertEqual(len(data['members_preview']), 3)
+        data = self.client.get(f'/api/teams/{self.team.pk}/?preview=1000').json()
+        self.assertEqual(len(data['members_preview']), 20)
+
+    def test_expand_memberships(self):
+        data = self.client.get(f'/api/teams/{self.team.pk}/?expand=memberships').json()
+        self.assertEqual(len(data['memberships']), 31)
+
+    def test_member_list_cursor_pagination(self):
+        url = f'/api/teams/{self.team.pk}/members/?page_size=20'
+        first = self.client.get(url).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(len(second['results']), 11)
+        self.assertIsNone(second['next'])
+
+    def test_member_list_requires_membership(self):
+        self.client.force_authenticate(self.make_user())
+        data = self.client.get(f'/api/teams/{self.team.pk}/members/').json()
+        self.assertEqual(data['results'], [])
+
+
+
+class TeamListScopeTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.coached = self.make_team(self.user)
+        self.joined = self.make_team(self.make_user())
+        TeamMembership.objects.create(team=self.joined, user=self.user, role=TeamMembership.Role.ATHLETE)
+        self.other = self.make_team(self.make_user(), members=3)
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [team['name'] for team in response.json()['results']]
+
+    def test_lists_own_teams_only(self):
+        self.assertEqual(self.names('/api/teams/'), [self.coached.name, self.joined.name])
+        self.assertEqual(self.client.get('/api/teams/').json()['results'][1]['member_count'], 2)
+
+    def test_role_filter(self):
+        self.assertEqual(self.names('/api/teams/?role=trainer'), [self.coached.name])
+        self.assertEqual(self.names('/api/teams/?role=athlete'), [self.joined.name])
+        self.assertEqual(self.names('/api/teams/?role=member'), [])
+        self.assertEqual(self.client.get('/api/teams/?role=captain').status_code, 400)
+
+    def test_discover(self):
+        response = self.client.get('/api/teams/discover/')
+        self.assertEqual(response.status_code, 200)
+        [team] = response.json()['results']
+        self.assertEqual(set(team), {'id', 'name', 'description', 'created_at'})
+        self.assertEqual(team['id'], self.other.pk)
+
+        for _ in range(3):
+            self.make_team(self.make_user())
+        first = self.client.get('/api/teams/discover/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+        names = [team['name'] for team in first['results'] + second['results']]
+        self.assertEqual(names, sorted(Team.objects.exclude(memberships__user=self.user).values_list('name', flat=True)))
+
+
+
+class SparseFieldsTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        self.post = Post.objects.create(team=self.team, author=self.user, title='Kit', content='New kit')
+        Comment.objects.create(post=self.post, author=self.user, content='Nice')
+        self.posts_url = f'/api/teams/{self.team.pk}/posts/'
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [query['sql'] for query in ctx.captured_queries]
+
+    def test_fields_and_related_ids(self):
+        data, queries = self.get(f'{self.posts_url}?fields=id,title,author.id')
+        self.assertEqual(data['results'], [{'id': self.post.pk, 'title': 'Kit', 'author': {'id': self.user.pk}}])
+        # The page is read without the author join or the comment count.
+        self.assertNotIn('api_user', queries[-1])
+        self.assertNotIn('api_comment', queries[-1])
+
+    def test_omit(self):
+        data, queries = self.get(f'{self.posts_url}?omit=author,comments_count,content')
+        self.assertEqual(set(data['results'][0]), {'id', 'team', 'title', 'created_at', 'updated_at'})
+        self.assertFalse([sql for sql in queries if 'api_user' in sql], queries)
+        data, _ = self.get(f'{self.posts_url}?omit=author.email,author.first_name')
+        self.assertEqual(set(data['results'][0]['author']), {'id', 'username', 'last_name'})
+
+    def test_nested_paths(self):
+        data, _ = self.get(f'{self.posts_url}{self.post.pk}/?fields=title,comments.content,comments.author.id')
+        self.assertEqual(data, {'title': 'Kit', 'comments': [{'content': 'Nice', 'author': {'id': self.user.pk}}]})
+        data, _ = self.get(f'/api/teams/{self.team.pk}/?expand=memberships&fields=id,memberships.user.username')
+        self.assertEqual(len(data['memberships']), 3)
+        self.assertEqual(set(data['memberships'][0]), {'user'})
+        self.assertEqual(set(data['memberships'][0]['user']), {'username'})
+
+    def test_unrequested_relations_are_not_loaded(self):
+        _, full = self.get('/api/teams/')
+        data, sparse = self.get('/api/teams/?fields=id,name,trainer.id')
+        self.assertEqual(data['results'], [{'id': self.team.pk, 'name': self.team.name, 'trainer': {'id': self.user.pk}}])
+        # No own-membership prefetch, member count or trainer join.
+        self.assertEqual(len(sparse), len(full) - 1)
+        self.assertFalse([sql for sql in sparse if 'api_user' in sql or 'COUNT("api_teammembership' in sql], sparse)
+
+    def test_writes_are_not_shaped(self):
+        response = self.client.post(f'{self.posts_url}?fields=id', {'title': 'News', 'content': '...'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['title'], 'News')
+
+
+class FastSerializerTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        orphan = self.make_team(self.make_user())
+        TeamMembership.objects.create(team=orphan, user=self.user, role=TeamMembership.Role.ATHLETE)
+        Team.objects.filter(pk=orphan.pk).update(trainer=None, description='Ünïcode   line')
+        self.post = Post.objects.create(team=self.team, author=self.user, title='Kit ✓', content='New kit')
+        Post.objects.create(team=self.team, author=self.user, title='Quiet', content='')
+        Comment.objects.create(post=self.post, author=self.user, content='Nice')
+        Event.objects.create(team=self.team, trainer=self.user, title='Match', start_time='2030-01-01T09:00Z')
+        series = Event.objects.create(
+            team=self.team, trainer=self.user, title='Training', start_time='2030-01-02T18:00Z',
+            end_time='2030-01-02T19:30Z', location='Field'
+        )
+        EventRecurrence.objects.create(event=series, frequency='WEEKLY', weekdays='TU,TH', until='2030-06-01T00:00Z')
+
+    def get(self, url, fast):
+        membership_cache.clear()
+        response_cache.backend.clear()
+        with override_settings(FAST_SERIALIZERS=fast), CaptureQueriesContext(connection) as ctx:
+            with mock.patch('api.fast_serializers.Plan.serialize', autospec=True, side_effect=Plan.serialize) as serialize:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, len(ctx.captured_queries), serialize.called
+
+    def test_same_payload_and_queries_as_drf(self):
+        posts, team = f'/api/teams/{self.team.pk}/posts/', f'/api/teams/{self.team.pk}'
+        for url in (
+            '/api/teams/', '/api/teams/?role=athlete', '/api/teams/?fields=id,trainer.id,my_membership',
+            '/api/teams/?omit=trainer.email,member_count', f'{posts}', f'{posts}?page_size=1&count=true',
+            f'{posts}?fields=id,author.id', f'{posts}?omit=comments_count,author.email', f'{team}/events/',
+            f'{team}/events/?fields=title,recurrence.until', f'{posts}{self.post.pk}/comments/',
+            f'{posts}{self.post.pk}/comments/?fields=post,author.id',
+        ):
+            with self.subTest(url=url):
+                fast, fast_queries, used = self.get(url, True)
+                self.assertTrue(used)
+                slow, slow_queries, _ = self.get(url, False)
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast_queries, slow_queries)
+
+    def test_cursor_from_dict_rows(self):
+        first, _, _ = self.get(f'/api/teams/{self.team.pk}/posts/?page_size=1', True)
+        second, _, _ = self.get(first.json()['next'], True)
+        self.assertEqual([post['title'] for post in second.json()['results']], ['Kit ✓'])
+
+    def test_unsupported_fields_use_drf(self):
+        for url in ('/api/teams/?expand=memberships', '/api/teams/?preview=2'):
+            with self.subTest(url=url):
+                _, _, used = self.get(url, True)
+                self.assertFalse(used)
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'é ✓    "quoted" \\', 'when': timezone.now(), 'none': None, 'nested': [{'n': 1}],
+            'decimal': Decimal('1.50'), 'separators': '\u2028\u2029',
+        }
+        for media_type in ('application/json', 'application/json; indent=2'):
+            self.assertEqual(
+                FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type), media_type
+            )
+        # The compact output comes from orjson, not the fallback.
+        with mock.patch.object(JSONRenderer, 'render', side_effect=AssertionError):
+            FastJSONRenderer().render(data, 'application/json')
+
+
+class FeedQueryBudgetTests(QueryBudgetMixin, FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        self.post = Post.objects.create(team=self.team, author=self.user, title='Welcome', content='Hello')
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        Event.objects.create(team=self.team, trainer=self.user, title='Kick-off', start_time='2030-01-01T09:00Z')
+
+    def test_event_list(self):
+        def grow():
+            for i in range(5):
+                Event.objects.create(
+                    team=self.team, trainer=self.make_user(), title=f"Event {i}", start_time='2030-01-01T10:00Z'
+                )
+
+        self.assertConstantQueries(f'/api/teams/{self.team.pk}/events/', grow)
+
+    def test_post_list(self):
+        def grow():
+            for i in range(5):
+                post = Post.objects.create(team=self.team, author=self.make_user(), title=f"Post {i}", content='...')
+                Comment.objects.create(post=post, author=self.make_user(), content='Nice')
+
+        self.assertConstantQueries(f'/api/teams/{self.team.pk}/posts/', grow)
+
+    def test_post_list_embeds_no_comments(self):
+        post = self.client.get(f'/api/teams/{self.team.pk}/posts/').json()['results'][0]
+        self.assertEqual(post['comments_count'], 1)
+        self.assertNotIn('comments', post)
+
+    def test_post_retrieve(self):
+        def grow():
+            for _ in range(5):
+                Comment.objects.create(post=self.post, author=self.make_user(), content='Nice')
+
+        self.assertConstantQueries(f'/api/teams/{self.team.pk}/posts/{self.post.pk}/', grow)
+        post = self.client.get(f'/api/teams/{self.team.pk}/posts/{self.post.pk}/').json()
+        self.assertEqual(post['comments_count'], 6)
+        self.assertEqual(len(post['comments']), 6)
+
+    def test_comment_list(self):
+        def grow():
+            for _ in range(5):
+                Comment.objects.create(post=self.post, author=self.make_user(), content='Nice')
+
+        self.assertConstantQueries(f'/api/teams/{self.team.pk}/posts/{self.post.pk}/comments/', grow)
+
+
+class MembershipCacheTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.athlete = self.make_user()
+        self.team = self.make_team(self.user)
+        TeamMembership.objects.create(team=self.team, user=self.athlete, role=TeamMembership.Role.ATHLETE)
+        self.post = Post.objects.create(team=self.team, author=self.user, title='Welcome', content='Hello')
+        self.comment = Comment.objects.create(post=self.post, author=self.athlete, content='First')
+        self.comment_url = f'/api/teams/{self.team.pk}/posts/{self.post.pk}/comments/{self.comment.pk}/'
+
+    def test_membership_is_resolved_once(self):
+        self.client.force_authenticate(self.athlete)
+        self.client.get(self.comment_url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.comment_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'api_teammembership' in q['sql']])
+
+    def test_removed_member_loses_access(self):
+        self.client.force_authenticate(self.athlete)
+        self.assertEqual(self.client.get(self.comment_url).status_code, 200)
+        TeamMembership.objects.filter(team=self.team, user=self.athlete).delete()
+        self.assertEqual(self.client.get(self.comment_url).status_code, 404)
+
+    def test_removal_is_invalidated_again_after_commit(self):
+        self.client.force_authenticate(self.athlete)
+        self.assertEqual(self.client.get(self.comment_url).status_code, 200)
+        stale = membership_cache.get((self.athlete.pk, self.team.pk))
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete(
+                f'/api/teams/{self.team.pk}/remove-member/', {'username': self.athlete.username}, format='json'
+            )
+            self.assertEqual(response.status_code, 204)
+        # A concurrent request caches the membership it still sees before the commit.
+        membership_cache.set((self.athlete.pk, self.team.pk), stale)
+        for callback in callbacks:
+            callback()
+        self.client.force_authenticate(self.athlete)
+        self.assertEqual(self.client.get(self.comment_url).status_code, 404)
+
+    def test_trainer_change_is_picked_up(self):
+        self.client.force_authenticate(self.athlete)
+        events_url = f'/api/teams/{self.team.pk}/events/'
+        event = {'title': 'Training', 'start_time': '2030-01-01T10:00Z'}
+        self.assertEqual(self.client.post(events_url, event).status_code, 403)
+        self.team.trainer = self.athlete
+        self.team.save()
+        self.assertEqual(self.client.post(events_url, event).status_code, 201)
+
+
+class TokenCacheTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_resolved_once(self):
+        self.client.get('/api/teams/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/teams/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'authtoken_token' in q['sql']])
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.client.get('/api/teams/').status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        # Dropped from the shared backend, not just from this process.
+        self.assertIsNone(caches[token_cache.alias].get(token_cache.key(self.token.key)))
+        # SessionAuthentication comes first, so unauthenticated requests get 403 rather than 401.
+        self.assertEqual(self.client.get('/api/teams/').status_code, 403)
+
+    def test_malformed_header(self):
+        for header in ('Token', f'Token {self.token.key} extra'):
+            self.client.credentials(HTTP_AUTHORIZATION=header)
+            self.assertEqual(self.client.get('/api/teams/').status_code, 403, header)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/teams/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/teams/').status_code, 403)
+
+
+class FeedPaginationTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user)
+        self.url = f'/api/teams/{self.team.pk}/posts/'
+        # Identical timestamps force the id tie-breaker to keep pages stable.
+        posts = Post.objects.bulk_create(
+            Post(team=self.team, author=self.user, title=f"Post {i}", content='...') for i in range(25)
+        )
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(created_at='2030-01-01T10:00Z')
+
+    def collect(self, url):
+        ids = []
+        while url:
+            page = self.client.get(url).json()
+            ids += [post['id'] for post in page['results']]
+            url = page['next']
+        return ids
+
+    def test_walks_every_row_once_in_order(self):
+        ids = self.collect(self.url + '?page_size=7')
+        self.assertEqual(ids, sorted(Post.objects.values_list('id', flat=True), reverse=True))
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.client.get(self.url).json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_count_is_opt_in(self):
+        self.assertNotIn('count', self.client.get(self.url).json())
+        self.assertEqual(self.client.get(self.url + '?count=true').json()['count'], 25)
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(self.client.get(self.url + '?page_size=500').json()['results']), 25)
+        self.assertEqual(len(self.client.get(self.url + '?page_size=2').json()['results']), 2)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url + '?cursor=garbage').status_code, 404)
+
+    def test_tampered_cursor(self):
+        def cursor(position):
+            return base64.urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+
+        for position in (['garbage', 1], [{'x': 1}, 1], [None, None], ['2020-01-01T00:00:00Z', 'abc']):
+            self.assertEqual(self.client.get(f'{self.url}?cursor={cursor(position)}').status_code, 404, position)
+        members = f'/api/teams/{self.team.pk}/members/?cursor={cursor(["nope", 1])}'
+        self.assertEqual(self.client.get(members).status_code, 404)
+        self.assertEqual(self.client.get(f'{self.url}?cursor={cursor(["2030-01-01T10:00:00Z", 1])}').status_code, 200)
+
+    def test_deep_page_issues_no_count_or_offset(self):
+        url = self.client.get(self.url + '?page_size=20').json()['next']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('COUNT(*)', sql)
+        self.assertNotIn('OFFSET', sql)
+
+
+class ExplainQueriesCommandTests(FixtureMixin, APITestCase):
+    def test_feed_queries_use_indexes(self):
+        user = self.make_user()
+        team = self.make_team(user, members=3)
+        post = Post.objects.create(team=team, author=user, title='Welcome', content='Hello')
+        Comment.objects.create(post=post, author=user, content='First')
+
+        out = StringIO()
+        call_command('explain_queries', team=team.pk, stdout=out)
+        output = out.getvalue()
+        for name in ('team posts list', 'post comments list', 'team events list', 'team members list', 'my calendar'):
+            section = output.split(name, 1)[1].split('\n\n', 1)[0]
+            self.assertNotIn('sequential scan', section, output)
+
+    def test_index_scans_are_not_flagged(self):
+        for line, flagged in (
+            ('SCAN api_post', True),
+            ('Seq Scan on api_post  (cost=0.00..1.01 rows=1 width=8)', True),
+            ('SCAN api_post USING INDEX post_team_created_idx', False),
+            ('SCAN api_teammembership USING COVERING INDEX api_teammembership_team_id_idx', False),
+            ('SEARCH api_post USING INDEX post_team_created_idx (team_id=?)', False),
+            ('Index Scan using api_post_pkey on api_post', False),
+        ):
+            self.assertEqual(bool(SEQUENTIAL_SCAN.search(line)), flagged, line)
+
+
+class SeedCommandTests(APITestCase):
+    options = dict(users=40, teams=4, memberships=30, posts=12, comments=50, events=8, stdout=StringIO())
+
+    def test_seeds_requested_counts(self):
+        call_command('seed', seed=7, **self.options)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Team.objects.count(), 4)
+        self.assertEqual(TeamMembership.objects.count(), 30)
+        self.assertEqual(TeamMembership.objects.filter(role=TeamMembership.Role.TRAINER).count(), 4)
+        self.assertEqual(Post.objects.count(), 12)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(Event.objects.count(), 8)
+        # Comment authors are members of the post's team.
+        members = set(TeamMembership.objects.values_list('team_id', 'user_id'))
+        self.assertLessEqual(set(Comment.objects.values_list('post__team_id', 'author_id')), members)
+
+    def seeded(self):
+        return [
+            list(User.objects.order_by('id').values_list('username', 'date_joined')),
+            list(Team.objects.order_by('id').values_list('name', 'created_at')),
+            list(Post.objects.order_by('id').values_list('title', 'created_at')),
+            list(Comment.objects.order_by('id').values_list('content', 'created_at')),
+            list(Event.objects.order_by('id').values_list('start_time', 'created_at')),
+        ]
+
+    def test_same_seed_same_data(self):
+        call_command('seed', seed=7, **self.options)
+        first = self.seeded()
+        User.objects.all().delete()
+        Team.objects.all().delete()
+        call_command('seed', seed=7, **self.options)
+        self.assertEqual(self.seeded(), first)
+
+    def test_timestamps_are_spread_before_the_anchor(self):
+        call_command('seed', seed=7, anchor='2024-01-01T00:00:00Z', **self.options)
+        anchor = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        created = list(Post.objects.values_list('created_at', flat=True))
+        self.assertEqual(len(set(created)), len(created))
+        self.assertTrue(all(anchor - timedelta(days=365) <= when <= anchor for when in created))
+        for comment in Comment.objects.select_related('post'):
+            self.assertTrue(comment.post.created_at <= comment.created_at <= anchor)
+        self.assertFalse(Event.objects.filter(created_at__gt=anchor).exists())
+
+    def test_rejects_impossible_counts(self):
+        for options in (
+            dict(self.options, teams=0, memberships=0, events=0),
+            dict(self.options, teams=0, memberships=0, posts=0, comments=0),
+            dict(self.options, posts=-1),
+            dict(self.options, memberships=161),
+            dict(self.options, anchor='soon'),
+            dict(self.options, anchor='2024-13-01T00:00:00Z'),
+        ):
+            with self.subTest(options=options), self.assertRaises(CommandError):
+                call_command('seed', **options)
+        self.assertFalse(User.objects.exists())
+
+
+class BenchmarkCommandTests(APITestCase):
+    def test_reports_every_route(self):
+        call_command(
+            'seed', users=60, teams=3, memberships=20, posts=5, comments=10, events=5, stdout=StringIO()
+        )
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark', use_existing_db=True, iterations=2, warmup=1, output=output.name, stdout=StringIO()
+            )
+            routes = json.load(open(output.name))['routes']
+        for name in ('teams-list', 'team-posts-list', 'post-comments-list', 'search', 'auth-login', 'auth-logout'):
+            self.assertIn(name, routes)
+        for name, result in routes.items():
+            self.assertTrue(all(200 <= status < 300 for status in result['status']), (name, result['status']))
+
+
+
+class SerializerBenchmarkCommandTests(APITestCase):
+    def test_fast_lists_match_drf(self):
+        call_command('seed', users=30, teams=2, memberships=10, posts=5, comments=10, events=5, stdout=StringIO())
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_serializers', use_existing_db=True, iterations=2, warmup=1, output=output.name,
+                stdout=StringIO(),
+            )
+            routes = json.load(open(output.name))['routes']
+        self.assertEqual(set(routes), {'teams-list', 'team-posts-list', 'team-events-list', 'post-comments-list'})
+        for name, result in routes.items():
+            self.assertTrue(result['identical'], name)
+            self.assertGreater(result['objects'], 0, name)
+
+
+class ConcurrencyBenchmarkCommandTests(FixtureMixin, APITransactionTestCase):
+    # Committed data, since the clients run in other threads.
+    def test_reports_every_mode(self):
+        call_command('seed', users=30, teams=2, memberships=10, posts=5, comments=10, events=5, stdout=StringIO())
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_concurrency', use_existing_db=True, iterations=8, warmup=1, concurrency=4,
+                output=output.name, stdout=StringIO(),
+            )
+            routes = json.load(open(output.name))['routes']
+        self.assertEqual(
+            set(routes), {'teams-list', 'teams-detail', 'team-posts-list', 'team-events-list', 'post-comments-list'}
+        )
+        for name, modes in routes.items():
+            self.assertEqual(set(modes), {'wsgi', 'asgi', 'asgi-async'})
+            for mode, result in modes.items():
+                self.assertEqual((result['status'], result['requests']), ([200], 8), (name, mode))
+
+
+@override_settings(PERF_SAMPLE_RATE=1.0, PERF_SLOW_QUERY_COUNT=50, PERF_SLOW_REQUEST_MS=10000)
+class PerformanceMiddlewareTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/api/teams/{self.team.pk}/')
+        timing = response['Server-Timing']
+        for name in ('db;', 'permissions;', 'serialize;', 'total;'):
+            self.assertIn(name, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_request_is_logged(self):
+        with self.assertLogs('api.performance', 'INFO') as logs:
+            self.client.get('/api/teams/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/api/teams/')
+        self.assertGreater(record['queries'], 0)
+        self.assertNotIn('duplicated_sql', record)
+
+    @override_settings(PERF_SLOW_QUERY_COUNT=0)
+    def test_slow_request_reports_duplicated_sql(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            self.client.get('/api/teams/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertIn('duplicated_sql', record)
+
+    @override_settings(PERF_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_untouched(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/teams/'))
+
+
+class ConditionalGetTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        self.post = Post.objects.create(team=self.team, author=self.user, title='Welcome', content='Hello')
+        self.post_url = f'/api/teams/{self.team.pk}/posts/{self.post.pk}/'
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_detail_not_modified_skips_serialization(self):
+        response = self.client.get(self.post_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as ctx:
+            not_modified = self.revalidate(self.post_url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertLessEqual(len(ctx), 1)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.post_url)
+        not_modified = self.client.get(self.post_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_comment_changes_post_etag(self):
+        response = self.client.get(self.post_url)
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        self.assertEqual(self.revalidate(self.post_url, response).status_code, 200)
+
+    def test_list_fingerprint(self):
+        url = f'/api/teams/{self.team.pk}/posts/'
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Post.objects.create(team=self.team, author=self.user, title='News', content='...')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_new_member_changes_team_etag(self):
+        url = f'/api/teams/{self.team.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.add_members(self.team, 1)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_event_list(self):
+        url = f'/api/teams/{self.team.pk}/events/'
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_non_member_gets_no_validators(self):
+        etag = self.client.get(self.post_url)['ETag']
+        self.client.force_authenticate(self.make_user())
+        response = self.client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        self.post = Post.objects.create(team=self.team, author=self.user, title='Welcome', content='Hello')
+        self.posts_url = f'/api/teams/{self.team.pk}/posts/'
+
+    def test_hit_after_miss(self):
+        self.assertEqual(self.client.get(self.posts_url)['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.posts_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        # Only the conditional-GET fingerprint is left.
+        self.assertEqual(len(ctx), 1)
+
+    def test_writes_invalidate(self):
+        first = self.client.get(self.posts_url).json()
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        second = self.client.get(self.posts_url)
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(second.json()['results'][0]['comments_count'], first['results'][0]['comments_count'] + 1)
+
+        self.client.get(f'/api/teams/{self.team.pk}/events/')
+        Event.objects.create(team=self.team, trainer=self.user, title='Kick-off', start_time='2030-01-01T09:00Z')
+        events = self.client.get(f'/api/teams/{self.team.pk}/events/')
+        self.assertEqual(events['X-Cache'], 'MISS')
+        self.assertEqual(len(events.json()['results']), 1)
+
+        EventRecurrence.objects.create(event=Event.objects.get(), frequency=EventRecurrence.Frequency.WEEKLY)
+        events = self.client.get(f'/api/teams/{self.team.pk}/events/')
+        self.assertEqual(events['X-Cache'], 'MISS')
+        self.assertEqual(events.json()['results'][0]['recurrence']['frequency'], 'WEEKLY')
+
+    def test_user_changes_invalidate(self):
+        self.client.get(self.posts_url)
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.posts_url)['X-Cache'], 'HIT')
+
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        response = self.client.get(self.posts_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['author']['first_name'], 'Renamed')
+
+    @override_settings(ALLOWED_HOSTS=['one.example.com', 'two.example.com'])
+    def test_entries_vary_by_host(self):
+        Post.objects.bulk_create(
+            Post(team=self.team, author=self.user, title=f'Post {i}', content='...') for i in range(15)
+        )
+        self.client.get(self.posts_url, HTTP_HOST='one.example.com')
+        response = self.client.get(self.posts_url, HTTP_HOST='two.example.com')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.json()['next'].startswith('http://two.example.com/'))
+
+    def test_team_detail_is_cached_per_user(self):
+        url = f'/api/teams/{self.team.pk}/'
+        self.client.get(url)
+        athlete = TeamMembership.objects.filter(team=self.team).exclude(user=self.user).first().user
+        self.client.force_authenticate(athlete)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['my_membership']['user']['id'], athlete.pk)
+
+    def test_non_members_are_not_served_from_cache(self):
+        self.client.get(self.posts_url)
+        self.client.force_authenticate(self.make_user())
+        response = self.client.get(self.posts_url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_stats(self):
+        self.client.get(self.posts_url)
+        self.client.get(self.posts_url)
+        stats = response_cache.get_stats()['team-posts-list']
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+
+class DashboardTests(QueryBudgetMixin, FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        self.other = self.make_team(self.make_user())
+        TeamMembership.objects.create(team=self.other, user=self.user, role=TeamMembership.Role.ATHLETE)
+
+    def make_posts(self, team, count):
+        return [
+            Post.objects.create(team=team, author=team.trainer, title=f"Post {i}", content="Content")
+            for i in range(count)
+        ]
+
+    def make_event(self, team, days):
+        return Event.objects.create(
+            team=team, trainer=team.trainer, title="Event", start_time=timezone.now() + timedelta(days=days)
+        )
+
+    def make_series(self, team, days):
+        event = self.make_event(team, days)
+        EventRecurrence.objects.create(event=event, frequency=EventRecurrence.Frequency.DAILY)
+        return event
+
+    def test_constant_queries(self):
+        self.make_posts(self.team, 2)
+        self.make_event(self.team, 1)
+        self.make_series(self.team, 1)
+
+        def grow():
+            for _ in range(3):
+                team = self.make_team(self.make_user(), members=5)
+                TeamMembership.objects.create(team=team, user=self.user, role=TeamMembership.Role.MEMBER)
+                post = self.make_posts(team, 4)[0]
+                Comment.objects.create(post=post, author=team.trainer, content="Comment")
+                self.make_event(team, 2)
+                self.make_series(team, 3)
+
+        self.assertConstantQueries('/api/me/dashboard/', grow, max_queries=5)
+
+    def test_upcoming_occurrences(self):
+        series = self.make_series(self.other, -10)
+        events = self.client.get('/api/me/dashboard/?days=3').json()['upcoming_events']
+        self.assertEqual([event['id'] for event in events], [series.pk] * 3)
+        self.assertTrue(all(event['original_start'] for event in events))
+
+    def test_teams(self):
+        data = self.client.get('/api/me/dashboard/').json()
+        teams = {team['id']: team for team in data['teams']}
+        self.assertEqual(set(teams), {self.team.pk, self.other.pk})
+        self.assertEqual(teams[self.team.pk]['member_count'], 3)
+        self.assertEqual(teams[self.team.pk]['my_membership']['role'], TeamMembership.Role.TRAINER)
+        self.assertEqual(teams[self.other.pk]['my_membership']['role'], TeamMembership.Role.ATHLETE)
+
+    def test_latest_posts_per_team(self):
+        older = self.make_posts(self.other, 1)
+        busy = self.make_posts(self.team, 5)
+        self.make_posts(self.make_team(self.make_user()), 1)
+
+        data = self.client.get('/api/me/dashboard/?posts=2').json()
+        self.assertEqual([post['id'] for post in data['latest_posts']], [busy[4].pk, busy[3].pk, older[0].pk])
+        self.assertNotIn('comments', data['latest_posts'][0])
+
+    def test_upcoming_events_window(self):
+        self.make_event(self.team, -1)
+        soon = self.make_event(self.other, 3)
+        later = self.make_event(self.team, 30)
+        self.make_event(self.make_team(self.make_user()), 2)
+
+        data = self.client.get('/api/me/dashboard/').json()
+        self.assertEqual([event['id'] for event in data['upcoming_events']], [soon.pk])
+        data = self.client.get('/api/me/dashboard/?days=60').json()
+        self.assertEqual([event['id'] for event in data['upcoming_events']], [soon.pk, later.pk])
+
+    def test_user_without_teams(self):
+        self.client.force_authenticate(self.make_user())
+        data = self.client.get('/api/me/dashboard/').json()
+        self.assertEqual(data, {'teams': [], 'latest_posts': [], 'upcoming_events': []})
+
+
+class CalendarTests(QueryBudgetMixin, FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user)
+        self.other = self.make_team(self.make_user())
+        TeamMembership.objects.create(team=self.other, user=self.user, role=TeamMembership.Role.ATHLETE)
+        self.day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def make_event(self, team, start_hours, end_hours=None, **fields):
+        start = self.day + timedelta(hours=start_hours)
+        end = self.day + timedelta(hours=end_hours) if end_hours is not None else None
+        return Event.objects.create(
+            team=team, trainer=team.trainer, title=fields.pop('title', "Event"), start_time=start, end_time=end,
+            **fields
+        )
+
+    def window(self, days=1):
+        start = self.day.isoformat().replace('+00:00', 'Z')
+        end = (self.day + timedelta(days=days)).isoformat().replace('+00:00', 'Z')
+        return f'from={start}&to={end}'
+
+    def test_window_across_teams(self):
+        before = self.make_event(self.team, -2, -1)
+        first = self.make_event(self.other, 9, 10)
+        second = self.make_event(self.team, 20)
+        self.make_event(self.team, 24)
+        self.make_event(self.make_team(self.make_user()), 12, 13)
+
+        response = self.client.get(f'/api/me/calendar/?{self.window()}')
+        self.assertEqual(response.status_code, 200, response.content)
+        ids = [event['id'] for event in response.json()['events']]
+        self.assertEqual(ids, [first.pk, second.pk])
+        self.assertNotIn(before.pk, ids)
+
+    def test_conflicts(self):
+        training = self.make_event(self.team, 10, 12)
+        match = self.make_event(self.other, 11, 14)
+        meeting = self.make_event(self.team, 12, 13)
+        call = self.make_event(self.team, 15)
+
+        events = {event['id']: event for event in self.client.get(f'/api/me/calendar/?{self.window()}').json()['events']}
+        self.assertEqual(events[training.pk]['conflicts'], [match.pk])
+        self.assertEqual(sorted(events[match.pk]['conflicts']), [training.pk, meeting.pk])
+        self.assertEqual(events[meeting.pk]['conflicts'], [match.pk])
+        self.assertEqual(events[call.pk]['conflicts'], [])
+
+    def test_constant_queries(self):
+        self.make_event(self.team, 1, 2)
+        series = self.make_event(self.team, -48, -47)
+        EventRecurrence.objects.create(event=series, frequency=EventRecurrence.Frequency.DAILY)
+
+        def grow():
+            for hour in range(2, 20):
+                self.make_event(self.other, hour, hour + 2)
+                series = self.make_event(self.other, hour - 72, hour - 71)
+                EventRecurrence.objects.create(event=series, frequency=EventRecurrence.Frequency.DAILY)
+
+        self.assertConstantQueries(f'/api/me/calendar/?{self.window(days=7)}', grow, max_queries=3)
+
+    def test_invalid_windows(self):
+        for query in ['', 'from=2030-01-01', 'from=2030-01-02&to=2030-01-01', 'from=2030-01-01&to=2031-01-01',
+                      'from=tomorrow&to=2030-01-01']:
+            self.assertEqual(self.client.get(f'/api/me/calendar/?{query}').status_code, 400, query)
+
+    def test_ics_export(self):
+        self.make_event(self.team, 10, 12, title="Training, Field; 2", location="North pitch")
+        self.make_event(self.other, 30, description="x" * 200)
+        self.make_event(self.make_team(self.make_user()), 11)
+
+        with override_settings(CALENDAR_EXPORT_CHUNK_SIZE=1):
+            response = self.client.get('/api/me/calendar/ics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:Training\\, Field\\; 2\r\n', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_ics_export_window(self):
+        self.make_event(self.team, 10)
+        self.make_event(self.team, 30)
+        body = b''.join(self.client.get(f'/api/me/calendar/ics/?{self.window()}').streaming_content)
+        self.assertEqual(body.count(b'BEGIN:VEVENT'), 1)
+
+    def test_team_ics_export(self):
+        self.make_event(self.team, 10)
+        self.make_event(self.other, 10)
+        response = self.client.get(f'/api/teams/{self.team.pk}/events/ics/')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'CATEGORIES:{self.team.name}', body)
+
+        stranger = self.make_team(self.make_user())
+        self.assertEqual(self.client.get(f'/api/teams/{stranger.pk}/events/ics/').status_code, 403)
+
+    async def test_ics_export_streams_under_asgi(self):
+        start = self.day + timedelta(hours=10)
+        await Event.objects.abulk_create(
+            Event(team=self.team, trainer=self.user, title="Event", start_time=start) for _ in range(20)
+        )
+        token = await Token.objects.acreate(user=self.user)
+        written = []
+        real_event_block = event_block
+
+        def counting_event_block(*args):
+            written.append(args[0].pk)
+            return real_event_block(*args)
+
+        with mock.patch('api.ical.event_block', counting_event_block):
+            response = await AsyncClient().get(
+                f'/api/teams/{self.team.pk}/events/ics/', headers={'authorization': f'Token {token.key}'}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            # Sent before any event is read, rather than once the whole calendar is built.
+            self.assertEqual(await anext(chunks), b'BEGIN:VCALENDAR\r\n')
+            self.assertEqual(written, [])
+            rest = [chunk async for chunk in chunks]
+        self.assertGreater(len(rest), 20)
+        self.assertEqual(b''.join(rest).count(b'BEGIN:VEVENT'), 20)
+
+
+class RecurrenceTests(QueryBudgetMixin, FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=1)
+        # A Monday at 18:00, well in the future.
+        self.monday = timezone.make_aware(datetime(2030, 1, 7, 18, 0))
+
+    def make_series(self, start=None, duration=timedelta(hours=2), **rule):
+        start = start or self.monday
+        event = Event.objects.create(
+            team=self.team, trainer=self.user, title="Training", start_time=start, end_time=start + duration
+        )
+        EventRecurrence.objects.create(event=event, **{'frequency': EventRecurrence.Frequency.WEEKLY, **rule})
+        return event
+
+    def starts(self, event, start, end, exceptions=()):
+        return [occurrence.start_time for occurrence in expand(event, start, end, exceptions)]
+
+    def test_weekly_on_weekdays(self):
+        event = self.make_series(weekdays='MO,TH')
+        starts = self.starts(event, self.monday, self.monday + timedelta(days=14))
+        self.assertEqual(starts, [self.monday + timedelta(days=days) for days in (0, 3, 7, 10)])
+
+    def test_window_far_from_start_matches_full_expansion(self):
+        event = self.make_series(frequency=EventRecurrence.Frequency.DAILY, interval=3)
+        start, end = self.monday + timedelta(days=1000, hours=5), self.monday + timedelta(days=1010)
+        expected = [
+            moment for moment in self.starts(event, self.monday, end) if moment >= start
+        ]
+        self.assertEqual(self.starts(event, start, end), expected)
+        self.assertEqual(len(expected), 3)
+
+    def test_count_and_until(self):
+        counted = self.make_series(frequency=EventRecurrence.Frequency.DAILY, count=5)
+        self.assertEqual(len(self.starts(counted, self.monday, self.monday + timedelta(days=30))), 5)
+        self.assertEqual(len(self.starts(counted, self.monday + timedelta(days=3), self.monday + timedelta(days=30))), 2)
+
+        bounded = self.make_series(until=self.monday + timedelta(weeks=3))
+        self.assertEqual(len(self.starts(bounded, self.monday, self.monday + timedelta(weeks=10))), 4)
+
+    def test_monthly_skips_short_months(self):
+        start = timezone.make_aware(datetime(2030, 1, 31, 9, 0))
+        event = self.make_series(start=start, frequency=EventRecurrence.Frequency.MONTHLY)
+        starts = self.starts(event, start, start + timedelta(days=100))
+        self.assertEqual([moment.month for moment in starts], [1, 3])
+
+    def test_exceptions(self):
+        event = self.make_series()
+        cancelled = OccurrenceException(event=event, original_start=self.monday + timedelta(weeks=1), cancelled=True)
+        moved = OccurrenceException(
+            event=event, original_start=self.monday + timedelta(weeks=3),
+            start_time=self.monday + timedelta(weeks=1, days=1), title="Moved training"
+        )
+        occurrences = list(expand(event, self.monday, self.monday + timedelta(weeks=2), [cancelled, moved]))
+        self.assertEqual(
+            [(o.start_time, o.title) for o in occurrences],
+            [(self.monday, "Training"), (self.monday + timedelta(weeks=1, days=1), "Moved training")]
+        )
+        self.assertEqual(occurrences[1].end_time - occurrences[1].start_time, timedelta(hours=2))
+        self.assertEqual(occurrences[1].original_start, self.monday + timedelta(weeks=3))
+
+    def test_create_series(self):
+        response = self.client.post(f'/api/teams/{self.team.pk}/events/', {
+            'title': 'Training', 'start_time': self.monday.isoformat(),
+            'end_time': (self.monday + timedelta(hours=2)).isoformat(),
+            'recurrence': {'frequency': 'WEEKLY', 'weekdays': 'th,mo'},
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['recurrence']['weekdays'], 'MO,TH')
+        self.assertEqual(Event.objects.count(), 1)
+
+        invalid = self.client.post(f'/api/teams/{self.team.pk}/events/', {
+            'title': 'Training', 'start_time': self.monday.isoformat(),
+            'recurrence': {'frequency': 'DAILY', 'count': 3, 'until': self.monday.isoformat()},
+        }, format='json')
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_remove_recurrence(self):
+        event = self.make_series()
+        response = self.client.patch(
+            f'/api/teams/{self.team.pk}/events/{event.pk}/', {'recurrence': None}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIsNone(response.json()['recurrence'])
+        self.assertFalse(EventRecurrence.objects.exists())
+
+    def test_occurrences_endpoint(self):
+        event = self.make_series(weekdays='MO,WE')
+        Event.objects.create(
+            team=self.team, trainer=self.user, title="Match", start_time=self.monday + timedelta(days=1)
+        )
+        url = f'/api/teams/{self.team.pk}/events/occurrences/?from=2030-01-07&to=2030-01-14'
+        events = self.client.get(url).json()['events']
+        self.assertEqual([item['title'] for item in events], ["Training", "Match", "Training"])
+        self.assertEqual(events[2]['id'], event.pk)
+        self.assertEqual(events[2]['original_start'], '2030-01-09T18:00:00Z')
+        self.assertIsNone(events[1]['original_start'])
+
+    def test_occurrences_constant_queries(self):
+        self.make_series(weekdays='MO,WE')
+
+        def grow():
+            for _ in range(5):
+                event = self.make_series(frequency=EventRecurrence.Frequency.DAILY)
+                OccurrenceException.objects.create(event=event, original_start=self.monday, cancelled=True)
+
+        self.assertConstantQueries(
+            f'/api/teams/{self.team.pk}/events/occurrences/?from=2030-01-07&to=2030-02-07', grow, max_queries=4
+        )
+
+    def test_exception_endpoint(self):
+        event = self.make_series()
+        url = f'/api/teams/{self.team.pk}/events/{event.pk}/exceptions/'
+        response = self.client.post(url, {'original_start': '2030-01-14T18:00:00Z', 'cancelled': True}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post(url, {'original_start': '2030-01-14T18:00:00Z', 'location': 'Gym'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(OccurrenceException.objects.get().location, 'Gym')
+        self.assertEqual(len(self.client.get(url).json()), 1)
+
+        off_rule = self.client.post(url, {'original_start': '2030-01-15T18:00:00Z', 'cancelled': True}, format='json')
+        self.assertEqual(off_rule.status_code, 400)
+
+        athlete = TeamMembership.objects.filter(team=self.team, role=TeamMembership.Role.ATHLETE).get().user
+        self.client.force_authenticate(athlete)
+        forbidden = self.client.post(url, {'original_start': '2030-01-21T18:00:00Z', 'cancelled': True}, format='json')
+        self.assertEqual(forbidden.status_code, 403)
+
+    def test_ics_export_writes_rules(self):
+        event = self.make_series(weekdays='MO', count=10)
+        OccurrenceException.objects.create(event=event, original_start=self.monday + timedelta(weeks=1), cancelled=True)
+        OccurrenceException.objects.create(
+            event=event, original_start=self.monday + timedelta(weeks=2), location="Away ground"
+        )
+        body = b''.join(self.client.get('/api/me/calendar/ics/').streaming_content).decode()
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO;COUNT=10\r\n', body)
+        self.assertIn('EXDATE;TZID=UTC:20300114T180000\r\n', body)
+        self.assertIn('RECURRENCE-ID;TZID=UTC:20300121T180000\r\n', body)
+        self.assertIn('LOCATION:Away ground\r\n', body)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertEqual(body.count('BEGIN:VTIMEZONE'), 1)
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_ics_export_in_local_time(self):
+        # Across the change to summer time on 2030-03-31, so the UTC hour moves but the local one does not.
+        start = timezone.make_aware(datetime(2030, 3, 25, 18, 0))
+        event = self.make_series(start=start, until=start + timedelta(weeks=3))
+        OccurrenceException.objects.create(event=event, original_start=start + timedelta(weeks=1), cancelled=True)
+        self.assertEqual(
+            [moment.hour for moment in self.starts(event, start, start + timedelta(weeks=4))], [18, 18, 18, 18]
+        )
+
+        body = b''.join(self.client.get('/api/me/calendar/ics/').streaming_content).decode()
+        self.assertIn('DTSTART;TZID=Europe/Berlin:20300325T180000\r\n', body)
+        self.assertIn('DTEND;TZID=Europe/Berlin:20300325T200000\r\n', body)
+        self.assertIn('EXDATE;TZID=Europe/Berlin:20300401T180000\r\n', body)
+        # UNTIL is always UTC (RFC 5545, 3.3.10).
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20300415T160000Z\r\n', body)
+        timezone_block = body.split('BEGIN:VTIMEZONE\r\n', 1)[1].split('END:VTIMEZONE', 1)[0]
+        self.assertIn('TZID:Europe/Berlin\r\n', timezone_block)
+        self.assertIn(
+            'BEGIN:DAYLIGHT\r\nDTSTART:19700329T020000\r\nRRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU\r\n'
+            'TZOFFSETFROM:+0100\r\nTZOFFSETTO:+0200\r\n', timezone_block
+        )
+        self.assertIn('RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU\r\n', timezone_block)
+
+
+class BulkAddMembersTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainer = self.make_user()
+        self.client.force_authenticate(self.trainer)
+        self.team = self.make_team(self.trainer, members=1)
+        self.url = f'/api/teams/{self.team.pk}/bulk-add-members/'
+
+    def test_per_row_results(self):
+        new, other = self.make_user(), self.make_user()
+        existing = TeamMembership.objects.filter(team=self.team, role=TeamMembership.Role.ATHLETE).get().user
+        response = self.client.post(self.url, [
+            {'username': new.username, 'role': 'athlete'},
+            {'username': other.username},
+            {'username': existing.username, 'role': 'member'},
+            {'username': 'nobody'},
+            {'username': new.username},
+            {'username': self.make_user().username, 'role': 'trainer'},
+            {'role': 'member'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual(data['added'], 2)
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['added', 'added', 'already_member', 'not_found', 'duplicate', 'invalid', 'invalid']
+        )
+        self.assertEqual(TeamMembership.objects.get(team=self.team, user=new).role, TeamMembership.Role.ATHLETE)
+        self.assertEqual(TeamMembership.objects.get(team=self.team, user=other).role, TeamMembership.Role.MEMBER)
+
+    def test_csv_upload(self):
+        users = [self.make_user() for _ in range(3)]
+        content = "username,role\n" + "\n".join(f"{user.username},athlete" for user in users) + "\nghost,member\n"
+        upload = SimpleUploadedFile('members.csv', content.encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['added'], 3)
+        self.assertEqual(self.team.memberships.count(), 5)
+
+        missing_header = SimpleUploadedFile('members.csv', b"someone,member\n", content_type='text/csv')
+        self.assertEqual(self.client.post(self.url, {'file': missing_header}, format='multipart').status_code, 400)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def post(count):
+            rows = [{'username': self.make_user().username} for _ in range(count)] + [{'username': 'nobody'}]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, {'members': rows}, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            return len(ctx)
+
+        self.assertEqual(post(3), post(60))
+
+    def test_new_members_get_access_immediately(self):
+        user = self.make_user()
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/').status_code, 403)
+
+        self.client.force_authenticate(self.trainer)
+        self.client.get(f'/api/teams/{self.team.pk}/')
+        self.client.post(self.url, [{'username': user.username}], format='json')
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/').json()['member_count'], 3)
+
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(f'/api/teams/{self.team.pk}/').status_code, 200)
+
+    def test_only_trainer(self):
+        self.client.force_authenticate(self.make_user())
+        self.assertEqual(self.client.post(self.url, [{'username': 'x'}], format='json').status_code, 403)
+
+    @override_settings(BULK_MEMBERS_MAX_ROWS=2)
+    def test_row_limit(self):
+        rows = [{'username': f'u{i}'} for i in range(3)]
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'members': 'nope'}, format='json').status_code, 400)
+
+
+class TransferTrainerTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainer = self.make_user()
+        self.client.force_authenticate(self.trainer)
+        self.team = self.make_team(self.trainer, members=2)
+        self.athlete = self.team.memberships.filter(role=TeamMembership.Role.ATHLETE).order_by('id').first().user
+        self.url = f'/api/teams/{self.team.pk}/transfer-trainer/'
+
+    def transfer(self, username):
+        return self.client.patch(self.url, {'new_trainer_username': username}, format='json')
+
+    def roles(self):
+        return dict(self.team.memberships.values_list('user_id', 'role'))
+
+    def test_transfer(self):
+        response = self.transfer(self.athlete.username)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['trainer']['id'], self.athlete.pk)
+        self.assertEqual(response.json()['my_membership']['role'], TeamMembership.Role.MEMBER)
+
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.trainer, self.athlete)
+        roles = self.roles()
+        self.assertEqual(roles[self.athlete.pk], TeamMembership.Role.TRAINER)
+        self.assertEqual(roles[self.trainer.pk], TeamMembership.Role.MEMBER)
+        self.assertEqual(list(roles.values()).count(TeamMembership.Role.ATHLETE), 1)
+
+        # The cached access of the former trainer is gone with the transfer.
+        self.assertEqual(self.transfer(self.athlete.username).status_code, 403)
+
+    def test_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.transfer(self.athlete.username).status_code, 200)
+        # Leaving out the no-op UPDATE that takes SQLite's write lock (api.helpers.lock_team).
+        writes = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE') and '"trainer_id" = "api_team"."trainer_id"' not in q['sql']
+        ]
+        self.assertEqual(len(writes), 2, writes)
+        self.assertIn('CASE WHEN', writes[0])
+        # Only the trainer and the timestamp are written to the team row.
+        self.assertNotIn('"name"', writes[1])
+        self.assertLessEqual(len(ctx), 9, "\n".join(q['sql'] for q in ctx.captured_queries))
+
+    def test_rejections(self):
+        outsider = self.make_user()
+        self.assertEqual(self.transfer('').status_code, 400)
+        self.assertEqual(self.transfer('nobody').status_code, 404)
+        self.assertEqual(self.transfer(outsider.username).status_code, 400)
+        self.assertEqual(self.transfer(self.trainer.username).status_code, 400)
+        self.client.force_authenticate(self.athlete)
+        self.assertEqual(self.transfer(self.athlete.username).status_code, 403)
+        self.assertEqual(self.client.patch('/api/teams/999999/transfer-trainer/', {
+            'new_trainer_username': self.athlete.username
+        }, format='json').status_code, 404)
+        self.assertEqual(self.team.trainer_id, Team.objects.get(pk=self.team.pk).trainer_id)
+
+
+class TransferTrainerConcurrencyTests(FixtureMixin, APITransactionTestCase):
+    """
+    Transfers and removals racing on one team, each request in its own thread and
+    database connection.
+    """
+    rounds = 4
+    targets = 5
+
+    def request(self, user, method, path, data, results):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            response = getattr(client, method)(path, data, format='json')
+            results.append((method, response.status_code))
+        except Exception as exc:
+            results.append((method, repr(exc)))
+        finally:
+            connection.close()
+
+    def test_parallel_transfers_and_removals(self):
+        trainer = self.make_user()
+        team = self.make_team(trainer)
+        for _ in range(self.rounds):
+            trainer = User.objects.get(pk=Team.objects.values_list('trainer_id', flat=True).get(pk=team.pk))
+            self.add_members(team, self.targets)
+            targets = list(User.objects.filter(
+                team_memberships__team=team, team_memberships__role=TeamMembership.Role.ATHLETE
+            ))
+
+            calls = [
+                (trainer, 'patch', f'/api/teams/{team.pk}/transfer-trainer/', {'new_trainer_username': user.username})
+                for user in targets
+            ] + [
+                (trainer, 'delete', f'/api/teams/{team.pk}/remove-member/', {'username': user.username})
+                for user in targets
+            ]
+            results = []
+            barrier = threading.Barrier(len(calls))
+
+            def run(*args):
+                barrier.wait()
+                self.request(*args, results)
+
+            threads = [threading.Thread(target=run, args=call) for call in calls]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            transfers = [status for method, status in results if method == 'patch']
+            removals = [status for method, status in results if method == 'delete']
+            # Every target may be removed before any transfer reaches it, but never two transfers succeed.
+            self.assertLessEqual(transfers.count(200), 1, results)
+            self.assertTrue(set(transfers) <= {200, 400, 403}, results)
+            self.assertTrue(set(removals) <= {204, 400, 403}, results)
+
+            team.refresh_from_db()
+            trainers = list(team.memberships.filter(role=TeamMembership.Role.TRAINER).values_list('user_id', flat=True))
+            self.assertEqual(trainers, [team.trainer_id], results)
+            if 200 in transfers:
+                self.assertEqual(team.memberships.get(user=trainer).role, TeamMembership.Role.MEMBER)
+            else:
+                self.assertEqual(team.trainer_id, trainer.pk)
+
+
+class SearchTests(QueryBudgetMixin, FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user)
+        self.other = self.make_team(self.make_user())
+        self.now = timezone.now()
+
+    def make_post(self, team, title, content=''):
+        return Post.objects.create(team=team, author=team.trainer, title=title, content=content)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def hits(self, query, **params):
+        return [(hit['type'], hit['id']) for hit in self.search(query, **params)['results']]
+
+    def test_posts_comments_and_events_of_own_teams(self):
+        post = self.make_post(self.team, "Kit announcement", "New jerseys arrive on Friday")
+        comment = Comment.objects.create(post=post, author=self.user, content="Do the jerseys come in XL?")
+        event = Event.objects.create(
+            team=self.team, trainer=self.user, title="Jersey handout", start_time=self.now, location="Clubhouse"
+        )
+        self.make_post(self.other, "Jerseys", "Not visible to outsiders")
+
+        self.assertEqual(
+            sorted(self.hits('jersey')),
+            sorted([('post', post.pk), ('comment', comment.pk), ('event', event.pk)])
+        )
+        self.assertEqual(self.hits('clubhouse'), [('event', event.pk)])
+        hit = self.search('XL')['results'][0]
+        self.assertEqual((hit['team'], hit['post']), (self.team.pk, post.pk))
+        self.assertEqual(
+            sorted(self.hits('jersey', type='comment,event')), [('comment', comment.pk), ('event', event.pk)]
+        )
+
+    def test_ranking_and_prefix(self):
+        body = self.make_post(self.team, "Weekly update", "The tournament schedule is out")
+        title = self.make_post(self.team, "Tournament schedule", "See the attachment")
+        self.make_post(self.team, "Tour de France", "Unrelated")
+        self.assertEqual(self.hits('tournament schedule'), [('post', title.pk), ('post', body.pk)])
+        # The last word matches as a prefix, for search-as-you-type.
+        self.assertEqual(self.hits('tournament sched'), [('post', title.pk), ('post', body.pk)])
+        # Operators and quotes are plain words, not query syntax.
+        self.assertEqual(self.hits('"tournament" OR -schedule*'), [])
+
+    def test_migration_backfills_existing_rows(self):
+        post = self.make_post(self.team, "Kit announcement", "New jerseys")
+        Comment.objects.create(post=post, author=self.user, content="XL please")
+        for description, location in (("Bring kit", "Clubhouse"), (None, "Pitch"), ("", None)):
+            Event.objects.create(
+                team=self.team, trainer=self.user, title="Handout", start_time=self.now,
+                description=description, location=location,
+            )
+        fields = ('kind', 'object_id', 'team_id', 'post_id', 'title', 'body', 'created_at')
+        indexed = sorted(SearchDocument.objects.values_list(*fields))
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.hits('jerseys'), [])
+
+        migration = importlib.import_module('api.migrations.0004_search')
+        with connection.cursor() as cursor:
+            for sql, params in migration.BACKFILL:
+                cursor.execute(sql, params)
+        self.assertEqual(sorted(SearchDocument.objects.values_list(*fields)), indexed)
+        self.assertEqual(self.hits('jerseys'), [('post', post.pk)])
+
+    def test_index_follows_changes(self):
+        post = self.make_post(self.team, "Training moved", "Now on Tuesday")
+        comment = Comment.objects.create(post=post, author=self.user, content="Tuesday works")
+        event = Event.objects.create(team=self.team, trainer=self.user, title="Tuesday training", start_time=self.now)
+
+        response = self.client.patch(
+            f'/api/teams/{self.team.pk}/posts/{post.pk}/', {'content': "Now on Wednesday"}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.hits('wednesday'), [('post', post.pk)])
+        self.assertEqual(sorted(self.hits('tuesday')), [('comment', comment.pk), ('event', event.pk)])
+
+        event.delete()
+        self.assertEqual(self.hits('tuesday'), [('comment', comment.pk)])
+        post.delete()
+        self.assertEqual(self.hits('tuesday'), [])
+        self.assertFalse(SearchDocument.objects.exists())
+
+        # Leaving a team hides its content.
+        self.make_post(self.other, "Away game")
+        self.assertEqual(self.hits('away'), [])
+        membership = TeamMembership.objects.create(team=self.other, user=self.user, role=TeamMembership.Role.ATHLETE)
+        self.assertEqual(len(self.hits('away')), 1)
+        membership.delete()
+        self.assertEqual(self.hits('away'), [])
+
+    def test_cursor_pagination(self):
+        posts = [self.make_post(self.team, f"Match report {i}", "match " * (i % 3 + 1)) for i in range(7)]
+        expected = self.hits('match', page_size=100)
+        self.assertEqual(sorted(id for _, id in expected), sorted(post.pk for post in posts))
+
+        seen, url = [], '/api/search/?q=match&page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            seen += [(hit['type'], hit['id']) for hit in page['results']]
+            url = page['next']
+        self.assertEqual(seen, expected)
+
+        last = self.client.get(self.search('match', page_size=3)['next']).json()
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([(hit['type'], hit['id']) for hit in previous['results']], expected[:3])
+
+        self.assertEqual(self.client.get('/api/search/?q=match&cursor=bogus').status_code, 404)
+        self.assertEqual(self.search('match', count='true')['count'], 7)
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get('/api/search/?q=%20*%22').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/?q=match&type=video').status_code, 400)
+
+    def test_query_budget(self):
+        self.make_post(self.team, "Match", "match")
+
+        def grow():
+            for i in range(10):
+                post = self.make_post(self.team, f"Match {i}", "match day")
+                Comment.objects.create(post=post, author=self.user, content="good match")
+
+        self.assertConstantQueries('/api/search/?q=match', grow, max_queries=1)
+
+    def test_rebuild_command(self):
+        post = self.make_post(self.team, "Season opener")
+        Event.objects.bulk_create([
+            Event(team=self.team, trainer=self.user, title="Season party", start_time=self.now),
+        ])
+        SearchDocument.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        event = Event.objects.get(title="Season party")
+        self.assertEqual(sorted(self.hits('season')), sorted([('post', post.pk), ('event', event.pk)]))
+
+
+class TeamFeedTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user)
+        self.token = Token.objects.create(user=self.user)
+        self.url = f'/api/teams/{self.team.pk}/stream/'
+
+    def published(self, method, path, data=None):
+        with mock.patch('api.realtime.get_broker') as broker, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(path, data, format='json')
+        self.assertLess(response.status_code, 300, getattr(response, 'data', None))
+        return [(channel, message['data']) for (channel, message), _ in broker.return_value.publish.call_args_list]
+
+    def test_viewset_writes_are_published(self):
+        base = f'/api/teams/{self.team.pk}'
+        channel = team_channel(self.team.pk)
+        [(sent_to, data)] = self.published('post', f'{base}/posts/', {'title': "Kit", 'content': "New kit"})
+        post_id = data['id']
+        self.assertEqual((sent_to, data), (channel, {'type': 'post.created', 'team': self.team.pk, 'id': post_id}))
+        self.assertEqual(
+            self.published('patch', f'{base}/posts/{post_id}/', {'title': "Kit!"}),
+            [(channel, {'type': 'post.updated', 'team': self.team.pk, 'id': post_id})]
+        )
+        [(_, data)] = self.published('post', f'{base}/posts/{post_id}/comments/', {'content': "Nice"})
+        self.assertEqual(data, {'type': 'comment.created', 'team': self.team.pk, 'id': data['id'], 'post': post_id})
+        [(_, data)] = self.published('post', f'{base}/events/', {'title': "Match", 'start_time': '2030-01-01T10:00:00Z'})
+        self.assertEqual(data['type'], 'event.created')
+        self.assertEqual(
+            self.published('delete', f'{base}/posts/{post_id}/'),
+            [(channel, {'type': 'post.deleted', 'team': self.team.pk, 'id': post_id})]
+        )
+        # Reads and failed writes publish nothing.
+        self.assertEqual(self.published('get', f'{base}/posts/'), [])
+        with mock.patch('api.realtime.get_broker') as broker, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'{base}/posts/', {}, format='json').status_code, 400)
+        broker.return_value.publish.assert_not_called()
+
+    def test_comments_through_another_teams_url_are_refused(self):
+        other = self.make_team(self.make_user())
+        TeamMembership.objects.create(team=other, user=self.user, role=TeamMembership.Role.ATHLETE)
+        post = Post.objects.create(team=self.team, author=self.user, title="Kit", content="New kit")
+        comment = Comment.objects.create(post=post, author=self.user, content="Nice")
+        url = f'/api/teams/{other.pk}/posts/{post.pk}/comments/'
+        with mock.patch('api.realtime.get_broker') as broker, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url, {'content': "Injected"}, format='json').status_code, 404)
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(
+                self.client.patch(f'{url}{comment.pk}/', {'content': "Edited"}, format='json').status_code, 404
+            )
+            self.assertEqual(self.client.delete(f'{url}{comment.pk}/').status_code, 404)
+        broker.return_value.publish.assert_not_called()
+        self.assertEqual(list(post.comments.values_list('content', flat=True)), ["Nice"])
+
+    def test_only_served_over_asgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+    async def test_access(self):
+        async def status(url, **headers):
+            return (await AsyncClient().get(url, headers=headers)).status_code
+
+        outsider = await Token.objects.acreate(user=await User.objects.acreate(username='outsider'))
+        self.assertEqual(await status(self.url), 401)
+        self.assertEqual(await status(self.url, authorization='Token bogus'), 401)
+        self.assertEqual(await status(self.url, authorization=f'Token {outsider.key}'), 403)
+        self.assertEqual(await status('/api/teams/999999/stream/', authorization=f'Token {self.token.key}'), 404)
+
+    @override_settings(REALTIME_QUEUE_SIZE=2, REALTIME_HEARTBEAT=0.05)
+    async def test_stream(self):
+        broker, channel = get_broker(), team_channel(self.team.pk)
+
+        def message(number):
+            return {'id': number, 'event': 'post.created', 'data': {'type': 'post.created', 'id': number}}
+
+        response = await AsyncClient().get(f'{self.url}?token={self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        self.assertEqual(broker.subscriber_count(channel), 1)
+
+        # Published from a worker thread, as the viewsets do.
+        await asyncio.to_thread(broker.publish, channel, message(1))
+        self.assertEqual(await anext(chunks), b'id: 1\nevent: post.created\ndata: {"type":"post.created","id":1}\n\n')
+        self.assertEqual(await anext(chunks), b': keepalive\n\n')
+
+        # A subscriber that falls behind is told to resync rather than buffered for.
+        for number in range(2, 6):
+            broker.publish(channel, message(number))
+        await asyncio.sleep(0)
+        self.assertIn(b'event: resync', await anext(chunks))
+
+        # The ASGI handler cancels the response when the client disconnects.
+        reader = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(broker.subscriber_count(channel), 0)
+
+    async def test_reconnect_resyncs(self):
+        response = await AsyncClient().get(self.url, headers={
+            'authorization': f'Token {self.token.key}', 'last-event-id': '41',
+        })
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        self.assertIn(b'event: resync', await anext(chunks))
+
+    @override_settings(REALTIME_HEARTBEAT=0.05)
+    async def test_removed_member_is_cut_off(self):
+        athlete = await User.objects.acreate(username='athlete')
+        membership = await TeamMembership.objects.acreate(
+            team=self.team, user=athlete, role=TeamMembership.Role.ATHLETE
+        )
+        token = await Token.objects.acreate(user=athlete)
+        response = await AsyncClient().get(f'{self.url}?token={token.key}')
+        self.assertEqual(response.status_code, 200)
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        self.assertEqual(await anext(chunks), b': keepalive\n\n')
+
+        await membership.adelete()
+        await asyncio.to_thread(get_broker().publish, team_channel(self.team.pk), {
+            'id': 1, 'event': 'post.created', 'data': {'type': 'post.created', 'id': 1}
+        })
+        # The pending message is not sent.
+        self.assertEqual(await anext(chunks), b'event: revoked\ndata: {"type":"revoked"}\n\n')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(chunks)
+        self.assertEqual(get_broker().subscriber_count(team_channel(self.team.pk)), 0)
+
+
+class AsyncReadTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.client.force_authenticate(self.user)
+        self.team = self.make_team(self.user, members=2)
+        self.token = Token.objects.create(user=self.user)
+        post = Post.objects.create(team=self.team, author=self.user, title='Kit', content='New kit')
+        Comment.objects.create(post=post, author=self.user, content='Nice')
+        Event.objects.create(team=self.team, trainer=self.user, title='Match', start_time=timezone.now())
+        base = f'/api/teams/{self.team.pk}'
+        self.urls = [
+            '/api/teams/', f'{base}/', f'{base}/posts/', f'{base}/events/?page_size=1&count=1',
+            f'{base}/posts/{post.pk}/comments/', f'{base}/posts/?fields=id,author.id&omit=id',
+        ]
+
+    async def get(self, url, **headers):
+        return await AsyncClient().get(url, headers={'authorization': f'Token {self.token.key}', **headers})
+
+    async def drf_get(self, url, **headers):
+        return await sync_to_async(self.client.get)(url, headers=headers)
+
+    async def test_same_responses_as_drf_views(self):
+        for url in self.urls:
+            with self.subTest(url=url), mock.patch('api.async_views.sync_to_async', side_effect=AssertionError):
+                response = await self.get(url)
+                expected = await self.drf_get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), expected.json())
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+                self.assertEqual(response['Content-Type'], 'application/json')
+                if response.has_header('ETag'):
+                    self.assertEqual((await self.get(url, if_none_match=response['ETag'])).status_code, 304)
+
+    async def test_pagination(self):
+        await Event.objects.acreate(team=self.team, trainer=self.user, title='Cup', start_time=timezone.now())
+        url = f'/api/teams/{self.team.pk}/events/?page_size=1'
+        first = json.loads((await self.get(url)).content)
+        second = json.loads((await self.get(first['next'])).content)
+        self.assertEqual([event['title'] for event in first['results'] + second['results']], ['Match', 'Cup'])
+        self.assertIsNone(second['next'])
+
+    async def test_everything_else_falls_back_to_drf_views(self):
+        detail = f'/api/teams/{self.team.pk}/'
+        outsider = await Token.objects.acreate(user=await User.objects.acreate(username='outsider'))
+        response = await self.get(f'{detail}?expand=memberships')
+        self.assertEqual(len(json.loads(response.content)['memberships']), 3)
+        # SessionAuthentication comes first, so DRF answers 403 rather than 401.
+        self.assertEqual((await AsyncClient().get(detail)).status_code, 403)
+        self.assertEqual((await self.get(detail, authorization=f'Token {outsider.key}')).status_code, 403)
+        self.assertEqual((await self.get('/api/teams/999999/')).status_code, 404)
+        self.assertEqual((await self.get(f'{detail}posts/?cursor=bogus')).status_code, 404)
+        self.assertIn(b'<html', (await self.get(detail, accept='text/html')).content)
+        response = await AsyncClient().post(
+            f'{detail}posts/', {'title': 'Kit', 'content': '...'}, content_type='application/json',
+            headers={'authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    async def test_queries_are_measured(self):
+        response = await self.get(f'/api/teams/{self.team.pk}/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+
+class TeamExportTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainer = self.make_user()
+        self.client.force_authenticate(self.trainer)
+        self.team = self.make_team(self.trainer, members=2)
+        self.url = f'/api/teams/{self.team.pk}/export/'
+        self.post = Post.objects.create(team=self.team, author=self.trainer, title='Kit', content='Bring boots')
+        Comment.objects.create(post=self.post, author=self.trainer, content='Noted')
+        series = Event.objects.create(
+            team=self.team, trainer=self.trainer, title='Training', start_time=timezone.now()
+        )
+        EventRecurrence.objects.create(event=series, frequency=EventRecurrence.Frequency.WEEKLY)
+        OccurrenceException.objects.create(
+            event=series, original_start=series.start_time + timedelta(weeks=1), cancelled=True
+        )
+        # Another team's rows stay out of the export.
+        other = self.make_team(self.make_user())
+        Post.objects.create(team=other, author=other.trainer, title='Elsewhere', content='...')
+
+    def read(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        with override_settings(TEAM_EXPORT_CHUNK_SIZE=1):
+            response, body = self.read(self.url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn(f'filename="team-{self.team.pk}.ndjson"', response['Content-Disposition'])
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['team', 'membership', 'membership', 'membership', 'post', 'comment', 'event', 'occurrence_exception']
+        )
+        self.assertEqual(records[0]['name'], self.team.name)
+        self.assertEqual(records[4]['author']['username'], self.trainer.username)
+        self.assertEqual(records[6]['recurrence']['frequency'], 'WEEKLY')
+        self.assertTrue(records[7]['cancelled'])
+
+    def test_same_payloads_as_the_api(self):
+        _, body = self.read(self.url)
+        comment = next(json.loads(line) for line in body.splitlines() if b'"type":"comment"' in line)
+        del comment['type']
+        comments = self.client.get(f'/api/teams/{self.team.pk}/posts/{self.post.pk}/comments/').json()
+        self.assertEqual(comment, comments['results'][0])
+
+    def test_json_document(self):
+        _, body = self.read(f'{self.url}?as=json')
+        document = json.loads(body)
+        self.assertEqual(
+            list(document), ['team', 'memberships', 'posts', 'comments', 'events', 'occurrence_exceptions']
+        )
+        self.assertEqual(len(document['memberships']), 3)
+        self.assertEqual(document['posts'][0]['title'], 'Kit')
+
+        Comment.objects.all().delete()
+        Post.objects.all().delete()
+        Event.objects.all().delete()
+        document = json.loads(self.read(f'{self.url}?as=json')[1])
+        self.assertEqual(document['posts'], [])
+        self.assertEqual(document['occurrence_exceptions'], [])
+
+    async def test_streams_under_asgi(self):
+        await Event.objects.abulk_create(
+            Event(team=self.team, trainer=self.trainer, title='Match ' * 20, start_time=timezone.now())
+            for _ in range(1000)
+        )
+        token = await Token.objects.acreate(user=self.trainer)
+        pulled = []
+        real_iter_records = iter_records
+
+        def counting_iter_records(*args):
+            for record in real_iter_records(*args):
+                pulled.append(record[0])
+                yield record
+
+        with mock.patch('api.export.iter_records', counting_iter_records):
+            response = await AsyncClient().get(self.url, headers={'authorization': f'Token {token.key}'})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            # The first piece goes out while most rows are still unread.
+            self.assertLess(len(pulled), 1000)
+            rest = [chunk async for chunk in chunks]
+        self.assertGreater(len(rest), 1)
+        body = first + b''.join(rest)
+        self.assertEqual(body.count(b'"type":"event"'), 1001)
+
+    def test_gzip(self):
+        response, body = self.read(f'{self.url}?as=json&gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn(f'filename="team-{self.team.pk}.json.gz"', response['Content-Disposition'])
+        self.assertEqual(json.loads(gzip.decompress(body))['team']['id'], self.team.pk)
+
+    def test_constant_queries(self):
+        def grow():
+            for i in range(20):
+                post = Post.objects.create(team=self.team, author=self.trainer, title=f'Post {i}', content='...')
+                Comment.objects.create(post=post, author=self.trainer, content='...')
+            self.add_members(self.team, 10)
+
+        def count():
+            with CaptureQueriesContext(connection) as ctx:
+                self.read(self.url)
+            return len(ctx)
+
+        # Warm up the membership cache, as assertConstantQueries does.
+        count()
+        before = count()
+        grow()
+        self.assertEqual(count(), before)
+
+    def test_only_trainer(self):
+        member = TeamMembership.objects.filter(team=self.team, role=TeamMembership.Role.ATHLETE).first().user
+        self.client.force_authenticate(member)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(self.trainer)
+        self.assertEqual(self.client.get('/api/teams/999999/export/').status_code, 404)
+        self.assertEqual(self.client.get(f'{self.url}?as=xml').status_code, 400)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/export.ndjson.gz'
+            call_command('export_team', self.team.pk, gzip=True, output=path, stdout=StringIO())
+            with gzip.open(path) as file:
+                _, body = self.read(self.url)
+                self.assertEqual(file.read(), body)
+
+
+class TeamImportTests(FixtureMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.trainer = self.make_user()
+        self.client.force_authenticate(self.trainer)
+        self.team = self.make_team(self.trainer)
+        self.url = f'/api/teams/{self.team.pk}/import/'
+
+    def ndjson(self, *records):
+        return '\n'.join(json.dumps(record) for record in records).encode()
+
+    def post_import(self, body, query='', content_type='application/x-ndjson'):
+        return self.client.post(f'{self.url}{query}', body, content_type=content_type)
+
+    def test_ndjson(self):
+        athlete, outsider = self.make_user(), self.make_user()
+        body = self.ndjson(
+            {
+                'type': 'membership', 'user': athlete.username, 'role': 'athlete',
+                'joined_at': '2020-09-01T10:00:00Z',
+            },
+            {
+                'type': 'post', 'author': {'username': athlete.username}, 'title': 'Season opener',
+                'content': 'See you there', 'created_at': '2020-09-02T10:00:00Z',
+                'comments': [{'author': self.trainer.username, 'content': 'Great'}],
+            },
+            {'type': 'event', 'title': 'Final', 'start_time': '2021-05-01T15:00:00Z', 'location': 'Stadium'},
+            {'type': 'post', 'author': outsider.username, 'title': 'Spam', 'content': '...'},
+            {'type': 'event', 'title': 'No start'},
+            {'type': 'trophy'},
+        ) + b'\nnot json\n'
+        response = self.post_import(body)
+        self.assertEqual(response.status_code, 201, response.content)
+        report = response.json()
+        self.assertEqual(report['committed'], 7)
+        self.assertEqual(report['created'], {'memberships': 1, 'posts': 1, 'comments': 1, 'events': 1})
+        self.assertEqual(report['invalid'], 4)
+        self.assertEqual([error['record'] for error in report['errors']], [4, 5, 6, 7])
+        self.assertEqual(report['errors'][0]['errors'], {'author': ["User is not a member of this team."]})
+
+        post = Post.objects.get(team=self.team)
+        created_at = datetime(2020, 9, 2, 10, tzinfo=dt_timezone.utc)
+        self.assertEqual((post.author, post.created_at, post.updated_at), (athlete, created_at, created_at))
+        self.assertEqual(post.comments.get().author, self.trainer)
+        self.assertEqual(TeamMembership.objects.get(team=self.team, user=athlete).joined_at.year, 2020)
+        self.assertEqual(Event.objects.get(team=self.team).trainer, self.trainer)
+        self.assertEqual(SearchDocument.objects.filter(team=self.team).count(), 3)
+
+        # Members are skipped when the same records are imported again.
+        report = self.post_import(self.ndjson({'type': 'membership', 'user': athlete.username})).json()
+        self.assertEqual((report['skipped'], report['created']['memberships']), (1, 0))
+
+        response = self.post_import(b'')
+        self.assertEqual((response.status_code, response.json()['committed']), (200, 0))
+
+    def test_csv(self):
+        post = Post.objects.create(team=self.team, author=self.trainer, title='Kit', content='...')
+        other = Post.objects.create(team=self.make_team(self.make_user()), author=self.trainer, title='x', content='x')
+        username = self.trainer.username
+        content = f"post,author,content\n{post.pk},{username},\"First, second\"\n{other.pk},{username},Elsewhere\n"
+        upload = SimpleUploadedFile('comments.csv', content.encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post(f'{self.url}?type=comment', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            response.json()['errors'], [{'record': 2, 'errors': {'post': ["No post of this team has this id."]}}]
+        )
+        self.assertEqual(post.comments.get().content, 'First, second')
+
+        body = f"type,user,role\nmembership,{self.make_user().username},member\n".encode()
+        self.assertEqual(self.post_import(body, content_type='text/csv').json()['created']['memberships'], 1)
+
+    def test_queries_per_chunk_do_not_grow_with_records(self):
+        def import_posts(count):
+            users = [self.make_user() for _ in range(count)]
+            body = self.ndjson(
+                *({'type': 'membership', 'user': user.username} for user in users),
+                *({'type': 'post', 'author': user.username, 'title': 'Hi', 'content': '...',
+                   'created_at': '2020-01-01T00:00:00Z', 'comments': [{'author': user.username, 'content': '!'}]}
+                  for user in users),
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.post_import(body)
+            self.assertEqual(response.status_code, 201, response.content)
+            return len(ctx)
+
+        self.assertEqual(import_posts(3), import_posts(40))
+
+    @override_settings(IMPORT_CHUNK_SIZE=2)
+    def test_resume_after_failure(self):
+        records = [{'type': 'event', 'title': f'Event {i}', 'start_time': '2021-05-01T15:00:00Z'} for i in range(5)]
+        real_bulk_create = Event.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(objects, *args, **kwargs):
+            calls.append(len(objects))
+            if len(calls) == 2:
+                raise DatabaseError("disk full")
+            return real_bulk_create(objects, *args, **kwargs)
+
+        with mock.patch.object(Event.objects, 'bulk_create', failing_bulk_create):
+            response = self.post_import(self.ndjson(*records))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['committed'], 2)
+        self.assertEqual(Event.objects.count(), 2)
+
+        response = self.post_import(self.ndjson(*records), query='?start=2')
+        self.assertEqual(response.json()['committed'], 5)
+        self.assertEqual(
+            list(Event.objects.order_by('id').values_list('title', flat=True)), [f'Event {i}' for i in range(5)]
+        )
+
+    def test_failed_chunk_leaves_report_and_user_cache_alone(self):
+        first, second = self.make_user(), self.make_user()
+        records = [
+            {'type': 'membership', 'user': first.username}, {'type': 'trophy'},
+            {'type': 'membership', 'user': second.username}, {'type': 'trophy'},
+        ]
+        real_bulk_create = TeamMembership.objects.bulk_create
+
+        def failing_bulk_create(objects, *args, **kwargs):
+            if any(membership.user_id == second.pk for membership in objects):
+                raise DatabaseError("disk full")
+            return real_bulk_create(objects, *args, **kwargs)
+
+        importer = TeamImport(self.team, chunk_size=2)
+        with mock.patch.object(TeamMembership.objects, 'bulk_create', failing_bulk_create):
+            with self.assertRaises(ImportStopped) as stopped:
+                importer.run(iter(records))
+        report = stopped.exception.report
+        self.assertEqual((report['committed'], report['invalid']), (2, 1))
+        self.assertEqual(report['created']['memberships'], 1)
+        self.assertEqual([error['record'] for error in report['errors']], [2])
+        self.assertEqual(importer.users.get(first.username), (first.pk, True))
+        self.assertIsNone(importer.users.get(second.username))
+
+        # The rolled-back membership is created when the same importer resumes.
+        report = importer.run(iter(records), start=2)
+        self.assertEqual((report['created']['memberships'], report['skipped'], report['invalid']), (2, 0, 2))
+        self.assertTrue(TeamMembership.objects.filter(team=self.team, user=second).exists())
+
+    def test_command_resumes_from_state_file(self):
+        records = [{'type': 'event', 'title': f'Event {i}', 'start_time': '2021-05-01T15:00:00Z'} for i in range(5)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/events.ndjson.gz'
+            with gzip.open(path, 'wb') as file:
+                file.write(self.ndjson(*records))
+            with mock.patch('api.importer.TeamImport.import_chunk', side_effect=[None, DatabaseError("disk full")]):
+                with self.assertRaises(CommandError):
+                    call_command('import_team', self.team.pk, path, chunk_size=2, stdout=StringIO())
+            with open(f'{path}.import-state') as file:
+                self.assertEqual(json.load(file), {'team': self.team.pk, 'committed': 2})
+
+            call_command('import_team', self.team.pk, path, chunk_size=2, resume=True, stdout=StringIO())
+            self.assertEqual(
+                list(Event.objects.values_list('title', flat=True).order_by('id')), ['Event 2', 'Event 3', 'Event 4']
+            )
+            self.assertFalse(os.path.exists(f'{path}.import-state'))
+
+    def test_only_trainer(self):
+        member = self.make_user()
+        TeamMembership.objects.create(team=self.team, user=member, role=TeamMembership.Role.ATHLETE)
+        self.client.force_authenticate(member)
+        self.assertEqual(self.post_import(b'').status_code, 403)
+        self.client.force_authenticate(self.trainer)
+        self.assertEqual(self.post_import(b'', query='?as=xml').status_code, 400)
+        response = self.client.post('/api/teams/999999/import/', b'', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 404)
@@ -3,8 +3,9 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
 
 from .views import (
-    UserViewSet, TeamViewSet, PostViewSet, CommentViewSet, EventViewSet,
-    UserRegistrationView, UserLoginView, UserLogoutView # Add these
+    UserViewSet, TeamViewSet, TeamMembershipViewSet, PostViewSet, CommentViewSet, EventViewSet,
+    UserRegistrationView, UserLoginView, UserLogoutView, # Add these
+    DashboardView, CalendarView, CalendarExportView, SearchView, TeamFeedStreamView
 )
 
 router = DefaultRouter()
@@ -14,6 +15,7 @@ router.register(r'teams', TeamViewSet, basename='teams')
 # Nested router for posts under teams
 teams_router = routers.NestedSimpleRouter(router, r'teams', lookup='team')
 teams_router.register(r'posts', PostViewSet, basename='team-posts')
+teams_router.register(r'members', TeamMembershipViewSet, basename='team-members')
 teams_router.register(r'events', EventViewSet, basename='team-events')
 
 # Nested router for comments under posts
@@ -24,6 +26,11 @@ urlpatterns = [
     path('auth/register/', UserRegistrationView.as_view(), name='register'),
     path('auth/login/', UserLoginView.as_view(), name='login'),
     path('auth/logout/', UserLogoutView.as_view(), name='logout'),
+    path('me/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('me/calendar/', CalendarView.as_view(), name='calendar'),
+    path('me/calendar/ics/', CalendarExportView.as_view(), name='calendar-ics'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('teams/<int:team_pk>/stream/', TeamFeedStreamView.as_view(), name='team-stream'),
     path('', include(router.urls)),
     path('', include(teams_router.urls)),
     path('', include(posts_router.urls)),
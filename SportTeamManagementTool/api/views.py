@@ -1,46 +1,94 @@
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import logout # For logging out
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Prefetch, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework import status
+from django.utils import timezone
+from django.views import View
+from rest_framework import viewsets, status, exceptions
 from rest_framework.authtoken.models import Token # Import Token model
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated # AllowAny for auth views
-from django.contrib.auth import logout # For logging out
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from .models import User, Team, TeamMembership, Post, Comment, Event
+from .models import User, Team, TeamMembership, Post, Comment, Event, OccurrenceException, SearchDocument
 from .serializers import (
-    UserSerializer, TeamSerializer, TeamMembershipSerializer,
-    PostSerializer, CommentSerializer, EventSerializer, UserRegistrationSerializer, UserLoginSerializer
+    UserSerializer, TeamSerializer, TeamSummarySerializer, TeamMembershipSerializer,
+    PostSerializer, PostListSerializer, CommentSerializer, EventSerializer, EventOccurrenceSerializer,
+    CalendarEventSerializer, OccurrenceExceptionSerializer, SearchResultSerializer,
+    UserRegistrationSerializer, UserLoginSerializer,
+    field_selection, requested_expansions, members_preview_size
+)
+from .pagination import (
+    MembershipCursorPagination, PostCursorPagination, CommentCursorPagination, EventCursorPagination,
+    SearchCursorPagination, TeamDirectoryPagination
 )
 from .permissions import (
     IsTrainerOfTeam, IsTeamMember, IsTrainerOrTeamMemberForPostComments,
     IsPostAuthorOrTeamMember, IsCommentAuthorOrTrainer
 )
-
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+from .helpers import (
+    get_team_access_or_404, lock_team, get_bounded_param, parse_window, events_between, export_window, find_conflicts,
+    read_member_rows, read_import_input, select_serialized, annotate_comments_count
+)
+from .membership import (
+    aget_team_access, arecheck_team_access, get_team_access, invalidate_membership, invalidate_team
+)
+from .instrumentation import InstrumentedViewMixin
+from .conditional import ConditionalGetMixin
+from .response_cache import ResponseCacheMixin, response_cache
+from .ical import calendar_response
+from .export import FORMATS as EXPORT_FORMATS, export_response
+from .importer import RECORD_TYPES, ImportStopped, TeamImport, read_records
+from .search import parse_terms, search
+from .realtime import TeamFeedMixin, event_stream, team_channel
+from .authentication import QueryTokenAuthentication
+from .async_views import AsyncReadMixin
+from .fast_serializers import FastListMixin
+
+class UserViewSet(InstrumentedViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
-    queryset = User.objects.all()
+    queryset = User.objects.order_by('id')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(
+    InstrumentedViewMixin, ConditionalGetMixin, ResponseCacheMixin, FastListMixin, AsyncReadMixin, viewsets.ModelViewSet
+):
     """
     API endpoint that allows teams to be created, viewed, updated or deleted.
+    The list holds the caller's own teams, optionally only those where they have
+    ?role=trainer|athlete|member; /teams/discover/ lists the others.
     """
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
+    validator_fields = ('id', 'updated_at', 'trainer_id')
+    validator_relations = {'memberships': 'joined_at'}
+    cached_actions = ('retrieve',)
+    # my_membership differs per caller.
+    cache_per_user = True
+    async_params = frozenset({'page', 'role', 'fields', 'omit', 'expand', 'preview'})
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [IsAuthenticated, IsTeamMember]
         elif self.action == 'create':
             permission_classes = [IsAuthenticated]
-        elif self.action in ['update', 'partial_update', 'destroy', 'remove_member', 'transfer_trainer']:
+        elif self.action in [
+            'update', 'partial_update', 'destroy', 'remove_member', 'transfer_trainer', 'bulk_add_members',
+            'import_records'
+        ]:
             permission_classes = [IsAuthenticated, IsTrainerOfTeam]
         elif self.action == 'add_member':
             permission_classes = [IsAuthenticated]
@@ -49,17 +97,84 @@ class TeamViewSet(viewsets.ModelViewSet):
 
         return [permission() for permission in permission_classes]
 
-    def get_queryset(self):
+    def get_base_queryset(self):
+        if self.action == 'list':
+            # Driven by the caller's memberships (the unique (user, team) index), so the
+            # list costs the same however many teams other users have.
+            return Team.objects.filter(pk__in=self.get_own_memberships().values('team_id'))
         return Team.objects.all()
 
+    def get_own_memberships(self):
+        memberships = TeamMembership.objects.filter(user=self.request.user)
+        role = self.request.query_params.get('role')
+        if role is not None:
+            if role not in TeamMembership.Role.values:
+                raise exceptions.ValidationError(
+                    {'role': f"Unknown role: {role}. Use {', '.join(TeamMembership.Role.values)}."}
+                )
+            memberships = memberships.filter(role=role)
+        return memberships
+
+    def get_cache_team_id(self):
+        return self.kwargs.get('pk')
+
+    async def aprepare(self):
+        if 'pk' in self.kwargs:
+            await aget_team_access(self.request, self.kwargs['pk'])
+
+    def get_queryset(self):
+        if self.action == 'discover':
+            return Team.objects.exclude(
+                pk__in=TeamMembership.objects.filter(user=self.request.user).values('team_id')
+            ).only('id', 'name', 'description', 'created_at').order_by('name')
+
+        # Only the caller's own membership is loaded by default; the full member list is
+        # opt-in (?expand=memberships) or capped (?preview=<n>) so big teams stay cheap.
+        # Fields left out with ?fields=/?omit= are not loaded.
+        selection = field_selection(self.request)
+        queryset = select_serialized(self.get_base_queryset(), selection, 'trainer').order_by('id')
+        if selection.wants('member_count'):
+            queryset = queryset.annotate(member_count=Count('memberships'))
+        if selection.wants('my_membership'):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'memberships',
+                    queryset=TeamMembership.objects.filter(user=self.request.user).select_related('user'),
+                    to_attr='own_memberships'
+                )
+            )
+
+        if 'memberships' in requested_expansions(self.request) and selection.wants('memberships'):
+            memberships = select_serialized(TeamMembership.objects.all(), selection.nested('memberships'), 'user')
+            queryset = queryset.prefetch_related(Prefetch('memberships', queryset=memberships))
+
+        preview_size = members_preview_size(self.request)
+        if preview_size and selection.wants('members_preview'):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'memberships',
+                    queryset=TeamMembership.objects.select_related('user').order_by('joined_at', 'id')[:preview_size],
+                    to_attr='members_preview_list'
+                )
+            )
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save()
 
+    @action(detail=False, methods=['get'], pagination_class=TeamDirectoryPagination)
+    def discover(self, request):
+        """
+        Teams the caller is not a member of, by name, with their summary fields only.
+        """
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(TeamSummarySerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'], url_path='add-member')
     def add_member(self, request, pk=None):
         team = self.get_object()
 
-        is_requesting_user_trainer = (team.trainer == request.user)
+        is_requesting_user_trainer = (team.trainer_id == request.user.id)
 
         target_username = request.data.get('username')
         target_role = request.data.get('role', TeamMembership.Role.MEMBER)
@@ -92,140 +207,395 @@ class TeamViewSet(viewsets.ModelViewSet):
         serializer = TeamMembershipSerializer(membership)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['post'], url_path='bulk-add-members')
+    def bulk_add_members(self, request, pk=None):
+        """
+        Add many users at once, from a JSON list of {username, role} or a CSV upload, and
+        report the outcome of every row. Users are resolved and existing memberships found
+        with one query each, and the new rows inserted with one bulk_create, all in one
+        transaction.
+        """
+        team = self.get_object()
+        rows = read_member_rows(request)
+        roles = {role for role, _ in TeamMembership.Role.choices} - {TeamMembership.Role.TRAINER}
+
+        results, seen = [], set()
+        for index, row in enumerate(rows, start=1):
+            username = str(row.get('username') or '').strip()
+            role = str(row.get('role') or TeamMembership.Role.MEMBER).strip().lower()
+            result = {'row': index, 'username': username, 'role': role}
+            if not username:
+                result.update(status='invalid', detail="Username is required.")
+            elif role not in roles:
+                result.update(status='invalid', detail=f"Invalid role. Must be one of: {', '.join(sorted(roles))}.")
+            elif username in seen:
+                result.update(status='duplicate', detail="Username already appears in an earlier row.")
+            seen.add(username)
+            results.append(result)
+
+        pending = [result for result in results if 'status' not in result]
+        with transaction.atomic():
+            user_ids = dict(User.objects.filter(
+                username__in=[result['username'] for result in pending]
+            ).values_list('username', 'id'))
+            existing = set(TeamMembership.objects.filter(
+                team=team, user_id__in=user_ids.values()
+            ).values_list('user_id', flat=True))
+
+            new_memberships = []
+            for result in pending:
+                user_id = user_ids.get(result['username'])
+                if user_id is None:
+                    result.update(status='not_found', detail="User not found.")
+                elif user_id in existing:
+                    result.update(status='already_member', detail="User is already a member of this team.")
+                else:
+                    result['status'] = 'added'
+                    new_memberships.append(TeamMembership(team=team, user_id=user_id, role=result['role']))
+            # A membership added concurrently is skipped by the unique (user, team) constraint.
+            TeamMembership.objects.bulk_create(new_memberships, ignore_conflicts=True)
+
+        # bulk_create sends no post_save, so invalidate what api/signals.py would have.
+        for membership in new_memberships:
+            invalidate_membership(membership.user_id, team.pk)
+        if new_memberships:
+            response_cache.bump(team.pk)
+
+        return Response(
+            {'added': len(new_memberships), 'results': results},
+            status=status.HTTP_201_CREATED if new_memberships else status.HTTP_200_OK
+        )
+
     @action(detail=True, methods=['delete'], url_path='remove-member')
     def remove_member(self, request, pk=None):
-        team = self.get_object()
         username = request.data.get('username')
 
         if not username:
             return Response({"detail": "Username is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user_to_remove = User.objects.get(username=username)
-        except User.DoesNotExist:
-            return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            # Locked like transfer_trainer, so a member cannot be removed while becoming the trainer.
+            team = lock_team(pk)
+            self.check_object_permissions(request, team)
 
-        if user_to_remove == team.trainer:
-            return Response({"detail": "Cannot remove the trainer directly. Transfer team ownership first."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                user_to_remove = User.objects.get(username=username)
+            except User.DoesNotExist:
+                return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        membership = get_object_or_404(TeamMembership, team=team, user=user_to_remove)
-        membership.delete()
+            if user_to_remove.pk == team.trainer_id:
+                return Response({"detail": "Cannot remove the trainer directly. Transfer team ownership first."}, status=status.HTTP_400_BAD_REQUEST)
+
+            membership = get_object_or_404(TeamMembership, team=team, user=user_to_remove)
+            membership.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['patch'], url_path='transfer-trainer')
     def transfer_trainer(self, request, pk=None):
-        team = self.get_object()
         new_trainer_username = request.data.get('new_trainer_username')
-
         if not new_trainer_username:
             return Response({"detail": "New trainer username is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            new_trainer = User.objects.get(username=new_trainer_username)
-        except User.DoesNotExist:
-            return Response({"detail": "New trainer user not found."}, status=status.HTTP_404_NOT_FOUND)
-
-        if not TeamMembership.objects.filter(team=team, user=new_trainer).exists():
-            return Response({"detail": "The new trainer must already be a member of the team."}, status=status.HTTP_400_BAD_REQUEST)
-
-        old_trainer_membership = TeamMembership.objects.get(team=team, user=team.trainer)
-        old_trainer_membership.role = TeamMembership.Role.MEMBER
-        old_trainer_membership.save()
-
-        new_trainer_membership = TeamMembership.objects.get(team=team, user=new_trainer)
-        new_trainer_membership.role = TeamMembership.Role.TRAINER
-        new_trainer_membership.save()
-
-        team.trainer = new_trainer
-        team.save()
-
-        serializer = TeamSerializer(team, context={'request': request})
+        with transaction.atomic():
+            # Concurrent transfers and member removals queue up behind this lock, and the
+            # trainer check runs against the locked row rather than a stale read.
+            team = lock_team(pk)
+            self.check_object_permissions(request, team)
+
+            new_trainer_id = TeamMembership.objects.filter(
+                team=team, user__username=new_trainer_username
+            ).values_list('user_id', flat=True).first()
+            if new_trainer_id is None:
+                if not User.objects.filter(username=new_trainer_username).exists():
+                    return Response({"detail": "New trainer user not found."}, status=status.HTTP_404_NOT_FOUND)
+                return Response({"detail": "The new trainer must already be a member of the team."}, status=status.HTTP_400_BAD_REQUEST)
+            if new_trainer_id == team.trainer_id:
+                return Response({"detail": "This user is already the trainer of the team."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Both role changes in one UPDATE ... CASE.
+            TeamMembership.objects.filter(team=team, user_id__in=[team.trainer_id, new_trainer_id]).update(
+                role=Case(
+                    When(user_id=new_trainer_id, then=Value(TeamMembership.Role.TRAINER)),
+                    default=Value(TeamMembership.Role.MEMBER),
+                )
+            )
+            team.trainer_id = new_trainer_id
+            team.save(update_fields=['trainer', 'updated_at'])
+
+        # The role UPDATE sends no signals, and Team's post_save ran before the commit, when
+        # other requests could still cache the old roles; invalidate again now it is visible.
+        invalidate_team(team.pk)
+        response_cache.bump(team.pk)
+
+        serializer = TeamSerializer(self.get_queryset().get(pk=team.pk), context={'request': request})
         return Response(serializer.data)
 
-class PostViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """
+        The team's full history (memberships, posts, comments, events and occurrence
+        exceptions) as a streamed NDJSON file, or a JSON document with ?as=json, gzipped
+        with ?gzip=1. Memory use does not grow with the team; see api.export.
+        """
+        if not get_team_access_or_404(request, pk).is_trainer:
+            raise exceptions.PermissionDenied("Only the trainer of this team can export it.")
+        export_format = request.query_params.get('as', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise exceptions.ValidationError(
+                {'as': f"Unknown format: {export_format}. Use {', '.join(EXPORT_FORMATS)}."}
+            )
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        return export_response(
+            request, pk, export_format, compress, getattr(settings, 'TEAM_EXPORT_CHUNK_SIZE', 2000)
+        )
+
+    @action(detail=True, methods=['post'], url_path='import')
+    def import_records(self, request, pk=None):
+        """
+        Load memberships, posts, comments and events from an NDJSON or CSV request body
+        (or `file` upload), parsed as it is read and written in chunks; see api.importer.
+        The report gives the number of records committed, from which ?start= resumes an
+        import that stopped.
+        """
+        team = get_object_or_404(Team.objects.only('id', 'trainer_id'), pk=pk)
+        self.check_object_permissions(request, team)
+        lines, input_format = read_import_input(request)
+        record_type = request.query_params.get('type')
+        if record_type is not None and record_type not in RECORD_TYPES:
+            raise exceptions.ValidationError(
+                {'type': f"Unknown record type: {record_type}. Use {', '.join(RECORD_TYPES)}."}
+            )
+        start = get_bounded_param(request, 'start', 0, 2 ** 31)
+
+        importer = TeamImport(team, getattr(settings, 'IMPORT_CHUNK_SIZE', 1000))
+        try:
+            report = importer.run(read_records(lines, input_format, record_type), start=start)
+        except ImportStopped as exc:
+            return Response(
+                {'detail': f"Import stopped: {exc}", **exc.report},
+                status=status.HTTP_400_BAD_REQUEST if exc.input_error else status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        created = any(report['created'].values())
+        return Response(report, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+class TeamMembershipViewSet(InstrumentedViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint that pages through the members of a team.
+    """
+    serializer_class = TeamMembershipSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = MembershipCursorPagination
+
+    def get_queryset(self):
+        team_pk = self.kwargs.get('team_pk')
+        if team_pk:
+            if not get_team_access_or_404(self.request, team_pk).is_member:
+                return TeamMembership.objects.none()
+            return select_serialized(
+                TeamMembership.objects.filter(team_id=team_pk), field_selection(self.request), 'user'
+            )
+        return TeamMembership.objects.none()
+
+class PostViewSet(
+    InstrumentedViewMixin, TeamFeedMixin, ConditionalGetMixin, ResponseCacheMixin, FastListMixin, AsyncReadMixin,
+    viewsets.ModelViewSet
+):
     """
     API endpoint that allows posts to be created, viewed, updated or deleted.
     Posts are tied to a specific team.
     """
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated, IsTeamMember, IsPostAuthorOrTeamMember]
-
-    def get_queryset(self):
+    pagination_class = PostCursorPagination
+    async_params = frozenset({'cursor', 'page_size', 'count', 'fields', 'omit'})
+    feed_event = 'post'
+    validator_fields = ('id', 'updated_at', 'team_id', 'author_id')
+    validator_relations = {'comments': 'updated_at'}
+    cached_actions = ('list',)
+
+    def get_base_queryset(self):
         team_pk = self.kwargs.get('team_pk')
         if team_pk:
-            team = get_object_or_404(Team, pk=team_pk)
             # Ensure the user is a member of this team to see posts
-            if not team.memberships.filter(user=self.request.user).exists():
+            if not get_team_access_or_404(self.request, team_pk).is_member:
                 return Post.objects.none() # Return empty queryset if not a member
-            return Post.objects.filter(team=team).order_by('-created_at')
+            return Post.objects.filter(team_id=team_pk)
         return Post.objects.none() # Or raise Http404
 
+    def get_queryset(self):
+        selection = field_selection(self.request)
+        queryset = select_serialized(self.get_base_queryset(), selection, 'author').order_by('-created_at')
+        if selection.wants('comments_count'):
+            queryset = annotate_comments_count(queryset)
+        if self.action != 'list' and selection.wants('comments'):
+            comments = select_serialized(Comment.objects.order_by('created_at'), selection.nested('comments'), 'author')
+            queryset = queryset.prefetch_related(Prefetch('comments', queryset=comments))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PostListSerializer
+        return PostSerializer
+
     def perform_create(self, serializer):
-        team = get_object_or_404(Team, pk=self.kwargs.get('team_pk'))
+        team_pk = self.kwargs.get('team_pk')
         # Only trainers can create posts for a team
-        if team.trainer != self.request.user:
+        if not get_team_access_or_404(self.request, team_pk).is_trainer:
             raise exceptions.PermissionDenied("Only the trainer can create posts for this team.")
-        serializer.save(team=team)
+        serializer.save(team_id=int(team_pk))
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(InstrumentedViewMixin, TeamFeedMixin, FastListMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows comments to be created, viewed, updated or deleted.
-    Comments are tied to a specific post.
+    Comments are tied to a specific post, which must belong to the team in the URL.
     """
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsTrainerOrTeamMemberForPostComments, IsCommentAuthorOrTrainer]
+    pagination_class = CommentCursorPagination
+    async_params = frozenset({'cursor', 'page_size', 'count', 'fields', 'omit'})
+    feed_event = 'comment'
+    # Set by aprepare() when the list is served by api.async_views.
+    parent_post = None
+
+    async def aprepare(self):
+        self.parent_post = await Post.objects.only('id', 'team_id').filter(
+            pk=self.kwargs['post_pk'], team_id=self.kwargs['team_pk']
+        ).afirst()
+        if self.parent_post is None:
+            raise Http404
+        await aget_team_access(self.request, self.parent_post.team_id)
 
     def get_queryset(self):
         post_pk = self.kwargs.get('post_pk')
         if post_pk:
-            post = get_object_or_404(Post, pk=post_pk)
-            if not post.team.memberships.filter(user=self.request.user).exists():
+            post = self.parent_post or get_object_or_404(
+                Post.objects.only('id', 'team_id'), pk=post_pk, team_id=self.kwargs.get('team_pk')
+            )
+            if not get_team_access_or_404(self.request, post.team_id).is_member:
                 return Comment.objects.none()
-            return Comment.objects.filter(post=post).order_by('created_at')
+            # The post is loaded for the permission checks of detail actions.
+            comments = Comment.objects.filter(post=post).select_related('post').order_by('created_at')
+            return select_serialized(comments, field_selection(self.request), 'author')
         return Comment.objects.none()
 
     def perform_create(self, serializer):
-        post = get_object_or_404(Post, pk=self.kwargs.get('post_pk'))
+        # The feed event goes to the team in the URL, so the post has to be one of its own.
+        post = get_object_or_404(Post, pk=self.kwargs.get('post_pk'), team_id=self.kwargs.get('team_pk'))
         # Any team member can comment on a post
-        if not post.team.memberships.filter(user=self.request.user).exists():
+        if not get_team_access_or_404(self.request, post.team_id).is_member:
             raise exceptions.PermissionDenied("You must be a member of this team to comment on this post.")
         serializer.save(post=post)
 
-class EventViewSet(viewsets.ModelViewSet):
+    def get_feed_data(self, response):
+        return {**super().get_feed_data(response), 'post': int(self.kwargs['post_pk'])}
+
+class EventViewSet(
+    InstrumentedViewMixin, TeamFeedMixin, ConditionalGetMixin, ResponseCacheMixin, FastListMixin, AsyncReadMixin,
+    viewsets.ModelViewSet
+):
     """
     API endpoint that allows events to be created, viewed, updated or deleted.
     Events are tied to a specific team.
     """
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated, IsTeamMember]
-
-    def get_queryset(self):
+    pagination_class = EventCursorPagination
+    async_params = frozenset({'cursor', 'page_size', 'count', 'fields', 'omit'})
+    feed_event = 'event'
+    # Cancelling or moving an occurrence changes the event as subscribers see it.
+    feed_actions = {**TeamFeedMixin.feed_actions, 'occurrence_exceptions': 'updated'}
+    validator_fields = ('id', 'updated_at', 'team_id')
+    cached_actions = ('list',)
+
+    def get_base_queryset(self):
         team_pk = self.kwargs.get('team_pk')
         if team_pk:
-            team = get_object_or_404(Team, pk=team_pk)
-            if not team.memberships.filter(user=self.request.user).exists():
+            if not get_team_access_or_404(self.request, team_pk).is_member:
                 return Event.objects.none()
-            return Event.objects.filter(team=team).order_by('start_time')
+            return Event.objects.filter(team_id=team_pk)
         return Event.objects.none()
 
+    def get_queryset(self):
+        selection = field_selection(self.request)
+        queryset = select_serialized(self.get_base_queryset(), selection, 'trainer').order_by('start_time')
+        # The recurrence has no column on the event, so even its id needs the join.
+        if selection.wants('recurrence'):
+            queryset = queryset.select_related('recurrence')
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request, team_pk=None):
+        """
+        The team's events starting in ?from=&to=, with recurring events expanded into
+        their occurrences for that window only.
+        """
+        start, end = parse_window(request, max_days=getattr(settings, 'CALENDAR_MAX_DAYS', 92))
+        events = events_between(self.get_base_queryset().select_related('trainer'), start, end)
+        return Response({
+            'from': start,
+            'to': end,
+            'events': EventOccurrenceSerializer(events, many=True, context={'request': request}).data,
+        })
+
+    @action(detail=True, methods=['get', 'post'], url_path='exceptions')
+    def occurrence_exceptions(self, request, team_pk=None, pk=None):
+        """
+        List, or cancel / modify (POST, keyed by original_start), occurrences of a recurring event.
+        """
+        event = self.get_object()
+        if not hasattr(event, 'recurrence'):
+            return Response({"detail": "This event does not recur."}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'GET':
+            return Response(OccurrenceExceptionSerializer(
+                event.occurrence_exceptions.order_by('original_start'), many=True
+            ).data)
+
+        if not get_team_access_or_404(request, team_pk).is_trainer:
+            raise exceptions.PermissionDenied("Only the trainer can change occurrences of this event.")
+        serializer = OccurrenceExceptionSerializer(data=request.data, context={'event': event})
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        exception, created = OccurrenceException.objects.update_or_create(
+            event=event, original_start=data.pop('original_start'), defaults=data
+        )
+        # Moves the event's updated_at, which list ETags and the response cache follow.
+        event.save(update_fields=['updated_at'])
+        return Response(
+            OccurrenceExceptionSerializer(exception).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'], url_path='ics')
+    def ics(self, request, team_pk=None):
+        """
+        The team's events as a streamed iCalendar file, optionally limited to ?from=&to=.
+        """
+        if not get_team_access_or_404(request, team_pk).is_member:
+            raise exceptions.PermissionDenied("You must be a member of this team to export its calendar.")
+        start, end = parse_window(request, required=False)
+        queryset = export_window(self.get_base_queryset(), start, end).order_by('start_time', 'id')
+        team_name = Team.objects.values_list('name', flat=True).get(pk=team_pk)
+        return calendar_response(
+            request, queryset, team_name, f'team-{team_pk}.ics', getattr(settings, 'CALENDAR_EXPORT_CHUNK_SIZE', 2000)
+        )
+
     def perform_create(self, serializer):
-        team = get_object_or_404(Team, pk=self.kwargs.get('team_pk'))
-        if team.trainer != self.request.user:
+        team_pk = self.kwargs.get('team_pk')
+        if not get_team_access_or_404(self.request, team_pk).is_trainer:
             raise exceptions.PermissionDenied("Only the trainer can create events for this team.")
-        serializer.save(team=team)
+        serializer.save(team_id=int(team_pk))
 
     def perform_update(self, serializer):
-        team = get_object_or_404(Team, pk=self.kwargs.get('team_pk'))
-        if team.trainer != self.request.user:
+        if not get_team_access_or_404(self.request, self.kwargs.get('team_pk')).is_trainer:
             raise exceptions.PermissionDenied("Only the trainer can update events for this team.")
         serializer.save()
 
     def perform_destroy(self, instance):
-        if instance.team.trainer != self.request.user:
+        if not get_team_access_or_404(self.request, instance.team_id).is_trainer:
             raise exceptions.PermissionDenied("Only the trainer can delete events for this team.")
         instance.delete()
 
-class UserRegistrationView(APIView):
+class UserRegistrationView(InstrumentedViewMixin, APIView):
     """
     API endpoint for user registration.
     """
@@ -244,7 +614,7 @@ class UserRegistrationView(APIView):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class UserLoginView(APIView):
+class UserLoginView(InstrumentedViewMixin, APIView):
     """
     API endpoint for user login and token generation.
     """
@@ -263,7 +633,7 @@ class UserLoginView(APIView):
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class UserLogoutView(APIView):
+class UserLogoutView(InstrumentedViewMixin, APIView):
     """
     API endpoint for user logout (deletes the current user's token).
     """
@@ -274,3 +644,179 @@ class UserLogoutView(APIView):
             request.user.auth_token.delete()
         logout(request)
         return Response({"message": "Successfully logged out."}, status=status.HTTP_200_OK)
+
+class DashboardView(InstrumentedViewMixin, APIView):
+    """
+    API endpoint for the caller's dashboard: their teams, the latest posts of each team and
+    the events (and occurrences of recurring ones) starting in the next days, in one response.
+
+    ?posts=<n> is the number of posts per team and ?days=<k> the event window. The payload
+    takes a fixed number of queries however many teams the caller belongs to.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        posts_per_team = get_bounded_param(
+            request, 'posts', getattr(settings, 'DASHBOARD_POSTS_PER_TEAM', 3),
+            getattr(settings, 'DASHBOARD_MAX_POSTS_PER_TEAM', 20)
+        )
+        days = get_bounded_param(
+            request, 'days', getattr(settings, 'DASHBOARD_EVENT_DAYS', 14),
+            getattr(settings, 'DASHBOARD_MAX_EVENT_DAYS', 90)
+        )
+        context = {'request': request}
+
+        teams = self.get_teams(request.user)
+        team_ids = [team.pk for team in teams]
+        posts = self.get_latest_posts(team_ids, posts_per_team) if team_ids and posts_per_team else []
+        events = self.get_upcoming_events(team_ids, days) if team_ids and days else []
+
+        return Response({
+            'teams': TeamSerializer(teams, many=True, context=context).data,
+            'latest_posts': PostListSerializer(posts, many=True, context=context).data,
+            'upcoming_events': EventOccurrenceSerializer(events, many=True, context=context).data,
+        })
+
+    def get_teams(self, user):
+        # One query from the caller's memberships; each membership doubles as the team's
+        # prefetched my_membership, and its member count is a correlated subquery.
+        member_count = TeamMembership.objects.filter(team=OuterRef('team_id')).order_by().values('team').annotate(
+            count=Count('id')
+        ).values('count')
+        memberships = user.team_memberships.select_related('team__trainer').annotate(
+            team_member_count=Coalesce(Subquery(member_count), 0)
+        ).order_by('team__name', 'team_id')
+
+        teams = []
+        for membership in memberships:
+            team = membership.team
+            membership.user = user
+            team.member_count = membership.team_member_count
+            team.own_memberships = [membership]
+            teams.append(team)
+        return teams
+
+    def get_latest_posts(self, team_ids, posts_per_team):
+        # Top-N per team with ROW_NUMBER() over the (team, -created_at) index, so a busy team
+        # cannot crowd the others out of the dashboard. Ranking only needs ids; authors and
+        # comment counts are joined for the surviving rows in the same statement.
+        ranked = Post.objects.filter(team_id__in=team_ids).annotate(
+            team_rank=Window(
+                RowNumber(), partition_by=F('team_id'), order_by=[F('created_at').desc(), F('id').desc()]
+            )
+        ).filter(team_rank__lte=posts_per_team).values('pk')
+        posts = annotate_comments_count(Post.objects.filter(pk__in=ranked).select_related('author'))
+        return sorted(posts, key=lambda post: (post.created_at, post.pk), reverse=True)
+
+    def get_upcoming_events(self, team_ids, days):
+        now = timezone.now()
+        return events_between(
+            Event.objects.filter(team_id__in=team_ids).select_related('trainer'), now, now + timedelta(days=days),
+            limit=getattr(settings, 'DASHBOARD_MAX_EVENTS', 50)
+        )
+
+def user_events(user):
+    return Event.objects.filter(team_id__in=user.team_memberships.values('team_id'))
+
+class CalendarView(InstrumentedViewMixin, APIView):
+    """
+    API endpoint for the events of all the caller's teams starting in ?from=&to= (a
+    half-open window), each with the ids of the other events it overlaps with.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        start, end = parse_window(request, max_days=getattr(settings, 'CALENDAR_MAX_DAYS', 92))
+        events = events_between(user_events(request.user).select_related('trainer'), start, end)
+        return Response({
+            'from': start,
+            'to': end,
+            'events': CalendarEventSerializer(find_conflicts(events), many=True).data,
+        })
+
+class CalendarExportView(InstrumentedViewMixin, APIView):
+    """
+    API endpoint streaming the caller's events as an iCalendar file, optionally limited
+    to ?from=&to=.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        start, end = parse_window(request, required=False)
+        queryset = export_window(user_events(request.user), start, end).order_by('start_time', 'id')
+        return calendar_response(
+            request, queryset, f"{request.user.username}'s teams", 'calendar.ics',
+            getattr(settings, 'CALENDAR_EXPORT_CHUNK_SIZE', 2000)
+        )
+
+class SearchView(InstrumentedViewMixin, APIView):
+    """
+    API endpoint for full-text search (?q=) over the posts, comments and events of the
+    caller's teams, best matches first and cursor-paginated. ?type= takes a
+    comma-separated list of kinds to search (post, comment, event).
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = SearchCursorPagination
+
+    def get(self, request):
+        terms = parse_terms(request.query_params.get('q', ''))
+        if not terms:
+            raise exceptions.ValidationError({'q': "Enter at least one word to search for."})
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+        unknown = set(kinds) - set(SearchDocument.Kind.values)
+        if unknown:
+            raise exceptions.ValidationError(
+                {'type': f"Unknown types: {', '.join(sorted(unknown))}. Use {', '.join(SearchDocument.Kind.values)}."}
+            )
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(search(request.user, terms, kinds), request, view=self)
+        return paginator.get_paginated_response(SearchResultSerializer(page, many=True).data)
+
+class TeamFeedStreamView(View):
+    """
+    Server-Sent Events stream of the changes to a team's posts, comments and events, for
+    its members (see api.realtime). Authenticates like the API, and also accepts ?token=
+    for EventSource clients. Only served over ASGI, where an open stream is an idle
+    coroutine rather than a busy worker thread. Membership is checked again while the
+    stream is open, so removed members stop receiving the feed.
+    """
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, QueryTokenAuthentication]
+
+    async def get(self, request, team_pk):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'detail': "Realtime feeds are only served over ASGI."}, status=501)
+        denied, user_id = await sync_to_async(self.check_access)(request, team_pk)
+        if denied is not None:
+            return denied
+
+        async def is_member():
+            access = await arecheck_team_access(user_id, team_pk)
+            return access is not None and access.is_member
+
+        # A reconnecting EventSource sends the id of the last event it saw.
+        resync = 'HTTP_LAST_EVENT_ID' in request.META
+        response = StreamingHttpResponse(
+            event_stream(team_channel(team_pk), resync=resync, allowed=is_member), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def check_access(self, request, team_pk):
+        """
+        (None, the user's id) for members of the team, (an error response, None) otherwise.
+        """
+        request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        try:
+            user = request.user
+        except exceptions.AuthenticationFailed as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=401), None
+        if not user.is_authenticated:
+            return JsonResponse({'detail': "Authentication credentials were not provided."}, status=401), None
+        access = get_team_access(request, team_pk)
+        if access is None:
+            return JsonResponse({'detail': "No Team matches the given query."}, status=404), None
+        if not access.is_member:
+            return JsonResponse({'detail': "You must be a member of this team to follow its feed."}, status=403), None
+        return None, user.id
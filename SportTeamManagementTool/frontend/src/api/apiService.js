@@ -29,7 +29,22 @@ export const fetchWithAuth = async (url, options = {}) => {
   return response.json();
 };
 
+// Collects every page of a keyset-paginated list by following its `next` links.
+export const fetchAllPages = async (url) => {
+  const results = [];
+  let nextUrl = url;
+  while (nextUrl) {
+    const page = await fetchWithAuth(nextUrl);
+    results.push(...page.results);
+    nextUrl = page.next;
+  }
+  return results;
+};
+
 export const api = {
+  me: {
+    dashboard: () => fetchWithAuth(`${API_BASE_URL}/me/dashboard/`),
+  },
   auth: {
     register: (userData) =>
       fetchWithAuth(`${API_BASE_URL}/auth/register/`, {
@@ -50,6 +65,8 @@ export const api = {
   },
   teams: {
     getAll: () => fetchWithAuth(`${API_BASE_URL}/teams/`),
+    // Teams the user is not a member of (/teams/ only lists their own).
+    discover: () => fetchAllPages(`${API_BASE_URL}/teams/discover/?page_size=200`),
     getById: (teamId) => fetchWithAuth(`${API_BASE_URL}/teams/${teamId}/`),
     create: (teamData) =>
       fetchWithAuth(`${API_BASE_URL}/teams/`, {
@@ -2,7 +2,7 @@ import React from "react";
 import { Card, CardContent, Grid, Typography } from "@mui/material";
 
 const TeamCard = ({ team, currentUserId, navigateTo }) => {
-  const membership = team.memberships.find((m) => m.user.id === currentUserId);
+  const membership = team.my_membership;
   const role = membership ? membership.role_display : "Not a member";
 
   const isTrainer = team.trainer && team.trainer.id === currentUserId;
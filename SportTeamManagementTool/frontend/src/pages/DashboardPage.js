@@ -24,8 +24,7 @@ import {
 import { useDispatch, useSelector } from "../redux/store";
 import {
   fetchAllTeamsAndUserMemberships,
-  fetchPostsFeed,
-  fetchEventsFeed,
+  fetchDashboardFeeds,
   joinTeam,
 } from "../redux/asyncActions";
 import TeamCard from "../components/TeamCard";
@@ -63,22 +62,17 @@ const DashboardPage = ({ navigateTo }) => {
   );
   const teamsAsAthlete = teams.filter(
     (team) =>
-      team.memberships.some(
-        (m) => m.user.id === user?.id && m.role === "athlete"
-      ) && team.trainer?.id !== user?.id
+      team.my_membership?.role === "athlete" && team.trainer?.id !== user?.id
   );
   const teamsAsMember = teams.filter(
     (team) =>
-      team.memberships.some(
-        (m) => m.user.id === user?.id && m.role === "member"
-      ) && team.trainer?.id !== user?.id
+      team.my_membership?.role === "member" && team.trainer?.id !== user?.id
   );
 
   const fetchData = useCallback(async () => {
     if (user?.id) {
       await fetchAllTeamsAndUserMemberships(dispatch, user.id);
-      await fetchPostsFeed(dispatch, user.id);
-      await fetchEventsFeed(dispatch, user.id);
+      await fetchDashboardFeeds(dispatch);
     }
   }, [dispatch, user?.id]);
 
@@ -55,7 +55,7 @@ const TeamDetailPage = ({ teamId, navigateTo }) => {
   }, [fetchTeamData]);
 
   const isTrainer = teamDetail?.trainer && teamDetail.trainer.id === user?.id;
-  const isMember = teamDetail?.memberships.some((m) => m.user.id === user?.id);
+  const isMember = Boolean(teamDetail?.my_membership);
 
   if (teamLoading || postsLoading || eventsLoading) {
     return (
@@ -85,21 +85,12 @@ export const fetchAllTeamsAndUserMemberships = async (
 ) => {
   dispatch({ type: FETCH_TEAMS_REQUEST });
   try {
-    const response = await api.teams.getAll();
+    const [response, teamsToJoin] = await Promise.all([
+      api.teams.getAll(),
+      api.teams.discover(),
+    ]);
     // Check if the response has a 'results' key (DRF pagination)
-    const allTeams = response.results ? response.results : response;
-
-    const userTeams = allTeams.filter((team) =>
-      team.memberships.some(
-        (membership) => membership.user.id === currentUserId
-      )
-    );
-    const teamsToJoin = allTeams.filter(
-      (team) =>
-        !team.memberships.some(
-          (membership) => membership.user.id === currentUserId
-        )
-    );
+    const userTeams = response.results ? response.results : response;
 
     dispatch({
       type: FETCH_TEAMS_SUCCESS,
@@ -148,51 +139,6 @@ export const joinTeam = async (dispatch, teamId, username, role) => {
   }
 };
 
-export const fetchPostsFeed = async (dispatch, currentUserId) => {
-  dispatch({ type: FETCH_POSTS_FEED_REQUEST });
-  try {
-    // Correctly extract allTeams from the paginated response
-    const allTeamsResponse = await api.teams.getAll();
-    const allTeams = allTeamsResponse.results
-      ? allTeamsResponse.results
-      : allTeamsResponse;
-
-    const userTeamIds = allTeams
-      .filter((team) =>
-        team.memberships.some((m) => m.user.id === currentUserId)
-      )
-      .map((team) => team.id);
-
-    let allPosts = [];
-    for (const teamId of userTeamIds) {
-      try {
-        const teamPostsResponse = await api.posts.getByTeam(teamId);
-        // Correctly extract teamPosts from the paginated response
-        const teamPosts = teamPostsResponse.results
-          ? teamPostsResponse.results
-          : teamPostsResponse;
-
-        allPosts = [
-          ...allPosts,
-          ...teamPosts.map((p) => ({
-            ...p,
-            team_name: allTeams.find((t) => t.id === teamId)?.name,
-          })),
-        ];
-      } catch (error) {
-        console.error(
-          `Failed to fetch posts for team ${teamId}:`,
-          error.message
-        );
-      }
-    }
-    allPosts.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
-    dispatch({ type: FETCH_POSTS_FEED_SUCCESS, payload: allPosts });
-  } catch (error) {
-    dispatch({ type: FETCH_POSTS_FEED_FAILURE, payload: error.message });
-  }
-};
-
 export const fetchTeamPosts = async (dispatch, teamId) => {
   dispatch({ type: FETCH_TEAM_POSTS_REQUEST });
   try {
@@ -246,48 +192,31 @@ export const createTeamPost = async (dispatch, teamId, postData) => {
   }
 };
 
-export const fetchEventsFeed = async (dispatch, currentUserId) => {
+// Posts and events feeds of the dashboard, both from a single /me/dashboard/ request.
+export const fetchDashboardFeeds = async (dispatch) => {
+  dispatch({ type: FETCH_POSTS_FEED_REQUEST });
   dispatch({ type: FETCH_EVENTS_FEED_REQUEST });
   try {
-    const allTeamsResponse = await api.teams.getAll();
-    const allTeams = allTeamsResponse.results
-      ? allTeamsResponse.results
-      : allTeamsResponse;
-
-    const userTeamIds = allTeams
-      .filter((team) =>
-        team.memberships.some((m) => m.user.id === currentUserId)
-      )
-      .map((team) => team.id);
-
-    let allEvents = [];
-    for (const teamId of userTeamIds) {
-      try {
-        const teamEventsResponse = await api.events.getByTeam(teamId);
-        // Correctly extract teamEvents from the paginated response
-        const teamEvents = teamEventsResponse.results
-          ? teamEventsResponse.results
-          : teamEventsResponse;
-
-        allEvents = [
-          ...allEvents,
-          ...teamEvents.map((e) => ({
-            ...e,
-            team_name: allTeams.find((t) => t.id === teamId)?.name,
-          })),
-        ];
-      } catch (error) {
-        console.error(
-          `Failed to fetch events for team ${teamId}:`,
-          error.message
-        );
-      }
-    }
-    allEvents.sort(
-      (a, b) => new Date(a.start_time) - new Date(a.end_time || a.start_time)
+    const dashboard = await api.me.dashboard();
+    const teamNames = Object.fromEntries(
+      dashboard.teams.map((team) => [team.id, team.name])
     );
-    dispatch({ type: FETCH_EVENTS_FEED_SUCCESS, payload: allEvents });
+    dispatch({
+      type: FETCH_POSTS_FEED_SUCCESS,
+      payload: dashboard.latest_posts.map((p) => ({
+        ...p,
+        team_name: teamNames[p.team],
+      })),
+    });
+    dispatch({
+      type: FETCH_EVENTS_FEED_SUCCESS,
+      payload: dashboard.upcoming_events.map((e) => ({
+        ...e,
+        team_name: teamNames[e.team],
+      })),
+    });
   } catch (error) {
+    dispatch({ type: FETCH_POSTS_FEED_FAILURE, payload: error.message });
     dispatch({ type: FETCH_EVENTS_FEED_FAILURE, payload: error.message });
   }
 };
@@ -133,10 +133,8 @@ export const teamReducer = (state = initialTeamState, action) => {
     case JOIN_TEAM_SUCCESS:
       const joinedTeam = {
         ...action.payload.team,
-        memberships: [
-          ...(action.payload.team.memberships || []),
-          action.payload.membership,
-        ],
+        my_membership: action.payload.membership,
+        member_count: (action.payload.team.member_count || 0) + 1,
       };
       return {
         ...state,